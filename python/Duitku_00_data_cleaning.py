@@ -1,38 +1,96 @@
 import os
 import sys
-import numpy as np
+import argparse
 import pandas as pd
 
+from duitku_ingest import (
+    DEFAULT_CHUNKSIZE, parse_datetimes, derive_columns, stream_clean,
+    incremental_ingest, ingest_xlsx, save_ingest_state
+)
+from duitku_store import (
+    CLEAN_COLUMNS, STORE_DIR, reset_store, write_transactions, refresh_cube, refresh_daily_sketches, refresh_customers,
+    refresh_activity_index
+)
 
-# 0. Setup paths and load CSV
+
+# 0. Setup paths and options
 # -------------------------------------------------------------------
 script_directory = os.path.dirname(os.path.abspath(__file__))
 csv_file_path    = os.path.join(script_directory, "..", "data", "transactions.csv")
 csv_file_path    = os.path.normpath(csv_file_path)
 
+xlsx_file_path   = os.path.join(script_directory, "..", "data", "transactions.xlsx")
+xlsx_file_path   = os.path.normpath(xlsx_file_path)
+
+# Prefer a hand-converted CSV when present, otherwise read the workbook as shipped
+default_source   = csv_file_path if os.path.exists(csv_file_path) else xlsx_file_path
+
+clean_csv_path = os.path.join(script_directory, "..", "data", "transactions_clean.csv")
+clean_csv_path = os.path.normpath(clean_csv_path)
+
+parser = argparse.ArgumentParser(description="Clean the raw Duitku transactions export.")
+parser.add_argument("--source", default=default_source, help="raw transactions export (.csv or .xlsx)")
+parser.add_argument("--chunksize", type=int, default=None,
+                    help="stream the source in chunks of this many rows (bounded memory)")
+parser.add_argument("--incremental", action="store_true",
+                    help="append only rows past the stored high-water mark (max id)")
+parser.add_argument("--force", action="store_true",
+                    help="rebuild from an .xlsx source even if it is unchanged since the last build")
+args = parser.parse_args()
+
+is_xlsx = args.source.lower().endswith(".xlsx")
+
 pd.set_option("display.max_columns", None)
 pd.set_option("display.width", 1000)
 
-df = pd.read_csv(csv_file_path)
+
+# 0b. Incremental mode: append rows past the watermark, keep existing cohorts
+# -------------------------------------------------------------------
+if args.incremental:
+    rows_written = incremental_ingest(args.source, clean_csv_path, chunksize=args.chunksize or DEFAULT_CHUNKSIZE)
+    print(f"\n=== Appended {rows_written:,} new rows to {clean_csv_path} and {STORE_DIR} ===")
+    sys.exit(0)
+
+
+# 0c. Workbook mode: stream rows out of transactions.xlsx (cached on size/mtime/hash)
+# -------------------------------------------------------------------
+if is_xlsx:
+    rows_written, cache_hit = ingest_xlsx(args.source, clean_csv_path, chunksize=args.chunksize or DEFAULT_CHUNKSIZE, force=args.force)
+    if cache_hit:
+        print(f"\n=== {args.source} unchanged since last build; store is up to date ({rows_written:,} rows) ===")
+    else:
+        print(f"\n=== Ingested {rows_written:,} rows from {args.source} to {clean_csv_path} and {STORE_DIR} ===")
+    sys.exit(0)
+
+
+# 0d. Streaming mode: two passes over the file, never holding it in memory
+# -------------------------------------------------------------------
+if args.chunksize:
+    rows_written = stream_clean(args.source, clean_csv_path, chunksize=args.chunksize, store_dir=STORE_DIR)
+    print(f"\n=== Streamed {rows_written:,} rows (chunksize={args.chunksize:,}) to {clean_csv_path} ===")
+    sys.exit(0)
+
+
+# 0e. Single-shot mode: load the whole CSV
+# -------------------------------------------------------------------
+df = pd.read_csv(args.source)
 
 print("=== Raw Data Preview ===")
 print(df.head())
 
 
-# 1. Convert datetime fields (ONE LINE EACH)
+# 1. Convert datetime fields
 # -------------------------------------------------------------------
-df["paying_at"]  = pd.to_datetime(df["paying_at"],  errors="coerce")
-df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
+df = parse_datetimes(df)
 
 print("\n=== Datetime Conversion Complete ===")
 print(df[["paying_at", "created_at"]].dtypes)
 
 
-# 2. Create helper / analytical columns (ONE LINE EACH)
+# 2. Create helper / analytical columns
 # -------------------------------------------------------------------
-df["transaction_date"] = df["paying_at"].dt.date
-df["year_month"]       = df["paying_at"].dt.to_period("M").astype(str)
-df["cohort_month"]     = df.groupby("customer_id")["paying_at"].transform("min").dt.to_period("M").astype(str)
+srs_first_paying_at = df.groupby("customer_id")["paying_at"].min()
+df = derive_columns(df, srs_first_paying_at)
 
 print("\n=== Derived Columns Added ===")
 print(df[["paying_at", "created_at", "transaction_date", "year_month", "cohort_month"]].head())
@@ -40,18 +98,7 @@ print(df[["paying_at", "created_at", "transaction_date", "year_month", "cohort_m
 
 # 3. Keep only needed columns (ONE LINE)
 # -------------------------------------------------------------------
-df_clean = df[[
-    "id",
-    "customer_id",
-    "net_amount",
-    "fee_internal_amount",
-    "fee_external_amount",
-    "category",
-    "transaction_date",
-    "year_month",
-    "cohort_month",
-    "created_at"
-]].copy()
+df_clean = df[CLEAN_COLUMNS].copy()
 
 print("\n=== Final Clean Columns ===")
 print(df_clean.columns.tolist())
@@ -60,11 +107,17 @@ print("\n=== Final Clean DataFrame Preview ===")
 print(df_clean.head())
 
 
-# 4. Save cleaned dataset (ONE LINE)
+# 4. Save cleaned dataset (CSV + columnar store partitioned by year_month + aggregate cube + daily sketches + customer dimension + activity bitmaps)
 # -------------------------------------------------------------------
-clean_csv_path = os.path.join(script_directory, "..", "table", "transactions_clean.csv")
-clean_csv_path = os.path.normpath(clean_csv_path)
-
 df_clean.to_csv(clean_csv_path, index=False)
 
+reset_store(STORE_DIR)
+write_transactions(df_clean, STORE_DIR)
+refresh_cube(store_dir=STORE_DIR)
+refresh_daily_sketches(store_dir=STORE_DIR)
+refresh_customers(STORE_DIR)
+refresh_activity_index(store_dir=STORE_DIR)
+save_ingest_state(srs_first_paying_at, df["id"].max(), len(df_clean), STORE_DIR)
+
 print(f"\n=== Saved Cleaned Dataset to {clean_csv_path} ===")
+print(f"=== Saved Columnar Store to {STORE_DIR} ===")
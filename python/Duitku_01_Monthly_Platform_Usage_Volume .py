@@ -1,8 +1,13 @@
-import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_store import month_labels
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["monthly_totals"]
+
 
 # -----------------------------
 # Axis formatter (Billions)
@@ -18,62 +23,46 @@ def billions(x, pos):
     return f"{s}B"
 
 
-# -------------------------------------------------------------------
-# 0. Load data
-# -------------------------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.normpath(
-    os.path.join(script_directory, "..", "data", "transactions_clean.csv")
-)
-
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
-
-df = pd.read_csv(csv_file_path)
-
-# -------------------------------------------------------------------
-# 1. Validate required fields
-# -------------------------------------------------------------------
-required_cols = {"year_month", "net_amount"}
-missing = required_cols - set(df.columns)
-if missing:
-    raise KeyError(
-        f"Missing required columns: {missing}. "
-        f"`year_month` must exist in transactions_clean.csv"
+def build(ctx):
+    # -------------------------------------------------------------------
+    # 1. Monthly total top-up volume (shared monthly aggregates)
+    # -------------------------------------------------------------------
+    df_monthly = ctx["monthly_totals"]
+
+    if "net_amount" not in df_monthly.columns:
+        raise KeyError("Missing required columns: {'net_amount'} in the monthly totals")
+
+    df_monthly_topup_volume = df_monthly["net_amount"].copy()
+    df_monthly_topup_volume.index = month_labels(df_monthly_topup_volume.index)
+
+    print("\n=== 01 - Monthly Platform Usage Volume (net_amount) ===")
+    print(df_monthly_topup_volume)
+
+    # -------------------------------------------------------------------
+    # 2. Bar chart — Monthly Platform Usage Volume
+    # -------------------------------------------------------------------
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    df_monthly_topup_volume.plot(
+        kind="bar",
+        ax=ax,
+        rot=45,
+        edgecolor="black"
     )
 
-df["year_month"] = pd.PeriodIndex(df["year_month"], freq="M")
-df["net_amount"] = pd.to_numeric(df["net_amount"], errors="coerce").fillna(0)
-
-# -------------------------------------------------------------------
-# 2. Monthly total top-up volume
-# -------------------------------------------------------------------
-df_monthly_topup_volume = (
-    df.groupby("year_month")["net_amount"]
-      .sum()
-      .sort_index()
-)
-
-print("\n=== 01 - Monthly Platform Usage Volume (net_amount) ===")
-print(df_monthly_topup_volume)
-
-# -------------------------------------------------------------------
-# 3. Bar chart — Monthly Platform Usage Volume
-# -------------------------------------------------------------------
-fig, ax = plt.subplots(figsize=(10, 5))
-
-df_monthly_topup_volume.plot(
-    kind="bar",
-    ax=ax,
-    rot=45,
-    edgecolor="black"
-)
-
-ax.yaxis.set_major_formatter(FuncFormatter(billions))
-
-ax.set_title("01 – Monthly Platform Usage Volume (IDR)", fontsize=14)
-ax.set_xlabel("Month")
-ax.set_ylabel("Top-Up Volume (Billions IDR)")
-
-fig.tight_layout()
-plt.show()
+    ax.yaxis.set_major_formatter(FuncFormatter(billions))
+
+    ax.set_title("01 – Monthly Platform Usage Volume (IDR)", fontsize=14)
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Top-Up Volume (Billions IDR)")
+
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext())
+    plt.show()
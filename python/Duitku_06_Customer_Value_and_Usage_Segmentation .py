@@ -1,9 +1,24 @@
-import os
+import argparse
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_pipeline import AnalysisContext, customer_batches
+from duitku_store import CUSTOMER_SOURCE_COLUMNS
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["customer_summary", "customer_value_sketches"]
+
+
+def required_steps(ctx):
+    """--approx-quantiles streams customers batch by batch instead of reading the customer summary."""
+    return ["customer_value_sketches"] if ctx.approx_quantiles else REQUIRES
+
+# Columns needed when this report runs on its own (a month range aggregates
+# the customer dimension from them)
+COLUMNS = CUSTOMER_SOURCE_COLUMNS
+
 
 # -------------------------------------------------
 # Helper formatter (NO 0.xK)
@@ -23,133 +38,129 @@ def thousands(x, pos):
     return f"{s}M"
 
 
-# -------------------------------------------------
-# 0. Load data
-# -------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.normpath(
-    os.path.join(script_directory, "..", "data", "transactions_clean.csv")
-)
-
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
-
-df = pd.read_csv(csv_file_path)
-
-# Basic validation + type safety
-required_cols = {"customer_id", "id", "net_amount"}
-missing = required_cols - set(df.columns)
-if missing:
-    raise KeyError(f"Missing required columns: {missing}. Available: {df.columns.tolist()}")
-
-df["net_amount"] = pd.to_numeric(df["net_amount"], errors="coerce")
-df = df.dropna(subset=["customer_id", "id", "net_amount"]).copy()
-df["customer_id"] = df["customer_id"].astype(str).str.replace(r"\.0$", "", regex=True)
-
-# -------------------------------------------------
-# 1. Build per-customer usage & value metrics
-# -------------------------------------------------
-df_customer = (
-    df.groupby("customer_id", as_index=True)
-      .agg(
-          topup_count=("id", "count"),
-          avg_topup_amount=("net_amount", "mean"),
-          total_topup_amount=("net_amount", "sum")
-      )
-)
-
-srs_topup_count = df_customer["topup_count"]
-srs_avg_topup   = df_customer["avg_topup_amount"]
-srs_total_value = df_customer["total_topup_amount"]
-
-# -------------------------------------------------
-# 2. Value-based customer segmentation (volume-based)
-# -------------------------------------------------
-p20 = srs_total_value.quantile(0.20)
-p80 = srs_total_value.quantile(0.80)
-p95 = srs_total_value.quantile(0.95)
-
-def assign_segment(value):
-    if value >= p95:
-        return "Whale (Top 5%)"
-    elif value >= p80:
-        return "High Value (Next 15%)"
-    elif value >= p20:
-        return "Mass Market (Middle 60%)"
+def customer_metrics(df_summary):
+    """Top-up count, average and total top-up amount per customer."""
+    required_cols = {"transaction_count", "total_net_amount"}
+    missing = required_cols - set(df_summary.columns)
+    if missing:
+        raise KeyError(f"Missing required columns: {missing}. Available: {df_summary.columns.tolist()}")
+
+    return pd.DataFrame({
+        "topup_count": df_summary["transaction_count"],
+        "avg_topup_amount": df_summary["total_net_amount"] / df_summary["transaction_count"],
+        "total_topup_amount": df_summary["total_net_amount"],
+    })
+
+
+def build(ctx):
+    # -------------------------------------------------
+    # 1-2. Per-customer usage & value metrics + segment thresholds
+    # -------------------------------------------------
+    # Exact: shared customer summary, thresholds from a sort. --approx-quantiles:
+    # thresholds from the customer value sketch, customers streamed batch by batch
+    if ctx.approx_quantiles:
+        p20, p80, p95 = ctx["customer_value_sketches"]["total_net_amount"].quantile([0.20, 0.80, 0.95])
+        batches = (customer_metrics(df) for df in customer_batches(ctx, ["transaction_count", "total_net_amount"]))
     else:
-        return "Long Tail (Bottom 20%)"
+        df_customer = customer_metrics(ctx["customer_summary"])
+        srs_total_value = df_customer["total_topup_amount"]
+        p20 = srs_total_value.quantile(0.20)
+        p80 = srs_total_value.quantile(0.80)
+        p95 = srs_total_value.quantile(0.95)
+        batches = [df_customer]
+
+    # Value-based segments: value >= threshold moves up one segment
+    segment_labels = np.array([
+        "Long Tail (Bottom 20%)",
+        "Mass Market (Middle 60%)",
+        "High Value (Next 15%)",
+        "Whale (Top 5%)",
+    ])
+
+    # -------------------------------------------------
+    # 3. Visual encoding (color + size = same meaning)
+    # -------------------------------------------------
+    segment_colors = {
+        "Long Tail (Bottom 20%)":   "#1F77B4",
+        "Mass Market (Middle 60%)": "#7FB3D5",
+        "High Value (Next 15%)":    "#FF7F0E",
+        "Whale (Top 5%)":           "#D62728",
+    }
+
+    segment_sizes = {
+        "Long Tail (Bottom 20%)":   40,
+        "Mass Market (Middle 60%)": 90,
+        "High Value (Next 15%)":    180,
+        "Whale (Top 5%)":           300,
+    }
+
+    # -------------------------------------------------
+    # 4. Scatter plot — Customer Value & Usage (one scatter per batch)
+    # -------------------------------------------------
+    fig, ax = plt.subplots(figsize=(10, 6))
+    fig.canvas.manager.set_window_title("Figure 06")
+
+    for df_customer in batches:
+        srs_segment = pd.Series(
+            segment_labels[np.digitize(df_customer["total_topup_amount"].to_numpy(), [p20, p80, p95])],
+            index=df_customer.index,
+        )
+        ax.scatter(
+            df_customer["topup_count"],
+            df_customer["avg_topup_amount"],
+            s=srs_segment.map(segment_sizes),
+            c=srs_segment.map(segment_colors),
+            alpha=0.65,
+            edgecolor="black",
+            linewidth=0.5
+        )
+
+    ax.set_title("06 – Customer Value and Usage Segmentation (Volume-Based)", fontsize=14)
+    ax.set_xlabel("Top-Up Frequency (Number of Transactions)")
+    ax.set_ylabel("Average Top-Up Amount (IDR)")
+    ax.yaxis.set_major_formatter(FuncFormatter(thousands))
+
+    ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.4)
+
+    # -------------------------------------------------
+    # 5. Unified legend (color + size)
+    # -------------------------------------------------
+    legend_handles = []
+    legend_labels = []
+
+    for segment in segment_colors:
+        handle = plt.scatter(
+            [], [],
+            s=segment_sizes[segment],
+            color=segment_colors[segment],
+            edgecolor="black",
+            linewidth=0.7,
+            alpha=0.8
+        )
+        legend_handles.append(handle)
+        legend_labels.append(segment)
+
+    ax.legend(
+        legend_handles,
+        legend_labels,
+        title="Customer Segment",
+        loc="upper left",
+        bbox_to_anchor=(1.02, 1),
+        frameon=True
+    )
 
-df_customer["segment"] = srs_total_value.apply(assign_segment)
+    plt.tight_layout(rect=[0, 0, 0.80, 1])
+    return fig
 
-# -------------------------------------------------
-# 3. Visual encoding (color + size = same meaning)
-# -------------------------------------------------
-segment_colors = {
-    "Long Tail (Bottom 20%)":   "#1F77B4",
-    "Mass Market (Middle 60%)": "#7FB3D5",
-    "High Value (Next 15%)":    "#FF7F0E",
-    "Whale (Top 5%)":           "#D62728",
-}
-
-segment_sizes = {
-    "Long Tail (Bottom 20%)":   40,
-    "Mass Market (Middle 60%)": 90,
-    "High Value (Next 15%)":    180,
-    "Whale (Top 5%)":           300,
-}
-
-df_customer["color"] = df_customer["segment"].map(segment_colors)
-df_customer["size"]  = df_customer["segment"].map(segment_sizes)
 
-# -------------------------------------------------
-# 4. Scatter plot — Customer Value & Usage
-# -------------------------------------------------
-fig, ax = plt.subplots(figsize=(10, 6))
-fig.canvas.manager.set_window_title("Figure 06")
-
-ax.scatter(
-    srs_topup_count,
-    srs_avg_topup,
-    s=df_customer["size"],
-    c=df_customer["color"],
-    alpha=0.65,
-    edgecolor="black",
-    linewidth=0.5
-)
-
-ax.set_title("06 – Customer Value and Usage Segmentation (Volume-Based)", fontsize=14)
-ax.set_xlabel("Top-Up Frequency (Number of Transactions)")
-ax.set_ylabel("Average Top-Up Amount (IDR)")
-ax.yaxis.set_major_formatter(FuncFormatter(thousands))
-
-ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="06 – Customer value and usage segmentation.")
+    parser.add_argument("--approx-quantiles", action="store_true",
+                        help="segment thresholds from the stored quantile sketch instead of an exact sort")
+    args = parser.parse_args()
 
-# -------------------------------------------------
-# 5. Unified legend (color + size)
-# -------------------------------------------------
-legend_handles = []
-legend_labels = []
-
-for segment in segment_colors:
-    handle = plt.scatter(
-        [], [],
-        s=segment_sizes[segment],
-        color=segment_colors[segment],
-        edgecolor="black",
-        linewidth=0.7,
-        alpha=0.8
-    )
-    legend_handles.append(handle)
-    legend_labels.append(segment)
-
-ax.legend(
-    legend_handles,
-    legend_labels,
-    title="Customer Segment",
-    loc="upper left",
-    bbox_to_anchor=(1.02, 1),
-    frameon=True
-)
-
-plt.tight_layout(rect=[0, 0, 0.80, 1])
-plt.show()
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(columns=COLUMNS, approx_quantiles=args.approx_quantiles))
+    plt.show()
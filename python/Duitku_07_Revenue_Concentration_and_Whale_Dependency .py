@@ -1,9 +1,18 @@
-import os
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_pipeline import AnalysisContext
+from duitku_store import CUSTOMER_SOURCE_COLUMNS
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["customer_summary"]
+
+# Columns needed when this report runs on its own (a month range aggregates
+# the customer dimension from them)
+COLUMNS = CUSTOMER_SOURCE_COLUMNS
+
 
 # -----------------------------
 # Helper formatter
@@ -12,99 +21,93 @@ def as_percent(x, pos):
     return f"{x:.0f}%"
 
 
-# 0) Load data
-# -------------------------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.normpath(os.path.join(script_directory, "..", "data", "transactions_clean.csv"))
-
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
+def build(ctx):
+    # 1) Safety: required columns (shared customer summary)
+    # -------------------------------------------------------------------
+    df_summary = ctx["customer_summary"]
 
-df = pd.read_csv(csv_file_path)
+    required_cols = ["total_internal_fee"]
+    missing = [c for c in required_cols if c not in df_summary.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
 
-# 1) Safety: enforce types + keep only valid rows
-# -------------------------------------------------------------------
-required_cols = ["customer_id", "fee_internal_amount"]
-missing = [c for c in required_cols if c not in df.columns]
-if missing:
-    raise ValueError(f"Missing required columns: {missing}")
+    # 2) Build Pareto table (Revenue Concentration)
+    # -------------------------------------------------------------------
+    srs_fee_per_customer = (
+        df_summary["total_internal_fee"]
+          .sort_values(ascending=False)
+    )
 
-df["fee_internal_amount"] = pd.to_numeric(df["fee_internal_amount"], errors="coerce")
-df = df.dropna(subset=["customer_id", "fee_internal_amount"]).copy()
+    df_pareto = srs_fee_per_customer.reset_index(name="total_internal_fee")
+    df_pareto["customer_rank"] = np.arange(1, len(df_pareto) + 1)
+    df_pareto["customer_pct"] = df_pareto["customer_rank"] / len(df_pareto)
 
-# Normalize customer_id (avoid "123.0")
-df["customer_id"] = df["customer_id"].astype(str).str.replace(r"\.0$", "", regex=True)
+    total_fee = df_pareto["total_internal_fee"].sum()
+    if total_fee <= 0:
+        raise ValueError("Total internal fee is 0 or negative. Cannot compute Pareto shares.")
 
-# 2) Build Pareto table (Revenue Concentration)
-# -------------------------------------------------------------------
-srs_fee_per_customer = (
-    df.groupby("customer_id")["fee_internal_amount"]
-      .sum()
-      .sort_values(ascending=False)
-)
+    df_pareto["cum_fee"] = df_pareto["total_internal_fee"].cumsum()
+    df_pareto["cum_share"] = df_pareto["cum_fee"] / total_fee
 
-df_pareto = srs_fee_per_customer.reset_index(name="total_internal_fee")
-df_pareto["customer_rank"] = np.arange(1, len(df_pareto) + 1)
-df_pareto["customer_pct"] = df_pareto["customer_rank"] / len(df_pareto)
+    # 3) Key dependency metrics
+    # -------------------------------------------------------------------
+    first_80_row = df_pareto.loc[df_pareto["cum_share"] >= 0.80].iloc[0]
+    top_80_rank = int(first_80_row["customer_rank"])
+    top_80_pct = float(first_80_row["customer_pct"] * 100)
 
-total_fee = df_pareto["total_internal_fee"].sum()
-if total_fee <= 0:
-    raise ValueError("Total internal fee is 0 or negative. Cannot compute Pareto shares.")
+    top_5_count = max(1, int(np.ceil(len(df_pareto) * 0.05)))
+    top_5_share = df_pareto.iloc[:top_5_count]["total_internal_fee"].sum() / total_fee * 100
 
-df_pareto["cum_fee"] = df_pareto["total_internal_fee"].cumsum()
-df_pareto["cum_share"] = df_pareto["cum_fee"] / total_fee
+    top_1_count = max(1, int(np.ceil(len(df_pareto) * 0.01)))
+    top_1_share = df_pareto.iloc[:top_1_count]["total_internal_fee"].sum() / total_fee * 100
 
-# 3) Key dependency metrics
-# -------------------------------------------------------------------
-first_80_row = df_pareto.loc[df_pareto["cum_share"] >= 0.80].iloc[0]
-top_80_rank = int(first_80_row["customer_rank"])
-top_80_pct = float(first_80_row["customer_pct"] * 100)
+    print("\n=== 07 - Revenue Concentration and Whale Dependency ===")
+    print(f"Customers in dataset: {len(df_pareto):,}")
+    print(f"Total internal fee revenue: {total_fee:,.0f}")
 
-top_5_count = max(1, int(np.ceil(len(df_pareto) * 0.05)))
-top_5_share = df_pareto.iloc[:top_5_count]["total_internal_fee"].sum() / total_fee * 100
+    print("\n=== Top 10 Customers by Internal Fee (Revenue) ===")
+    print(df_pareto.head(10))
 
-top_1_count = max(1, int(np.ceil(len(df_pareto) * 0.01)))
-top_1_share = df_pareto.iloc[:top_1_count]["total_internal_fee"].sum() / total_fee * 100
+    print(f"\nCustomers needed to reach 80% of revenue: {top_80_rank:,} ({top_80_pct:.1f}% of customers)")
+    print(f"Top 5% (Whales) revenue share: {top_5_share:.1f}%")
+    print(f"Top 1% revenue share: {top_1_share:.1f}%")
 
-print("\n=== 07 - Revenue Concentration and Whale Dependency ===")
-print(f"Customers in dataset: {len(df_pareto):,}")
-print(f"Total internal fee revenue: {total_fee:,.0f}")
+    # 4) Pareto curve chart
+    # -------------------------------------------------------------------
+    fig, ax = plt.subplots(figsize=(10, 5))
 
-print("\n=== Top 10 Customers by Internal Fee (Revenue) ===")
-print(df_pareto.head(10))
+    x_values = df_pareto["customer_pct"] * 100
+    y_values = df_pareto["cum_share"] * 100
 
-print(f"\nCustomers needed to reach 80% of revenue: {top_80_rank:,} ({top_80_pct:.1f}% of customers)")
-print(f"Top 5% (Whales) revenue share: {top_5_share:.1f}%")
-print(f"Top 1% revenue share: {top_1_share:.1f}%")
+    ax.plot(x_values, y_values, marker="o", markersize=2, linewidth=2)
 
-# 4) Pareto curve chart
-# -------------------------------------------------------------------
-fig, ax = plt.subplots(figsize=(10, 5))
+    ax.axhline(80, color="gray", linestyle="--", linewidth=1)
+    ax.axvline(top_80_pct, color="gray", linestyle="--", linewidth=1)
 
-x_values = df_pareto["customer_pct"] * 100
-y_values = df_pareto["cum_share"] * 100
+    ax.text(
+        top_80_pct,
+        80,
+        f"  {top_80_pct:.1f}% of customers → 80% of revenue",
+        va="bottom",
+        ha="left",
+        fontsize=11,
+        fontweight="bold"
+    )
 
-ax.plot(x_values, y_values, marker="o", markersize=2, linewidth=2)
+    ax.xaxis.set_major_formatter(FuncFormatter(as_percent))
+    ax.yaxis.set_major_formatter(FuncFormatter(as_percent))
 
-ax.axhline(80, color="gray", linestyle="--", linewidth=1)
-ax.axvline(top_80_pct, color="gray", linestyle="--", linewidth=1)
+    ax.set_title("07 – Revenue Concentration (Pareto Curve) and Whale Dependency", fontsize=14)
+    ax.set_xlabel("Cumulative % of Customers")
+    ax.set_ylabel("Cumulative % of Internal Fee Revenue")
 
-ax.text(
-    top_80_pct,
-    80,
-    f"  {top_80_pct:.1f}% of customers → 80% of revenue",
-    va="bottom",
-    ha="left",
-    fontsize=11,
-    fontweight="bold"
-)
+    fig.tight_layout()
+    return fig
 
-ax.xaxis.set_major_formatter(FuncFormatter(as_percent))
-ax.yaxis.set_major_formatter(FuncFormatter(as_percent))
 
-ax.set_title("07 – Revenue Concentration (Pareto Curve) and Whale Dependency", fontsize=14)
-ax.set_xlabel("Cumulative % of Customers")
-ax.set_ylabel("Cumulative % of Internal Fee Revenue")
+if __name__ == "__main__":
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
 
-fig.tight_layout()
-plt.show()
+    build(AnalysisContext(columns=COLUMNS))
+    plt.show()
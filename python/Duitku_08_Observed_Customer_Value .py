@@ -1,9 +1,23 @@
-import os
-import numpy as np
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_pipeline import AnalysisContext, customer_batches
+from duitku_store import CUSTOMER_SOURCE_COLUMNS
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["customer_summary", "customer_value_sketches"]
+
+
+def required_steps(ctx):
+    """--approx-quantiles reads the value sketch and streams customers instead of the customer summary."""
+    return ["customer_value_sketches"] if ctx.approx_quantiles else REQUIRES
+
+# Columns needed when this report runs on its own (a month range aggregates
+# the customer dimension from them)
+COLUMNS = CUSTOMER_SOURCE_COLUMNS
+
 
 # -----------------------------
 # Helper formatters
@@ -12,88 +26,118 @@ def thousands(x, pos):
     return f"{x/1_000:.0f}K"
 
 
-# 0) Load data
-# -------------------------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.normpath(os.path.join(script_directory, "..", "data", "transactions_clean.csv"))
-
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
-
-df = pd.read_csv(csv_file_path)
-
-# 1) Safety: enforce required columns + types
-# -------------------------------------------------------------------
-required_cols = ["id", "customer_id", "fee_internal_amount"]
-missing = [c for c in required_cols if c not in df.columns]
-if missing:
-    raise ValueError(f"Missing required columns: {missing}")
-
-df["fee_internal_amount"] = pd.to_numeric(df["fee_internal_amount"], errors="coerce")
-df = df.dropna(subset=["customer_id", "fee_internal_amount"]).copy()
-
-# Normalize customer_id (avoid "123.0" strings)
-df["customer_id"] = df["customer_id"].astype(str).str.replace(r"\.0$", "", regex=True)
-
-# 2) Compute Observed LTV per customer (within dataset window)
-# -------------------------------------------------------------------
-df_ltv = (
-    df.groupby("customer_id", as_index=False)
-      .agg(
-          observed_ltv=("fee_internal_amount", "sum"),
-          transaction_count=("id", "count")
-      )
-)
-
-# Remove non-positive LTV if any (usually shouldn't exist, but protects plots/stats)
-df_ltv = df_ltv[df_ltv["observed_ltv"] > 0].copy()
-
-if df_ltv.empty:
-    raise ValueError("No customers with positive observed_ltv found after cleaning.")
-
-# 3) Summary statistics (Observed customer value)
-# -------------------------------------------------------------------
-mean_ltv = df_ltv["observed_ltv"].mean()
-median_ltv = df_ltv["observed_ltv"].median()
-
-p90 = df_ltv["observed_ltv"].quantile(0.90)
-p95 = df_ltv["observed_ltv"].quantile(0.95)
-p99 = df_ltv["observed_ltv"].quantile(0.99)
-
-print("\n=== 08 - Observed Customer Value ===")
-print("Observed LTV is computed as total platform internal fee per customer within the dataset window.")
-print(f"Customers: {df_ltv.shape[0]:,}")
-print(f"Mean observed LTV   : IDR {mean_ltv:,.0f}")
-print(f"Median observed LTV : IDR {median_ltv:,.0f}")
-print(f"P90 observed LTV    : IDR {p90:,.0f}")
-print(f"P95 observed LTV    : IDR {p95:,.0f}")
-print(f"P99 observed LTV    : IDR {p99:,.0f}")
-
-# Optional: show top customers by observed LTV for quick sanity check
-print("\nTop 10 customers by observed LTV:")
-print(df_ltv.sort_values("observed_ltv", ascending=False).head(10))
-
-# 4) Plot distribution (histogram)
-# -------------------------------------------------------------------
-fig, ax = plt.subplots(figsize=(10, 5))
-
-ax.hist(
-    df_ltv["observed_ltv"],
-    bins=40,
-    edgecolor="black",
-    alpha=0.85
-)
-
-ax.axvline(mean_ltv, color="red", linestyle="--", linewidth=1.5, label=f"Mean: {mean_ltv:,.0f}")
-ax.axvline(median_ltv, color="green", linestyle="--", linewidth=1.5, label=f"Median: {median_ltv:,.0f}")
-ax.axvline(p90, color="gray", linestyle="--", linewidth=1.0, label=f"P90: {p90:,.0f}")
-
-ax.set_title("08 – Observed Customer Value (Observed LTV Distribution)", fontsize=14)
-ax.set_xlabel("Observed LTV per Customer (Internal Fee Revenue, IDR)")
-ax.set_ylabel("Number of Customers")
-
-ax.xaxis.set_major_formatter(FuncFormatter(thousands))
-ax.legend()
-
-fig.tight_layout()
-plt.show()
+def build(ctx):
+    if ctx.approx_quantiles:
+        return build_approx(ctx)
+
+    # 1) Safety: required columns (shared customer summary)
+    # -------------------------------------------------------------------
+    df_summary = ctx["customer_summary"]
+
+    required_cols = ["total_internal_fee", "transaction_count"]
+    missing = [c for c in required_cols if c not in df_summary.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    # 2) Compute Observed LTV per customer (within dataset window)
+    # -------------------------------------------------------------------
+    df_ltv = (
+        df_summary[["total_internal_fee", "transaction_count"]]
+          .rename(columns={"total_internal_fee": "observed_ltv"})
+          .reset_index()
+    )
+
+    # Remove non-positive LTV if any (usually shouldn't exist, but protects plots/stats)
+    df_ltv = df_ltv[df_ltv["observed_ltv"] > 0].copy()
+
+    if df_ltv.empty:
+        raise ValueError("No customers with positive observed_ltv found after cleaning.")
+
+    # 3) Summary statistics (Observed customer value)
+    # -------------------------------------------------------------------
+    mean_ltv = df_ltv["observed_ltv"].mean()
+
+    median_ltv = df_ltv["observed_ltv"].median()
+
+    p90 = df_ltv["observed_ltv"].quantile(0.90)
+    p95 = df_ltv["observed_ltv"].quantile(0.95)
+    p99 = df_ltv["observed_ltv"].quantile(0.99)
+
+    df_top = df_ltv.sort_values("observed_ltv", ascending=False).head(10)
+    return report(df_ltv.shape[0], mean_ltv, median_ltv, p90, p95, p99, df_top, df_ltv["observed_ltv"])
+
+
+def build_approx(ctx):
+    # --approx-quantiles: statistics from the customer value sketch (positive
+    # totals only) and the top 10 from a running nlargest over customer batches,
+    # so per-customer values are never all in memory
+    # -------------------------------------------------------------------
+    digest = ctx["customer_value_sketches"]["total_internal_fee"]
+    if digest.count == 0:
+        raise ValueError("No customers with positive observed_ltv found after cleaning.")
+
+    median_ltv, p90, p95, p99 = digest.quantile([0.50, 0.90, 0.95, 0.99])
+
+    df_top = None
+    for df in customer_batches(ctx, ["total_internal_fee", "transaction_count"]):
+        df_top = pd.concat([df_top, df]).nlargest(10, "total_internal_fee")
+    df_top = df_top.rename(columns={"total_internal_fee": "observed_ltv"}).reset_index()
+
+    # histogram of the sketch's centroids, weighted by the customers each one holds
+    return report(int(digest.count), digest.mean(), median_ltv, p90, p95, p99, df_top, digest.means, digest.weights)
+
+
+def report(customers, mean_ltv, median_ltv, p90, p95, p99, df_top, hist_values, hist_weights=None):
+    # 3b) Print summary statistics (Observed customer value)
+    # -------------------------------------------------------------------
+    print("\n=== 08 - Observed Customer Value ===")
+    print("Observed LTV is computed as total platform internal fee per customer within the dataset window.")
+    print(f"Customers: {customers:,}")
+    print(f"Mean observed LTV   : IDR {mean_ltv:,.0f}")
+    print(f"Median observed LTV : IDR {median_ltv:,.0f}")
+    print(f"P90 observed LTV    : IDR {p90:,.0f}")
+    print(f"P95 observed LTV    : IDR {p95:,.0f}")
+    print(f"P99 observed LTV    : IDR {p99:,.0f}")
+
+    # Optional: show top customers by observed LTV for quick sanity check
+    print("\nTop 10 customers by observed LTV:")
+    print(df_top)
+
+    # 4) Plot distribution (histogram)
+    # -------------------------------------------------------------------
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    ax.hist(
+        hist_values,
+        weights=hist_weights,
+        bins=40,
+        edgecolor="black",
+        alpha=0.85
+    )
+
+    ax.axvline(mean_ltv, color="red", linestyle="--", linewidth=1.5, label=f"Mean: {mean_ltv:,.0f}")
+    ax.axvline(median_ltv, color="green", linestyle="--", linewidth=1.5, label=f"Median: {median_ltv:,.0f}")
+    ax.axvline(p90, color="gray", linestyle="--", linewidth=1.0, label=f"P90: {p90:,.0f}")
+
+    ax.set_title("08 – Observed Customer Value (Observed LTV Distribution)", fontsize=14)
+    ax.set_xlabel("Observed LTV per Customer (Internal Fee Revenue, IDR)")
+    ax.set_ylabel("Number of Customers")
+
+    ax.xaxis.set_major_formatter(FuncFormatter(thousands))
+    ax.legend()
+
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="08 – Observed customer value.")
+    parser.add_argument("--approx-quantiles", action="store_true",
+                        help="percentiles from the stored quantile sketch instead of an exact sort")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(columns=COLUMNS, approx_quantiles=args.approx_quantiles))
+    plt.show()
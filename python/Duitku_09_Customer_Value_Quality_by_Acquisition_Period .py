@@ -1,9 +1,20 @@
-import os
+import argparse
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_cohorts import GRANULARITIES, COHORT_COLUMNS, period_labels
+from duitku_pipeline import AnalysisContext
+
+# Cohort period: "month" (default, from the aggregate cube), "week" or "day"
+GRANULARITY = "month"
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = [f"cohort_matrices_{GRANULARITY}"]
+
+AGE_UNITS = {"day": "Days", "week": "Weeks", "month": "Months"}
+
 
 # -----------------------------
 # Helper formatter
@@ -12,158 +23,96 @@ def idr(x, pos):
     return f"{x:,.0f}"
 
 
-# 0) Load data
-# -------------------------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.normpath(
-    os.path.join(script_directory, "..", "data", "transactions_clean.csv")
-)
+def build(ctx, granularity=GRANULARITY):
+    # 1-3) Cohort × age matrices (shared cohort engine): cohort = first
+    #      transaction period, revenue per cell, 0 for observed cells where
+    #      nobody was active (so the curve stays FLAT), NaN past the data window
+    # -------------------------------------------------------------------
+    matrices = ctx[f"cohort_matrices_{granularity}"]
+    p_rev = matrices["revenue"]
 
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
+    # 4) Cohort size (ONE value per cohort) = users at age 0
+    # -------------------------------------------------------------------
+    srs_cohort_size = matrices["users"][0]
 
-df = pd.read_csv(csv_file_path)
+    # 5-6) Cumulative revenue → Customer value per acquired customer (within dataset window)
+    #    One pass over the dense cohort × age grid: cumsum along age / cohort size
+    # -------------------------------------------------------------------
+    arr_value = np.cumsum(p_rev.to_numpy(), axis=1) / srs_cohort_size.to_numpy()[:, None]
 
-# 1) Validate required fields (year_month is REQUIRED)
-# -------------------------------------------------------------------
-required_cols = {"customer_id", "year_month", "fee_internal_amount"}
-missing = required_cols - set(df.columns)
-if missing:
-    raise KeyError(
-        f"Missing required columns: {missing}. "
-        f"`year_month` must already exist in transactions_clean.csv"
+    # 7) Value curves: rows = cohort age, columns = cohort
+    # -------------------------------------------------------------------
+    cohort_labels = period_labels(p_rev.index, granularity)
+
+    value_pivot = pd.DataFrame(
+        arr_value.T,
+        index=pd.Index(p_rev.columns, name="cohort_index"),
+        columns=pd.Index(cohort_labels, name=f"cohort_{granularity}"),
     )
 
-# Normalize types
-df["customer_id"] = df["customer_id"].astype(str).str.replace(r"\.0$", "", regex=True)
-df["year_month"] = pd.PeriodIndex(df["year_month"], freq="M")
-df["fee_internal_amount"] = pd.to_numeric(df["fee_internal_amount"], errors="coerce")
-
-df = df.dropna(subset=["customer_id", "year_month", "fee_internal_amount"]).copy()
-df = df[df["fee_internal_amount"] != 0].copy()  # optional: drop zero-fee transactions
-
-# 2) Define cohort month (first transaction month) FROM year_month ONLY
-# -------------------------------------------------------------------
-df["cohort_month"] = df.groupby("customer_id")["year_month"].transform("min")
-
-# 3) Cohort age in months (integer-safe; no timestamps needed)
-# -------------------------------------------------------------------
-df["cohort_index"] = (
-    df["year_month"].astype("int64")
-    - df["cohort_month"].astype("int64")
-)
-
-# 4) Cohort size (ONE value per cohort_month)
-# -------------------------------------------------------------------
-df_cohort_size = (
-    df.groupby("cohort_month")["customer_id"]
-      .nunique()
-      .rename("cohort_size")
-      .reset_index()
-)
-
-# 5) Revenue per cohort & age
-# -------------------------------------------------------------------
-df_cohort_rev = (
-    df.groupby(["cohort_month", "cohort_index"], as_index=False)
-      .agg(period_fee=("fee_internal_amount", "sum"))
-)
-
-# 5b) IMPORTANT FIX: add missing cohort_month x cohort_index cells with zeros
-#     so the curve becomes FLAT when nobody is active that month.
-# -------------------------------------------------------------------
-max_month = df["year_month"].max()
-max_month_ord = max_month.ordinal  # scalar Period -> integer
-
-rows = []
-for cohort_m in df_cohort_size["cohort_month"]:
-    cohort_m_ord = cohort_m.ordinal
-    max_age_for_cohort = int(max_month_ord - cohort_m_ord)
-
-    full_age_index = pd.Index(range(0, max_age_for_cohort + 1), name="cohort_index")
-
-    # reindex ONLY the numeric series (period_fee)
-    srs_fee = (
-        df_cohort_rev.loc[df_cohort_rev["cohort_month"] == cohort_m]
-        .set_index("cohort_index")["period_fee"]
-        .reindex(full_age_index)
-        .fillna(0)
+    # 8) Cohort quality snapshot (last observed period)
+    # -------------------------------------------------------------------
+    arr_last_age = np.isfinite(arr_value).sum(axis=1) - 1
+
+    df_snapshot = (
+        pd.DataFrame({
+            f"cohort_{granularity}": cohort_labels,
+            "cohort_size": srs_cohort_size.to_numpy().astype("int64"),
+            f"{AGE_UNITS[granularity].lower()}_observed": arr_last_age,
+            "customer_value_per_customer": arr_value[np.arange(len(arr_value)), arr_last_age],
+        })
+        .sort_values("customer_value_per_customer", ascending=False)
     )
 
-    grp = srs_fee.reset_index()
-    grp["cohort_month"] = cohort_m
-    rows.append(grp)
-
-df_cohort_rev_full = pd.concat(rows, ignore_index=True)
-
-# Attach cohort size (constant per cohort)
-df_cohort = df_cohort_rev_full.merge(df_cohort_size, on="cohort_month", how="left")
-
-# 6) Cumulative revenue → Customer value per acquired customer (within dataset window)
-# -------------------------------------------------------------------
-df_cohort = df_cohort.sort_values(["cohort_month", "cohort_index"])
-
-df_cohort["cumulative_fee"] = (
-    df_cohort.groupby("cohort_month")["period_fee"].cumsum()
-)
-
-df_cohort["customer_value_per_customer"] = (
-    df_cohort["cumulative_fee"] / df_cohort["cohort_size"]
-)
-
-# 7) Pivot for plotting
-# -------------------------------------------------------------------
-value_pivot = df_cohort.pivot(
-    index="cohort_index",
-    columns="cohort_month",
-    values="customer_value_per_customer"
-).sort_index()
-
-# 8) Cohort quality snapshot (last observed month)
-# -------------------------------------------------------------------
-df_snapshot = (
-    df_cohort.sort_values(["cohort_month", "cohort_index"])
-             .groupby("cohort_month")
-             .tail(1)
-             .sort_values("customer_value_per_customer", ascending=False)
-             [["cohort_month", "cohort_size", "cohort_index", "customer_value_per_customer"]]
-             .rename(columns={"cohort_index": "months_observed"})
-)
-
-print("\n=== 09 - Customer Value Quality by Acquisition Period ===")
-print("Customer value = cumulative internal fee / original cohort size (within dataset window)")
-print("\nCohort quality snapshot:")
-print(df_snapshot.to_string(index=False))
-
-# -------------------------------------------------
-# 9) Plot cohort value curves (exclude last cohort)
-# -------------------------------------------------
-fig, ax = plt.subplots(figsize=(11, 6))
-
-# Business rule: exclude most recent cohort (no runway)
-cohorts_to_plot = value_pivot.columns.sort_values()[:-1]
-
-for cohort_month in cohorts_to_plot:
-    srs = value_pivot[cohort_month].dropna()
-    ax.plot(
-        srs.index,
-        srs.values,
-        marker="o",
-        markersize=3,
-        linewidth=2,
-        label=str(cohort_month)
+    print("\n=== 09 - Customer Value Quality by Acquisition Period ===")
+    print("Customer value = cumulative internal fee / original cohort size (within dataset window)")
+    print("Zero-fee transactions are included: they count toward a customer's first period and the cohort size")
+    print("\nCohort quality snapshot:")
+    print(df_snapshot.to_string(index=False))
+
+    # -------------------------------------------------
+    # 9) Plot cohort value curves (exclude last cohort)
+    # -------------------------------------------------
+    fig, ax = plt.subplots(figsize=(11, 6))
+
+    # Business rule: exclude most recent cohort (no runway)
+    cohorts_to_plot = value_pivot.columns.sort_values()[:-1]
+
+    for cohort in cohorts_to_plot:
+        srs = value_pivot[cohort].dropna()
+        ax.plot(
+            srs.index,
+            srs.values,
+            marker="o",
+            markersize=3,
+            linewidth=2,
+            label=str(cohort)
+        )
+
+    ax.set_title("09 – Customer Value Quality by Acquisition Period", fontsize=14)
+    ax.set_xlabel(f"Cohort Age ({AGE_UNITS[granularity]} Since Acquisition)")
+    ax.set_ylabel("Cumulative Customer Value per Customer (Internal Fee, IDR)")
+    ax.yaxis.set_major_formatter(FuncFormatter(idr))
+
+    ax.legend(
+        title=f"Cohort {granularity.capitalize()}",
+        loc="lower right",
+        frameon=False,
+        ncol=1 + len(cohorts_to_plot) // 16
     )
 
-ax.set_title("09 – Customer Value Quality by Acquisition Period", fontsize=14)
-ax.set_xlabel("Cohort Age (Months Since Acquisition)")
-ax.set_ylabel("Cumulative Customer Value per Customer (Internal Fee, IDR)")
-ax.yaxis.set_major_formatter(FuncFormatter(idr))
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="09 – Customer value quality by acquisition period.")
+    parser.add_argument("--granularity", choices=list(GRANULARITIES), default=GRANULARITY,
+                        help="cohort period (day/week read transactions; month reads the aggregate cube)")
+    args = parser.parse_args()
 
-ax.legend(
-    title="Cohort Month",
-    loc="lower right",
-    frameon=False
-)
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
 
-plt.tight_layout()
-plt.show()
+    build(AnalysisContext(columns=COHORT_COLUMNS), granularity=args.granularity)
+    plt.show()
@@ -1,9 +1,16 @@
-import os
-import numpy as np
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_store import month_labels
+from duitku_forecast import INTERVALS, bootstrap_intervals, monthly_panel, trend_forecast
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["monthly_totals", "monthly_bank_totals"]
+
+
 # ----------------------------
 # Formatter: Millions (M)
 # ----------------------------
@@ -11,64 +18,80 @@ def millions(x, pos):
     return f"{x / 1_000_000:.1f}M"
 
 
-# ----------------------------
-# Load data
-# ----------------------------
-script_dir  = os.path.dirname(os.path.abspath(__file__))
-csv_path    = os.path.join(script_dir, "..", "data", "transactions_clean.csv")
-df          = pd.read_csv(csv_path)
+def build(ctx, intervals=INTERVALS):
+    # ----------------------------
+    # Monthly revenue aggregation
+    # ----------------------------
+    # Shared monthly aggregates as a one-series panel, empty months filled as 0 (like resample("MS"))
+    df_panel = monthly_panel(ctx["monthly_totals"].reset_index(), "fee_internal_amount").rename(columns={"fee_internal_amount": "monthly_revenue"})
 
-df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+    df_monthly = pd.DataFrame({
+        "transaction_date": month_labels(df_panel.index).to_timestamp(),
+        "monthly_revenue": df_panel["monthly_revenue"].to_numpy(),
+    })
 
 
-# ----------------------------
-# Monthly revenue aggregation
-# ----------------------------
-df_monthly = (
-    df.set_index("transaction_date")
-      .resample("MS")
-      .agg(monthly_revenue=("fee_internal_amount", "sum"))
-      .reset_index()
-)
+    # ----------------------------
+    # Trend + forecast (linear trend, next FORECAST_STEPS months)
+    # ----------------------------
+    forecast = trend_forecast(df_panel)
 
-df_monthly["month_index"] = range(len(df_monthly))
+    y = df_monthly["monthly_revenue"].values
+    trend = forecast["fitted"]["monthly_revenue"].to_numpy()
+    future_y = forecast["forecast"]["monthly_revenue"].to_numpy()
+    future_dates = month_labels(forecast["forecast"].index).to_timestamp()
 
+    # Prediction intervals around the forecast (residual bootstrap)
+    bands = bootstrap_intervals(df_panel, intervals=intervals)
 
-# ----------------------------
-# Trend + forecast
-# ----------------------------
-x = df_monthly["month_index"].values
-y = df_monthly["monthly_revenue"].values
+    # Revenue per bank: all bank series fitted in the same vectorized solve
+    df_bank_panel = monthly_panel(ctx["monthly_bank_totals"], "fee_internal_amount", by="category")
+    df_bank_forecast = trend_forecast(df_bank_panel)["forecast"]
+    df_bank_forecast.index = month_labels(df_bank_forecast.index).astype(str)
 
-coeffs = np.polyfit(x, y, deg=1)
-trend = np.polyval(coeffs, x)
 
-future_steps = 3
-future_x = np.arange(len(x), len(x) + future_steps)
-future_y = np.polyval(coeffs, future_x)
+    # ----------------------------
+    # Plot
+    # ----------------------------
+    fig, ax = plt.subplots(figsize=(12, 5))
 
-future_dates = pd.date_range(
-    start=df_monthly["transaction_date"].max() + pd.offsets.MonthBegin(),
-    periods=future_steps,
-    freq="MS"
-)
+    ax.plot(df_monthly["transaction_date"], y, marker="o", label="Actual revenue")
+    ax.plot(df_monthly["transaction_date"], trend, linestyle="--", label="Trend line (historical)")
+    forecast_line, = ax.plot(future_dates, future_y, marker="o", linestyle="--", label="Forecast (next 1–3 months)")
 
+    # widest band first, narrower bands drawn darker on top
+    for i, coverage in enumerate(sorted(bands, reverse=True)):
+        lower, upper = bands[coverage]
+        ax.fill_between(
+            future_dates, lower["monthly_revenue"], upper["monthly_revenue"],
+            color=forecast_line.get_color(), alpha=0.15 * (i + 1), label=f"{coverage:.0%} prediction interval"
+        )
+
+    ax.set_title("Monthly Forecasting for Revenue")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Internal fee revenue")
+    ax.yaxis.set_major_formatter(FuncFormatter(millions))
+
+    plt.xticks(rotation=45)
+    plt.legend()
+    plt.tight_layout()
+
+    # ----------------------------
+    # Revenue forecast per bank (printed once the chart is built)
+    # ----------------------------
+    print("\n=== Forecasted monthly revenue per bank (next months) ===")
+    print(df_bank_forecast.round(0))
+    return fig
 
-# ----------------------------
-# Plot
-# ----------------------------
-fig, ax = plt.subplots(figsize=(12, 5))
 
-ax.plot(df_monthly["transaction_date"], y, marker="o", label="Actual revenue")
-ax.plot(df_monthly["transaction_date"], trend, linestyle="--", label="Trend line (historical)")
-ax.plot(future_dates, future_y, marker="o", linestyle="--", label="Forecast (next 1–3 months)")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="12a – Short-term forecasting for revenue.")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[c * 100 for c in INTERVALS],
+                        help="prediction interval coverages in %% (e.g. 80 95)")
+    args = parser.parse_args()
 
-ax.set_title("Monthly Forecasting for Revenue")
-ax.set_xlabel("Month")
-ax.set_ylabel("Internal fee revenue")
-ax.yaxis.set_major_formatter(FuncFormatter(millions))
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
 
-plt.xticks(rotation=45)
-plt.legend()
-plt.tight_layout()
-plt.show()
+    build(AnalysisContext(), intervals=[c / 100 for c in args.intervals])
+    plt.show()
@@ -1,10 +1,15 @@
-import os
-import sys
-import numpy as np
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 
+from duitku_store import month_labels
+from duitku_forecast import INTERVALS, bootstrap_intervals, monthly_panel, trend_forecast
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["monthly_active_customers"]
+
 
 def thousands(x, pos):
     value = x / 1000
@@ -18,107 +23,109 @@ def billions(x, pos):
     return str(rounded) + "B"
 
 
-# -------------------------------------------------------------------
-# 0. Setup paths and load CSV
-# -------------------------------------------------------------------
-script_directory = os.path.dirname(os.path.abspath(__file__))
-csv_file_path = os.path.join(script_directory, "..", "data", "transactions_clean.csv")
-csv_file_path = os.path.normpath(csv_file_path)
-
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", 1000)
-
-df = pd.read_csv(csv_file_path)
-
-print(df)
-
-# -------------------------------------------------------------------
-# 3c. Monthly Active User Forecasting
-# Estimate future engagement by tracking monthly unique active
-# customers and projecting the next 1–3 months using a simple trend.
-# -------------------------------------------------------------------
-
-# 3c.1 Ensure transaction_date is datetime
-df["transaction_date"] = pd.to_datetime(df["transaction_date"])
-
-# 3c.2 Monthly active customers (unique customer_id per month)
-df_monthly_mau = (
-    df.set_index("transaction_date")
-      .resample("MS")  # MS = Month Start
-      .agg(monthly_active_customers=("customer_id", "nunique"))
-      .reset_index()
-)
-
-print("\n=== Monthly active customers (head) ===")
-print(df_monthly_mau)
-
-# 3c.3 Add month index for linear trend
-df_monthly_mau["month_index"] = range(len(df_monthly_mau))
-
-srs_x_month_index_mau = df_monthly_mau["month_index"].values
-srs_y_mau = df_monthly_mau["monthly_active_customers"].values
-
-# 3c.4 Fit simple linear trend: MAU = a * month_index + b
-srs_coeffs_mau = np.polyfit(srs_x_month_index_mau, srs_y_mau, deg=1)
-srs_mau_trend_fitted = np.polyval(srs_coeffs_mau, srs_x_month_index_mau)
-df_monthly_mau["mau_trend"] = srs_mau_trend_fitted
-
-# 3c.5 Forecast next 1–3 months
-forecast_steps = 3
-srs_future_index_mau = np.arange(
-    len(srs_x_month_index_mau),
-    len(srs_x_month_index_mau) + forecast_steps
-)
-srs_future_forecast_mau = np.polyval(srs_coeffs_mau, srs_future_index_mau)
-
-srs_future_dates_mau = pd.date_range(
-    start=df_monthly_mau["transaction_date"].max() + pd.offsets.MonthBegin(),
-    periods=forecast_steps,
-    freq="MS"
-)
-
-df_mau_forecast = pd.DataFrame({
-    "transaction_date": srs_future_dates_mau,
-    "monthly_active_customers_forecast": srs_future_forecast_mau,
-})
-
-print("\n=== Forecasted monthly active customers (next months) ===")
-print(df_mau_forecast)
-
-# 3c.6 Plot: Actual MAU + trend + forecast
-fig, ax = plt.subplots(figsize=(12, 5))
-
-# Historical MAU
-ax.plot(
-    df_monthly_mau["transaction_date"],
-    df_monthly_mau["monthly_active_customers"],
-    marker="o",
-    linestyle="-",
-    label="Actual MAU",
-)
-
-# Historical trend line
-ax.plot(
-    df_monthly_mau["transaction_date"],
-    df_monthly_mau["mau_trend"],
-    linestyle="--",
-    label="Trend line (historical)",
-)
-
-# Forecasted MAU (next 1–3 months)
-ax.plot(
-    df_mau_forecast["transaction_date"],
-    df_mau_forecast["monthly_active_customers_forecast"],
-    marker="o",
-    linestyle="--",
-    label="Forecast (next 1–3 months)",
-)
-
-ax.set_xlabel("Month")
-ax.set_ylabel("Monthly active customers (unique)")
-ax.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"{x:,.0f}"))
-plt.title("Monthly Forecasting For Active Users")
-plt.xticks(rotation=45)
-plt.legend()
-plt.tight_layout()
-plt.show()
+def build(ctx, intervals=INTERVALS):
+    # -------------------------------------------------------------------
+    # 3c. Monthly Active User Forecasting
+    # Estimate future engagement by tracking monthly unique active
+    # customers and projecting the next 1–3 months using a simple trend.
+    # -------------------------------------------------------------------
+
+    # 3c.1 Monthly active customers (exact from the cube, or daily sketch unions with --approx-distinct)
+    srs_mau = ctx["monthly_active_customers"]
+
+    # 3c.2 Fill empty months with 0 (one-series panel) and use month-start dates
+    df_panel = monthly_panel(srs_mau.rename("monthly_active_customers").reset_index(), "monthly_active_customers")
+
+    df_monthly_mau = pd.DataFrame({
+        "transaction_date": month_labels(df_panel.index).to_timestamp(),
+        "monthly_active_customers": df_panel["monthly_active_customers"].to_numpy(),
+    })
+
+    print("\n=== Monthly active customers (head) ===")
+    print(df_monthly_mau)
+
+    # 3c.3 Add month index for linear trend
+    df_monthly_mau["month_index"] = range(len(df_monthly_mau))
+
+    # 3c.4 Fit simple linear trend: MAU = a * month_index + b, and forecast the next 1–3 months
+    forecast = trend_forecast(df_panel)
+    df_monthly_mau["mau_trend"] = forecast["fitted"]["monthly_active_customers"].to_numpy()
+
+    # 3c.5 Forecast next 1–3 months
+    df_mau_forecast = pd.DataFrame({
+        "transaction_date": month_labels(forecast["forecast"].index).to_timestamp(),
+        "monthly_active_customers_forecast": forecast["forecast"]["monthly_active_customers"].to_numpy(),
+    })
+
+    # 3c.5b Prediction intervals (residual bootstrap), e.g. lower_80 / upper_80
+    bands = bootstrap_intervals(df_panel, intervals=intervals)
+    for coverage, (lower, upper) in bands.items():
+        df_mau_forecast[f"lower_{coverage * 100:g}"] = lower["monthly_active_customers"].to_numpy()
+        df_mau_forecast[f"upper_{coverage * 100:g}"] = upper["monthly_active_customers"].to_numpy()
+
+    print("\n=== Forecasted monthly active customers (next months) ===")
+    print(df_mau_forecast)
+
+    # 3c.6 Plot: Actual MAU + trend + forecast
+    fig, ax = plt.subplots(figsize=(12, 5))
+
+    # Historical MAU
+    ax.plot(
+        df_monthly_mau["transaction_date"],
+        df_monthly_mau["monthly_active_customers"],
+        marker="o",
+        linestyle="-",
+        label="Actual MAU",
+    )
+
+    # Historical trend line
+    ax.plot(
+        df_monthly_mau["transaction_date"],
+        df_monthly_mau["mau_trend"],
+        linestyle="--",
+        label="Trend line (historical)",
+    )
+
+    # Forecasted MAU (next 1–3 months)
+    forecast_line, = ax.plot(
+        df_mau_forecast["transaction_date"],
+        df_mau_forecast["monthly_active_customers_forecast"],
+        marker="o",
+        linestyle="--",
+        label="Forecast (next 1–3 months)",
+    )
+
+    # Prediction interval bands (widest first, narrower drawn darker on top)
+    for i, coverage in enumerate(sorted(bands, reverse=True)):
+        ax.fill_between(
+            df_mau_forecast["transaction_date"],
+            df_mau_forecast[f"lower_{coverage * 100:g}"],
+            df_mau_forecast[f"upper_{coverage * 100:g}"],
+            color=forecast_line.get_color(),
+            alpha=0.15 * (i + 1),
+            label=f"{coverage:.0%} prediction interval",
+        )
+
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Monthly active customers (unique)")
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, pos: f"{x:,.0f}"))
+    plt.title("Monthly Forecasting For Active Users")
+    plt.xticks(rotation=45)
+    plt.legend()
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="12c – Short-term forecasting for active users.")
+    parser.add_argument("--approx-distinct", action="store_true",
+                        help="monthly active customers from the daily HyperLogLog sketches")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[c * 100 for c in INTERVALS],
+                        help="prediction interval coverages in %% (e.g. 80 95)")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(approx_distinct=args.approx_distinct), intervals=[c / 100 for c in args.intervals])
+    plt.show()
@@ -0,0 +1,140 @@
+import argparse
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_store import day_dates
+from duitku_engagement import RECENCY_SEGMENTS
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["engagement_daily", "daily_active_customers"]
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def thousands(x, pos):
+    """
+    Format axis labels:
+    - >= 1,000 -> show in K (e.g., 1.2K, 12K)
+    - <  1,000 -> show as integer (e.g., 120)
+    """
+    if x < 1000:
+        return f"{int(x):d}"
+    return f"{x/1000:.1f}K".rstrip("0").rstrip(".")
+
+
+def percent(x, pos):
+    return f"{x * 100:.0f}%"
+
+
+def build(ctx):
+    # 1) Daily recency segments (one sweep over customer activity, shared step)
+    # -------------------------------------------------------------------
+    df_daily = ctx["engagement_daily"].copy()
+
+    if df_daily.empty:
+        raise ValueError("No customer activity found.")
+
+    active_label, at_risk_label, inactive_label = [label for label, _, _ in RECENCY_SEGMENTS]
+
+    # 2) Active rates over customers acquired so far
+    # -------------------------------------------------------------------
+    # Active ≤7d = recency within 7 days; active ≤30d adds the at-risk segment
+    df_daily["customers"] = df_daily[[active_label, at_risk_label, inactive_label]].sum(axis=1)
+    df_daily["active_7d_rate"]  = df_daily[active_label] / df_daily["customers"]
+    df_daily["active_30d_rate"] = (df_daily[active_label] + df_daily[at_risk_label]) / df_daily["customers"]
+
+    df_daily.index = day_dates(df_daily.index)
+    df_daily.index.name = "date"
+
+    print("\n=== 13 - Daily Customer Engagement Trend ===")
+    print(f"Days: {len(df_daily):,} ({df_daily.index.min().date()} → {df_daily.index.max().date()})")
+
+    print("\nDaily engagement health (last 14 days):")
+    print(df_daily.tail(14).round({"active_7d_rate": 3, "active_30d_rate": 3}))
+
+    srs_active_30d = df_daily[active_label] + df_daily[at_risk_label]
+    peak_day = srs_active_30d.idxmax()
+    print("\nEngagement KPIs:")
+    print(f"- Peak 30-day active customers: {srs_active_30d.max():,} on {peak_day.date()} "
+          f"({df_daily.loc[peak_day, 'active_30d_rate']*100:.1f}% of customers acquired so far)")
+    print(f"- Latest 7-day active rate    : {df_daily['active_7d_rate'].iloc[-1]*100:.1f}%")
+    print(f"- Latest 30-day active rate   : {df_daily['active_30d_rate'].iloc[-1]*100:.1f}%")
+
+    # 3) Rolling distinct active customers (DAU / WAU / MAU, shared step) and
+    #    stickiness = DAU / MAU (share of the month's customers active on the day)
+    # -------------------------------------------------------------------
+    df_active = ctx["daily_active_customers"].copy()
+    df_active["stickiness"] = (df_active["dau"] / df_active["mau"]).where(df_active["mau"] > 0)
+    df_active.index = day_dates(df_active.index)
+    df_active.index.name = "date"
+
+    print("\nRolling active customers (last 14 days):")
+    print(df_active.tail(14).round({"stickiness": 3}))
+
+    latest = df_active.iloc[-1]
+    print(f"- Latest DAU / WAU / MAU      : {latest['dau']:,.0f} / {latest['wau']:,.0f} / {latest['mau']:,.0f}")
+    print(f"- Latest stickiness (DAU/MAU) : {latest['stickiness']*100:.1f}%")
+    print(f"- Average stickiness          : {df_active['stickiness'].mean()*100:.1f}%")
+
+    # 4) Chart: segment counts (stacked) + active rates + DAU / WAU / MAU
+    # -------------------------------------------------------------------
+    fig, (ax_counts, ax_rates, ax_active) = plt.subplots(3, 1, figsize=(12, 11), sharex=True)
+
+    ax_counts.stackplot(
+        df_daily.index,
+        df_daily[active_label], df_daily[at_risk_label], df_daily[inactive_label],
+        labels=[active_label, at_risk_label, inactive_label],
+        colors=["tab:green", "tab:orange", "tab:gray"],
+        alpha=0.8,
+    )
+    ax_counts.set_title("13 – Daily Customer Engagement Health", fontsize=14)
+    ax_counts.set_ylabel("Number of customers")
+    ax_counts.yaxis.set_major_formatter(FuncFormatter(thousands))
+    ax_counts.legend(loc="upper left")
+    ax_counts.grid(True, linestyle="--", alpha=0.4)
+
+    ax_rates.plot(df_daily.index, df_daily["active_7d_rate"], label="7-day active rate", linewidth=2)
+    ax_rates.plot(df_daily.index, df_daily["active_30d_rate"], label="30-day active rate", linewidth=2)
+    ax_rates.set_ylabel("Share of customers acquired so far")
+    ax_rates.yaxis.set_major_formatter(FuncFormatter(percent))
+    ax_rates.set_ylim(0, 1)
+    ax_rates.legend(loc="upper right")
+    ax_rates.grid(True, linestyle="--", alpha=0.4)
+
+    for col, label in [("mau", "MAU (30 days)"), ("wau", "WAU (7 days)"), ("dau", "DAU")]:
+        ax_active.plot(df_active.index, df_active[col], label=label, linewidth=1.5)
+    ax_active.set_xlabel("Date")
+    ax_active.set_ylabel("Distinct active customers")
+    ax_active.yaxis.set_major_formatter(FuncFormatter(thousands))
+    ax_active.grid(True, linestyle="--", alpha=0.4)
+
+    ax_sticky = ax_active.twinx()
+    # daily stickiness swings with single-day DAU: plot its 7-day average
+    ax_sticky.plot(df_active.index, df_active["stickiness"].rolling(7, min_periods=1).mean(),
+                   color="black", linestyle="--", linewidth=1, label="Stickiness (DAU/MAU, 7-day avg)")
+    ax_sticky.set_ylabel("Stickiness (DAU / MAU)")
+    ax_sticky.yaxis.set_major_formatter(FuncFormatter(percent))
+    ax_sticky.set_ylim(bottom=0)
+
+    handles, labels = ax_active.get_legend_handles_labels()
+    sticky_handles, sticky_labels = ax_sticky.get_legend_handles_labels()
+    ax_active.legend(handles + sticky_handles, labels + sticky_labels, loc="upper right")
+
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="13 – Daily customer engagement trend.")
+    parser.add_argument("--approx-distinct", action="store_true",
+                        help="DAU / WAU / MAU from the daily HyperLogLog sketches")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(approx_distinct=args.approx_distinct))
+    plt.show()
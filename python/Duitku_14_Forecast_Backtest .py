@@ -0,0 +1,94 @@
+import argparse
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_backtest import backtest, summarize_backtest
+from duitku_forecast import monthly_panel
+from duitku_store import month_labels
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["monthly_totals", "monthly_active_customers", "monthly_bank_totals"]
+
+# The 12a / 12b / 12c series (panel column -> chart title)
+SERIES = {
+    "revenue":          "Revenue (12a)",
+    "volume":           "Transaction Volume (12b)",
+    "active_customers": "Active Users (12c)",
+}
+
+
+def percent(x, pos):
+    return f"{x * 100:.0f}%"
+
+
+def build(ctx, workers=1, time_budget=None):
+    # -------------------------------------------------------------------
+    # 1. Panel: the 12a/b/c monthly series + revenue per bank
+    # -------------------------------------------------------------------
+    df_totals = ctx["monthly_totals"].reset_index()
+    df_panel = pd.concat([
+        monthly_panel(df_totals, "fee_internal_amount").rename(columns={"fee_internal_amount": "revenue"}),
+        monthly_panel(df_totals, "net_amount").rename(columns={"net_amount": "volume"}),
+        monthly_panel(ctx["monthly_active_customers"].reset_index(), "customers").rename(columns={"customers": "active_customers"}),
+        monthly_panel(ctx["monthly_bank_totals"], "fee_internal_amount", by="category").add_prefix("revenue_"),
+    ], axis=1).fillna(0)
+
+    # -------------------------------------------------------------------
+    # 2. Rolling-origin backtest (every origin with >= 3 months of history)
+    # -------------------------------------------------------------------
+    df_errors, skipped = backtest(df_panel, workers=workers, time_budget=time_budget)
+
+    print("\n=== 14 - Forecast Backtest (rolling origin) ===")
+    print(f"Series: {df_panel.shape[1]}, months: {month_labels([df_panel.index.min()])[0]} → {month_labels([df_panel.index.max()])[0]}")
+    if skipped:
+        print(f"Origins skipped (time budget): {[str(m) for m in month_labels(skipped)]}")
+
+    df_scores = summarize_backtest(df_errors, by=["series", "model", "horizon"])
+
+    # MAE is in IDR for revenue and volume, in customers for active users
+    df_print = df_scores.loc[list(SERIES)].round({"mape": 3})
+    df_print["mae"] = [
+        f"{mae:,.0f}" if series == "active_customers" else f"IDR {mae:,.0f}"
+        for series, mae in zip(df_print.index.get_level_values("series"), df_print["mae"])
+    ]
+    print("\nMAPE / MAE by series, model and horizon (months ahead):")
+    print(df_print)
+
+    print("\nMAPE by model and horizon, all series:")
+    print(summarize_backtest(df_errors)["mape"].unstack("horizon").round(3))
+
+    # -------------------------------------------------------------------
+    # 3. Chart: MAPE per horizon, one panel per 12a/b/c series
+    # -------------------------------------------------------------------
+    fig, axes = plt.subplots(1, len(SERIES), figsize=(15, 5), sharey=True)
+
+    for ax, (series, title) in zip(axes, SERIES.items()):
+        df_mape = df_scores.loc[series, "mape"].unstack("model")
+        df_mape.plot(kind="bar", ax=ax, rot=0, edgecolor="black")
+
+        ax.set_title(title)
+        ax.set_xlabel("Horizon (months ahead)")
+        ax.yaxis.set_major_formatter(FuncFormatter(percent))
+        ax.grid(True, axis="y", linestyle="--", alpha=0.4)
+        ax.legend(title="Model")
+
+    axes[0].set_ylabel("MAPE (held-out months)")
+    fig.suptitle("14 – Forecast Backtest: Trend vs Baselines", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="14 – Rolling-origin forecast backtest.")
+    parser.add_argument("--workers", type=int, default=1, help="fit origins in this many processes")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds; origins not fitted in time are skipped (fitted ones stay cached)")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(), workers=args.workers, time_budget=args.time_budget)
+    plt.show()
@@ -0,0 +1,112 @@
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_store import day_dates
+from duitku_forecast import DAILY_FORECAST_DAYS, SEASON_DAYS, seasonal_forecast
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["daily_totals", "daily_active_customers"]
+
+# Daily series (panel column -> chart title)
+SERIES = {
+    "revenue":          "Daily Revenue (internal fee)",
+    "volume":           "Daily Transaction Volume",
+    "active_customers": "Daily Active Users",
+}
+
+# Days of history shown before the forecast
+HISTORY_DAYS = 120
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def compact(x, pos):
+    """Format axis labels as 1.2K / 3.4M / 5.6B."""
+    for scale, suffix in [(1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")]:
+        if abs(x) >= scale:
+            return f"{x / scale:.1f}{suffix}"
+    return f"{x:.0f}"
+
+
+def build(ctx, days=DAILY_FORECAST_DAYS):
+    # -------------------------------------------------------------------
+    # 1. Daily panel: revenue, volume and active customers per day code
+    # -------------------------------------------------------------------
+    df_totals = ctx["daily_totals"]
+    df_panel = pd.concat([
+        df_totals["fee_internal_amount"].rename("revenue"),
+        df_totals["net_amount"].rename("volume"),
+        ctx["daily_active_customers"]["dau"].rename("active_customers"),
+    ], axis=1).fillna(0)
+
+    if df_panel.empty:
+        raise ValueError("No daily transactions found.")
+
+    # -------------------------------------------------------------------
+    # 2. Weekly-seasonal forecast (weekday effects + damped smoothed trend)
+    # -------------------------------------------------------------------
+    forecast = seasonal_forecast(df_panel, steps=days)
+
+    print("\n=== 15 - Daily Seasonal Forecast ===")
+    print(f"History: {len(df_panel):,} days ({day_dates([df_panel.index.min()])[0].date()} → "
+          f"{day_dates([df_panel.index.max()])[0].date()}), forecast: next {days} days")
+
+    df_weekday = forecast["seasonal"].copy()
+    df_weekday.index = day_dates(np.arange(SEASON_DAYS)).day_name()
+    df_weekday.index.name = "weekday"
+    print("\nWeekday effect vs. a typical day (added to the deseasonalised level):")
+    print(df_weekday.round(0) + 0)
+
+    print("\nSmoothing constant (alpha) chosen per series:")
+    print(forecast["alpha"].round(2))
+
+    # revenue, volume and customer counts cannot go below zero
+    df_forecast = forecast["forecast"].clip(lower=0)
+    print("\nForecast totals:")
+    print(pd.DataFrame({
+        f"next {n} days": df_forecast.iloc[:n].sum() for n in sorted({7, 30, days}) if n <= days
+    }).round(0))
+
+    # -------------------------------------------------------------------
+    # 3. Chart: recent history + forecast, one panel per series
+    # -------------------------------------------------------------------
+    df_recent = df_panel.iloc[-HISTORY_DAYS:]
+    history_dates  = day_dates(df_recent.index)
+    forecast_dates = day_dates(df_forecast.index)
+
+    fig, axes = plt.subplots(len(SERIES), 1, figsize=(12, 10), sharex=True)
+
+    for ax, (series, title) in zip(axes, SERIES.items()):
+        ax.plot(history_dates, df_recent[series], linewidth=1, label="Actual")
+        ax.plot(history_dates, forecast["fitted"][series].iloc[-HISTORY_DAYS:], linestyle="--", linewidth=1,
+                alpha=0.7, label="One-step-ahead fit")
+        ax.plot(forecast_dates, df_forecast[series], linewidth=1.5, label=f"Forecast (next {days} days)")
+
+        ax.set_title(title)
+        ax.yaxis.set_major_formatter(FuncFormatter(compact))
+        ax.grid(True, linestyle="--", alpha=0.4)
+        ax.legend(loc="upper left")
+
+    axes[-1].set_xlabel("Date")
+    fig.suptitle("15 – Daily Forecast with Weekly Seasonality", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="15 – Daily forecast with weekly seasonality.")
+    parser.add_argument("--days", type=int, default=DAILY_FORECAST_DAYS, help="days to forecast (e.g. 30–90)")
+    parser.add_argument("--approx-distinct", action="store_true",
+                        help="daily active customers from the daily HyperLogLog sketches")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(approx_distinct=args.approx_distinct), days=args.days)
+    plt.show()
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from duitku_store import month_labels
+from duitku_transitions import NEW_CUSTOMER, TRANSITION_COLUMNS, bank_flows, transition_matrix
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["monthly_bank_transitions"]
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def percent(x, pos):
+    return f"{x * 100:.0f}%"
+
+
+def draw_flows(ax, df_flows, sources, targets, colors, gap=0.04):
+    """
+    Sankey-style flow diagram: sources stacked on the left, targets on the
+    right, one ribbon per (source, target) with height proportional to its count.
+    """
+    total = df_flows["transitions"].sum()
+    out_total = df_flows.groupby("from_bank")["transitions"].sum().reindex(sources, fill_value=0) / total
+    in_total  = df_flows.groupby("to_bank")["transitions"].sum().reindex(targets, fill_value=0) / total
+
+    def node_tops(heights):
+        tops, top = {}, 1 + gap * (len(heights) - 1)
+        for name, height in heights.items():
+            tops[name] = top
+            top -= height + gap
+        return tops
+
+    left_tops, right_tops = node_tops(out_total), node_tops(in_total)
+    left_next, right_next = dict(left_tops), dict(right_tops)
+
+    # ribbons: smoothstep curves between the two node columns
+    x = np.linspace(0.05, 0.95, 100)
+    u = (x - x[0]) / (x[-1] - x[0])
+    ease = 3 * u ** 2 - 2 * u ** 3
+    for row in df_flows.sort_values(["from_bank", "to_bank"]).itertuples():
+        height = row.transitions / total
+        y_left, y_right = left_next[row.from_bank], right_next[row.to_bank]
+        top = y_left + (y_right - y_left) * ease
+        ax.fill_between(x, top - height, top, color=colors[row.from_bank], alpha=0.45, linewidth=0)
+        left_next[row.from_bank]  -= height
+        right_next[row.to_bank]   -= height
+
+    # nodes + labels
+    for tops, heights, x_node, align in [(left_tops, out_total, 0.0, "right"), (right_tops, in_total, 0.95, "left")]:
+        for name, height in heights.items():
+            if height == 0:
+                continue
+            ax.bar(x_node + 0.025, height, width=0.05, bottom=tops[name] - height, color=colors[name], edgecolor="black")
+            x_text = x_node - 0.01 if align == "right" else x_node + 0.06
+            ax.text(x_text, tops[name] - height / 2, f"{name}\n{height * total:,.0f}", ha=align, va="center", fontsize=9)
+
+    ax.set_xlim(-0.35, 1.3)
+    ax.axis("off")
+
+
+def build(ctx):
+    # -------------------------------------------------------------------
+    # 1. Transitions between consecutive top-ups (shared step, one sort)
+    # -------------------------------------------------------------------
+    df_transitions = ctx["monthly_bank_transitions"].copy()
+
+    if df_transitions.empty:
+        raise ValueError("No transactions found.")
+
+    banks = sorted(set(df_transitions["to_bank"]))
+
+    # -------------------------------------------------------------------
+    # 2. Transition matrices: counts and row shares (where the next top-up goes)
+    # -------------------------------------------------------------------
+    df_matrix = transition_matrix(df_transitions).reindex(index=banks + [NEW_CUSTOMER], columns=banks, fill_value=0)
+    df_matrix_share = df_matrix.div(df_matrix.sum(axis=1), axis=0)
+
+    print("\n=== 16 - Bank Switching Flows ===")
+    print("\nTransition matrix (rows = bank of the previous top-up, columns = bank of the next top-up):")
+    print(df_matrix)
+    print("\nTransition matrix, row shares:")
+    print(df_matrix_share.round(3))
+
+    # -------------------------------------------------------------------
+    # 3. Per-bank monthly flows: new customers vs switching
+    # -------------------------------------------------------------------
+    df_flows = bank_flows(df_transitions).reset_index()
+    df_flows["year_month"] = month_labels(df_flows["year_month"])
+
+    print("\nMonthly flows per bank:")
+    print(df_flows.set_index(["year_month", "bank"]))
+
+    df_bank_totals = df_flows.groupby("bank")[["new_customers", "repeat", "switched_in", "switched_out", "net_switching"]].sum()
+    print("\nTotals per bank:")
+    print(df_bank_totals)
+
+    # -------------------------------------------------------------------
+    # 4. Chart: Sankey of new customers + switches, monthly gains per bank
+    # -------------------------------------------------------------------
+    colors = {bank: plt.cm.tab10(i) for i, bank in enumerate(banks)}
+    colors[NEW_CUSTOMER] = "lightgray"
+
+    fig, (ax_flows, ax_gain) = plt.subplots(1, 2, figsize=(15, 6), gridspec_kw={"width_ratios": [1, 1.2]})
+
+    # repeat top-ups on the same bank are left out so switching stays visible
+    df_moves = (
+        df_transitions[df_transitions["from_bank"] != df_transitions["to_bank"]]
+            .groupby(["from_bank", "to_bank"], as_index=False)["transitions"].sum()
+    )
+    draw_flows(ax_flows, df_moves, [NEW_CUSTOMER] + banks, banks, colors)
+    ax_flows.set_title("First top-ups and bank switches (all months)")
+
+    # per month: new customers (solid) and net switching (hatched) per bank, side by side
+    df_new = df_flows.pivot(index="year_month", columns="bank", values="new_customers").reindex(columns=banks).fillna(0)
+    df_net = df_flows.pivot(index="year_month", columns="bank", values="net_switching").reindex(columns=banks).fillna(0)
+    x = np.arange(len(df_new))
+    width = 0.8 / len(banks)
+    for i, bank in enumerate(banks):
+        ax_gain.bar(x + i * width, df_new[bank], width, color=colors[bank], label=f"{bank} – new")
+        ax_gain.bar(x + i * width, df_net[bank], width, color="none", edgecolor=colors[bank], hatch="///",
+                    bottom=np.where(df_net[bank] > 0, df_new[bank], 0), label=f"{bank} – net switching")
+
+    ax_gain.axhline(0, color="black", linewidth=0.8)
+    ax_gain.set_xticks(x + width * (len(banks) - 1) / 2)
+    ax_gain.set_xticklabels(df_new.index.astype(str), rotation=45)
+    ax_gain.set_title("New customers and net switching per bank")
+    ax_gain.set_xlabel("Month")
+    ax_gain.set_ylabel("Top-ups")
+    ax_gain.legend(fontsize=8, ncol=2)
+    ax_gain.grid(True, axis="y", linestyle="--", alpha=0.4)
+
+    fig.suptitle("16 – Bank Switching Flows", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(columns=TRANSITION_COLUMNS))
+    plt.show()
@@ -0,0 +1,121 @@
+import argparse
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_store import cube_margins, month_labels
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["margin_cells"]
+
+# Dimensions a margin table can be sliced by (cube column -> printed name)
+DIMENSIONS = {
+    "year_month":   "year_month",
+    "category":     "bank",
+    "cohort_month": "cohort_month",
+}
+RATE_COLUMNS = ["fee_per_idr", "net_take_rate", "partner_fee_share"]
+
+
+# -------------------------------------------------
+# Helper formatters
+# -------------------------------------------------
+def millions(x, pos):
+    return f"{x / 1_000_000:,.1f}M"
+
+
+def percent(x, pos):
+    return f"{x * 100:.2f}%"
+
+
+def margin_table(df_cells, by):
+    """Margins per `by` slice with month codes as labels and readable column names."""
+    df = cube_margins(df_cells, list(by)).reset_index()
+    for col in ["year_month", "cohort_month"]:
+        if col in df.columns:
+            df[col] = month_labels(df[col])
+    return df.rename(columns=DIMENSIONS).set_index([DIMENSIONS[col] for col in by])
+
+
+def build(ctx, by=None):
+    # -------------------------------------------------
+    # 1. Fee sums per (month, cohort, bank) cube cell (no transaction scan)
+    # -------------------------------------------------
+    df_cells = ctx["margin_cells"]
+
+    if df_cells.empty:
+        raise ValueError("No transactions found.")
+
+    # -------------------------------------------------
+    # 2. Margin tables: ratios recomputed from summed cells per slice
+    # -------------------------------------------------
+    df_month = margin_table(df_cells, ["year_month"])
+    df_bank  = margin_table(df_cells, ["category"])
+    df_month_bank = margin_table(df_cells, ["year_month", "category"])
+
+    rounding = {col: 5 for col in RATE_COLUMNS}
+    print("\n=== 17 - Fee Margin and Take Rate ===")
+    print("net_fee = internal - external fee; fee_per_idr = internal fee / net_amount; "
+          "net_take_rate = net_fee / net_amount; partner_fee_share = external fee / total fee")
+
+    print("\nMargins by month:")
+    print(df_month.round(rounding))
+
+    print("\nMargins by bank:")
+    print(df_bank.round(rounding))
+
+    print("\nMargins by cohort month:")
+    print(margin_table(df_cells, ["cohort_month"]).round(rounding))
+
+    if by:
+        print(f"\nMargins by {' × '.join(DIMENSIONS[col] for col in by)}:")
+        print(margin_table(df_cells, by).round(rounding))
+
+    # -------------------------------------------------
+    # 3. Plot: internal vs partner fees and net fee per month + net take rate per bank
+    # -------------------------------------------------
+    fig, (ax_fees, ax_rate) = plt.subplots(1, 2, figsize=(15, 6))
+
+    months = df_month.index.astype(str)
+    ax_fees.bar(months, df_month["fee_internal_amount"], width=0.6, label="Internal fee (revenue)")
+    ax_fees.bar(months, -df_month["fee_external_amount"], width=0.6, label="External fee (partner cost)")
+    ax_fees.plot(months, df_month["net_fee"], color="black", marker="o", linewidth=2, label="Net fee")
+    ax_fees.axhline(0, color="grey", linewidth=1)
+    ax_fees.set_title("Fee revenue and partner cost per month")
+    ax_fees.set_xlabel("Month")
+    ax_fees.set_ylabel("Fees (IDR)")
+    ax_fees.yaxis.set_major_formatter(FuncFormatter(millions))
+    ax_fees.tick_params(axis="x", rotation=45)
+    ax_fees.grid(True, axis="y", linestyle="--", alpha=0.4)
+    ax_fees.legend(loc="lower left")
+
+    df_rate = df_month_bank["net_take_rate"].unstack("bank")
+    for bank in df_rate.columns:
+        ax_rate.plot(df_rate.index.astype(str), df_rate[bank], marker="o", linewidth=2, label=bank)
+    ax_rate.plot(months, df_month["net_take_rate"], color="black", linestyle="--", linewidth=1.5, label="All banks")
+    ax_rate.axhline(0, color="grey", linewidth=1)
+    ax_rate.set_title("Net take rate (internal - external fee per IDR loaded)")
+    ax_rate.set_xlabel("Month")
+    ax_rate.set_ylabel("Net take rate")
+    ax_rate.yaxis.set_major_formatter(FuncFormatter(percent))
+    ax_rate.tick_params(axis="x", rotation=45)
+    ax_rate.grid(True, linestyle="--", alpha=0.4)
+    ax_rate.legend(title="Bank")
+
+    fig.suptitle("17 – Fee Margin and Take Rate", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="17 – Fee margin and take rate.")
+    parser.add_argument("--by", nargs="+", choices=list(DIMENSIONS), default=None,
+                        help="also print margins for this slice, e.g. --by category cohort_month")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(), by=args.by)
+    plt.show()
@@ -0,0 +1,102 @@
+import argparse
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_ltv import LTV_COLUMNS, LTV_HORIZON_DAYS, score_customers
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["customer_ltv_statistics"]
+
+
+# -----------------------------
+# Helper formatters
+# -----------------------------
+def thousands(x, pos):
+    return f"{x/1_000:.0f}K"
+
+
+def percent(x, pos):
+    return f"{x * 100:.0f}%"
+
+
+def build(ctx, horizon=LTV_HORIZON_DAYS):
+    # 1) Per-customer frequency / recency / T / monetary (shared step)
+    # -------------------------------------------------------------------
+    df_stats = ctx["customer_ltv_statistics"]
+
+    if df_stats.empty:
+        raise ValueError("No customers found.")
+
+    # 2) Fit BG/NBD + Gamma-Gamma and score every customer
+    # -------------------------------------------------------------------
+    df_scores, params = score_customers(df_stats, horizon=horizon)
+    df_scores["cohort_month"] = pd.PeriodIndex.from_ordinals(df_scores["first_tx_date"], freq="D").asfreq("M")
+
+    print("\n=== 18 - Predictive Customer Value ===")
+    print("Predicted value = expected repeat active days in the horizon × expected internal fee per active day.")
+    print(f"Customers: {len(df_scores):,}, horizon: next {horizon} days")
+    print("\nBG/NBD parameters     : " + ", ".join(f"{k}={v:.4g}" for k, v in params["bgnbd"].items()))
+    print("Gamma-Gamma parameters: " + ", ".join(f"{k}={v:.4g}" for k, v in params["gamma_gamma"].items()))
+
+    print()
+    for label, value in [
+        (f"Predicted fee, next {horizon} days", f"IDR {df_scores['predicted_fee'].sum():,.0f}"),
+        ("Observed fee to date", f"IDR {df_scores['observed_fee'].sum():,.0f}"),
+        ("Customers likely alive (>50%)", f"{(df_scores['p_alive'] > 0.5).sum():,}"),
+    ]:
+        print(f"{label:<32}: {value}")
+
+    # 3) Observed vs predicted value per acquisition cohort
+    # -------------------------------------------------------------------
+    df_cohort = df_scores.groupby("cohort_month").agg(
+        customers=("observed_fee", "size"),
+        observed_fee=("observed_fee", "mean"),
+        predicted_fee=("predicted_fee", "mean"),
+        expected_transactions=("expected_transactions", "mean"),
+        p_alive=("p_alive", "mean"),
+    )
+    print("\nPer customer, by acquisition cohort (observed to date vs predicted next period):")
+    print(df_cohort.round({"observed_fee": 0, "predicted_fee": 0, "expected_transactions": 2, "p_alive": 3}))
+
+    print(f"\nTop 10 customers by predicted fee (next {horizon} days):")
+    print(df_scores.sort_values("predicted_fee", ascending=False).head(10).round(
+        {"monetary": 0, "p_alive": 3, "expected_transactions": 2, "expected_fee": 0, "predicted_fee": 0}
+    ))
+
+    # 4) Plot: cohort value (observed vs predicted) + P(alive) distribution
+    # -------------------------------------------------------------------
+    fig, (ax_value, ax_alive) = plt.subplots(1, 2, figsize=(15, 6))
+
+    df_cohort[["observed_fee", "predicted_fee"]].rename(columns={
+        "observed_fee":  "Observed to date",
+        "predicted_fee": f"Predicted, next {horizon} days",
+    }).plot(kind="bar", ax=ax_value, rot=45, edgecolor="black")
+    ax_value.set_title("Internal fee per customer by acquisition cohort")
+    ax_value.set_xlabel("Cohort month")
+    ax_value.set_ylabel("IDR per customer")
+    ax_value.yaxis.set_major_formatter(FuncFormatter(thousands))
+    ax_value.grid(True, axis="y", linestyle="--", alpha=0.4)
+
+    ax_alive.hist(df_scores["p_alive"], bins=20, range=(0, 1), edgecolor="black", alpha=0.85)
+    ax_alive.set_title("Probability a customer is still active (BG/NBD)")
+    ax_alive.set_xlabel("P(alive)")
+    ax_alive.set_ylabel("Number of customers")
+    ax_alive.xaxis.set_major_formatter(FuncFormatter(percent))
+
+    fig.suptitle("18 – Predictive Customer Value (BG/NBD + Gamma-Gamma)", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="18 – Predictive customer value.")
+    parser.add_argument("--horizon", type=int, default=LTV_HORIZON_DAYS, help="days ahead to predict value for")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(columns=LTV_COLUMNS), horizon=args.horizon)
+    plt.show()
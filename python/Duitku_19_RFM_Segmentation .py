@@ -0,0 +1,112 @@
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.ticker import FuncFormatter
+
+from duitku_rfm import RFM_SEGMENT_GRID
+from duitku_store import day_dates, read_rfm_scores
+from duitku_pipeline import AnalysisContext
+
+# Shared steps build() reads (the all-reports runner precomputes only these)
+REQUIRES = ["customer_rfm_scores"]
+
+
+# -------------------------------------------------
+# Helper formatters
+# -------------------------------------------------
+def percent(x, pos):
+    return f"{x * 100:.0f}%"
+
+
+def build(ctx, as_of=None, changed_only=False):
+    # -------------------------------------------------
+    # 1. RFM scores per customer (latest snapshot, or a stored past one)
+    # -------------------------------------------------
+    if as_of is None and not changed_only:
+        df_scores = ctx["customer_rfm_scores"]
+    else:
+        as_of_day = None if as_of is None else int(pd.Timestamp(as_of).to_period("D").ordinal)
+        df_scores = read_rfm_scores(as_of=as_of_day, changed_only=changed_only)
+
+    if df_scores.empty:
+        raise ValueError("No scored customers found.")
+
+    snapshot = day_dates([df_scores["snapshot_date"].max()])[0].date()
+
+    print("\n=== 19 - RFM Segmentation ===")
+    print("Scores 1–5 per metric from population quintiles; R = days since last top-up (recent = 5), "
+          "F = top-ups, M = net_amount / internal fee.")
+    print(f"Snapshot: {snapshot}, customers: {len(df_scores):,}" + (" (rescored on this snapshot only)" if changed_only else ""))
+
+    # -------------------------------------------------
+    # 2. Segment profile
+    # -------------------------------------------------
+    df_segments = df_scores.groupby("rfm_segment").agg(
+        customers=("frequency", "size"),
+        avg_recency_days=("recency", "mean"),
+        avg_topups=("frequency", "mean"),
+        avg_net_amount=("monetary_net", "mean"),
+        internal_fee=("monetary_fee", "sum"),
+    )
+    df_segments["customer_share"] = df_segments["customers"] / df_segments["customers"].sum()
+    df_segments["fee_share"] = df_segments["internal_fee"] / df_segments["internal_fee"].sum()
+    df_segments = df_segments.sort_values("fee_share", ascending=False)
+
+    print("\nSegments:")
+    print(df_segments.round({"avg_recency_days": 1, "avg_topups": 1, "avg_net_amount": 0, "customer_share": 3, "fee_share": 3}))
+
+    # R × F grid (rows R = 5 … 1, columns F = 1 … 5)
+    df_grid = (
+        pd.crosstab(df_scores["r_score"], df_scores["f_score"])
+          .reindex(index=range(5, 0, -1), columns=range(1, 6), fill_value=0)
+    )
+    print("\nCustomers per R score (rows) × F score (columns):")
+    print(df_grid)
+
+    # -------------------------------------------------
+    # 3. Plot: R × F heatmap with segment names + customer vs fee share
+    # -------------------------------------------------
+    fig, (ax_grid, ax_share) = plt.subplots(1, 2, figsize=(15, 6.5), gridspec_kw={"width_ratios": [1, 1.1]})
+
+    image = ax_grid.imshow(df_grid.to_numpy(), cmap="Blues")
+    for i, r_score in enumerate(df_grid.index):
+        for j, f_score in enumerate(df_grid.columns):
+            count = df_grid.loc[r_score, f_score]
+            color = "white" if count > df_grid.to_numpy().max() / 2 else "black"
+            ax_grid.text(j, i, f"{RFM_SEGMENT_GRID[i][j]}\n{count:,}", ha="center", va="center", fontsize=7, color=color)
+
+    ax_grid.set_xticks(range(5), df_grid.columns)
+    ax_grid.set_yticks(range(5), df_grid.index)
+    ax_grid.set_xlabel("F score (top-ups)")
+    ax_grid.set_ylabel("R score (recency)")
+    ax_grid.set_title("Customers per recency × frequency score")
+    fig.colorbar(image, ax=ax_grid, label="Customers")
+
+    y = np.arange(len(df_segments))
+    ax_share.barh(y - 0.2, df_segments["customer_share"], height=0.4, label="Share of customers")
+    ax_share.barh(y + 0.2, df_segments["fee_share"], height=0.4, label="Share of internal fee")
+    ax_share.set_yticks(y, df_segments.index)
+    ax_share.invert_yaxis()
+    ax_share.xaxis.set_major_formatter(FuncFormatter(percent))
+    ax_share.set_title("Customers vs internal fee by segment")
+    ax_share.grid(True, axis="x", linestyle="--", alpha=0.4)
+    ax_share.legend(loc="lower right")
+
+    fig.suptitle(f"19 – RFM Segmentation (snapshot {snapshot})", fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="19 – RFM segmentation.")
+    parser.add_argument("--as-of", default=None, help="stored snapshot date (YYYY-MM-DD); default: latest snapshot")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="only customers rescored on that snapshot (new top-ups or a recency bucket change)")
+    args = parser.parse_args()
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    build(AnalysisContext(), as_of=args.as_of, changed_only=args.changed_only)
+    plt.show()
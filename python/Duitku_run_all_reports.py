@@ -0,0 +1,240 @@
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+
+from duitku_pipeline import AnalysisContext, dependency_closure
+from duitku_store import STORE_DIR, cache_dir, render_cache_path, requested_months, store_fingerprint
+
+
+# -------------------------------------------------------------------
+# Run every report (Duitku_01 … Duitku_19; the cleaner, Duitku_00, builds
+# the store they read) against ONE AnalysisContext, so the store is read
+# once and shared steps are computed once. With --render, charts are saved
+# headless and skipped when their data, code and parameters are unchanged;
+# --workers renders the stale ones in a process pool.
+# -------------------------------------------------------------------
+PYTHON_DIR = Path(__file__).resolve().parent
+IMAGES_DIR = PYTHON_DIR.parent / "images"
+
+# Shared code every report depends on (part of each chart's cache key)
+SHARED_MODULES = ["duitku_pipeline.py", "duitku_store.py", "duitku_cohorts.py", "duitku_sketches.py", "duitku_bitmaps.py",
+                  "duitku_engagement.py", "duitku_forecast.py", "duitku_backtest.py",
+                  "duitku_transitions.py", "duitku_ltv.py", "duitku_rfm.py"]
+
+
+def report_paths(pattern="Duitku_[0-9][0-9]*.py"):
+    """Report scripts in run order (the cleaner, Duitku_00, is excluded)."""
+    return [p for p in sorted(PYTHON_DIR.glob(pattern)) if not p.name.startswith("Duitku_00")]
+
+
+def load_report(path):
+    """Import a report script as a module (file names contain spaces)."""
+    spec = importlib.util.spec_from_file_location(path.stem.strip(), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def required_steps(module, ctx):
+    """Shared steps a report reads: its required_steps(ctx) when the steps depend on ctx's options, else REQUIRES."""
+    if hasattr(module, "required_steps"):
+        return module.required_steps(ctx)
+    return module.REQUIRES
+
+
+def run_reports(ctx, paths):
+    """Call build(ctx) for each report. Returns {path: figure}."""
+    figures = {}
+    for path in paths:
+        started = time.perf_counter()
+        figures[path] = load_report(path).build(ctx)
+        print(f"[report] {path.stem.strip():<60} {time.perf_counter() - started:.3f}s")
+    return figures
+
+
+# -------------------------------------------------------------------
+# Headless rendering with a content-addressed chart cache
+# -------------------------------------------------------------------
+def image_path(path, images_dir=IMAGES_DIR):
+    return Path(images_dir) / f"{path.stem.strip()}.png"
+
+
+def render_key(path, data_fingerprint, params):
+    """sha256 of the input data, the report's code and the chart parameters."""
+    digest = hashlib.sha256()
+    digest.update(data_fingerprint.encode())
+    for source in [path] + [PYTHON_DIR / name for name in SHARED_MODULES]:
+        digest.update(source.read_bytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def read_render_cache(store_dir=STORE_DIR):
+    if not os.path.exists(render_cache_path(store_dir)):
+        return {}
+    with open(render_cache_path(store_dir)) as f:
+        return json.load(f)
+
+
+def write_render_cache(cache, store_dir=STORE_DIR):
+    os.makedirs(cache_dir(store_dir), exist_ok=True)
+    tmp_path = render_cache_path(store_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, render_cache_path(store_dir))
+
+
+def render_reports(ctx, paths, images_dir=IMAGES_DIR, dpi=100, force=False, store_dir=STORE_DIR, workers=1):
+    """
+    Save each report's figure to images_dir/<report>.png, skipping charts whose
+    cache key (data, code, parameters) matches the last render. With workers > 1
+    the stale charts are built and saved in a process pool.
+    Returns (rendered, skipped) report names.
+    """
+    os.makedirs(images_dir, exist_ok=True)
+    data_fingerprint = store_fingerprint(store_dir)
+    month_from, month_to = requested_months(ctx.month_from, ctx.month_to)
+    params = {
+        "month_from": month_from, "month_to": month_to,
+        "approx_quantiles": ctx.approx_quantiles, "approx_distinct": ctx.approx_distinct,
+        "dpi": dpi, "matplotlib": matplotlib.__version__,
+    }
+
+    cache = read_render_cache(store_dir)
+    stale, skipped = [], []
+
+    for path in paths:
+        name = path.stem.strip()
+        key = render_key(path, data_fingerprint, params)
+        if not force and cache.get(name) == key and image_path(path, images_dir).exists():
+            print(f"[cached] {name}")
+            skipped.append(name)
+        else:
+            stale.append((path, key))
+
+    rendered = []
+    for (path, key), (output, seconds) in zip(stale, _render_all(ctx, [p for p, _ in stale], images_dir, dpi, workers)):
+        name = path.stem.strip()
+        sys.stdout.write(output)
+        print(f"[render] {name:<60} {seconds:.3f}s -> {image_path(path, images_dir)}")
+
+        cache[name] = key
+        write_render_cache(cache, store_dir)
+        rendered.append(name)
+
+    return rendered, skipped
+
+
+def render_one(ctx, path, images_dir=IMAGES_DIR, dpi=100):
+    """Build one report and save its figure. Returns (printed output, seconds)."""
+    started = time.perf_counter()
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        fig = load_report(path).build(ctx)
+    fig.savefig(image_path(path, images_dir), dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue(), time.perf_counter() - started
+
+
+def _render_all(ctx, paths, images_dir, dpi, workers):
+    """Yield render_one() results in report order, serially or over a process pool."""
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield render_one(ctx, path, images_dir, dpi)
+        return
+
+    # The shared steps these reports read are computed once here (with their
+    # dependencies) and handed to every worker, so no worker reads the store.
+    # Steps only other reports need are not computed, and intermediate steps
+    # (e.g. the cube or transactions) are not pickled.
+    required = list(dict.fromkeys(name for path in paths for name in required_steps(load_report(path), ctx)))
+    for name in dependency_closure(ctx, required):
+        ctx[name]
+    results = {name: ctx.results[name] for name in required}
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(results, ctx.columns, ctx.month_from, ctx.month_to, ctx.approx_quantiles, ctx.approx_distinct),
+    ) as pool:
+        futures = [pool.submit(_render_in_worker, path, images_dir, dpi) for path in paths]
+        for future in futures:
+            yield future.result()
+
+
+_WORKER_CTX = None
+
+
+def _init_worker(results, columns, month_from, month_to, approx_quantiles, approx_distinct):
+    global _WORKER_CTX
+    plt.switch_backend("Agg")
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    _WORKER_CTX = AnalysisContext(
+        columns=columns, month_from=month_from, month_to=month_to,
+        approx_quantiles=approx_quantiles, approx_distinct=approx_distinct,
+    )
+    _WORKER_CTX.results.update(results)
+
+
+def _render_in_worker(path, images_dir, dpi):
+    return render_one(_WORKER_CTX, path, images_dir, dpi)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all Duitku reports on one shared dataset load.")
+    parser.add_argument("--month-from", default=None, help="First month to include (YYYY-MM)")
+    parser.add_argument("--month-to", default=None, help="Last month to include (YYYY-MM)")
+    parser.add_argument("--verbose", action="store_true", help="Print each shared step as it is computed")
+    parser.add_argument("--approx-quantiles", action="store_true",
+                        help="customer value percentiles (06, 08) from the stored quantile sketches")
+    parser.add_argument("--approx-distinct", action="store_true",
+                        help="active customer counts (12c) from the daily HyperLogLog sketches")
+    parser.add_argument("--render", action="store_true",
+                        help="headless: save every chart to images/ instead of showing it (unchanged charts are skipped)")
+    parser.add_argument("--images-dir", default=str(IMAGES_DIR), help="output folder for --render")
+    parser.add_argument("--dpi", type=int, default=100, help="image resolution for --render")
+    parser.add_argument("--force", action="store_true", help="with --render, re-render charts even if cached")
+    parser.add_argument("--workers", type=int, default=1, help="with --render, build and save charts in this many processes")
+    args = parser.parse_args()
+
+    if args.workers > 1 and not args.render:
+        parser.error("--workers needs --render (figures can only be shown from the main process)")
+
+    if args.render:
+        plt.switch_backend("Agg")
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", 1000)
+
+    ctx = AnalysisContext(
+        month_from=args.month_from, month_to=args.month_to, verbose=args.verbose,
+        approx_quantiles=args.approx_quantiles, approx_distinct=args.approx_distinct,
+    )
+
+    if args.render:
+        rendered, skipped = render_reports(ctx, report_paths(), args.images_dir, args.dpi, args.force, workers=args.workers)
+        print(f"\n=== Rendered {len(rendered)} charts, {len(skipped)} unchanged ===")
+    else:
+        run_reports(ctx, report_paths())
+
+    if ctx.timings:
+        print("\n=== Shared step timings ===")
+        for name, seconds in ctx.timings.items():
+            print(f"{name:<26} {seconds:.3f}s")
+
+    if not args.render:
+        plt.show()
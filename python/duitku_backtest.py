@@ -0,0 +1,225 @@
+import hashlib
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+
+from duitku_forecast import FORECAST_STEPS, MODELS
+from duitku_store import STORE_DIR, backtest_cache_path, cache_dir
+
+
+# -------------------------------------------------------------------
+# Rolling-origin backtest
+# Every registered model is re-fitted at each historical origin (the last
+# period of the training window) on the panel's history up to that origin,
+# and its forecasts are scored against the held-out periods that follow.
+# Forecasts are cached per (model, series, origin) together with the model's
+# source version, the number of steps and a digest of the series' training
+# history, so adding a model or a series only fits what is new, and edited
+# models, a new horizon or changed history are re-fitted automatically.
+# -------------------------------------------------------------------
+MIN_HISTORY = 3
+CACHE_COLUMNS = ["model", "version", "steps", "series", "origin", "digest"]
+
+
+def backtest(panel, models=None, steps=FORECAST_STEPS, min_history=MIN_HISTORY,
+             workers=1, time_budget=None, store_dir=STORE_DIR):
+    """
+    Rolling-origin backtest of `models` (default: every registered model) on a
+    period × series panel. Origins run in a process pool with workers > 1; with
+    a time_budget (seconds) origins not finished in time are skipped.
+    Returns (errors, skipped origins): errors has one row per
+    (model, series, origin, horizon) with forecast, actual and error.
+    """
+    models = list(MODELS) if models is None else list(models)
+    panel = panel.rename(columns=str)
+    origins = panel.index[min_history - 1:-1].tolist()
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+
+    versions = {name: model_version(name) for name in models}
+    df_cache = read_backtest_cache(store_dir)
+    df_steps = df_cache[df_cache["steps"] == steps]
+    cached = dict(zip(
+        zip(df_steps["model"], df_steps["version"], df_steps["series"], df_steps["origin"]),
+        df_steps["digest"],
+    ))
+
+    # per origin: which (model, series) forecasts are missing from the cache
+    tasks, digests = [], {}
+    for origin in origins:
+        history = panel.loc[:origin]
+        digests[origin] = dict(zip(panel.columns, _digests(history)))
+        missing = {}
+        for name in models:
+            todo = [
+                series for series in panel.columns
+                if cached.get((name, versions[name], series, origin)) != digests[origin][series]
+            ]
+            if todo:
+                missing[name] = todo
+        if missing:
+            tasks.append((origin, history, missing))
+
+    fitted, skipped = _run_tasks(tasks, steps, workers, deadline)
+
+    # merge the new fits into the cache (replacing stale versions, steps and digests)
+    rows = [
+        {"model": name, "version": versions[name], "steps": steps, "series": series, "origin": origin,
+         "digest": digests[origin][series],
+         **{f"h{h + 1}": forecasts[h, i] for h in range(steps)}}
+        for origin, by_model in fitted.items()
+        for name, (series_list, forecasts) in by_model.items()
+        for i, series in enumerate(series_list)
+    ]
+    if rows:
+        df_new = pd.DataFrame(rows)
+        df_cache = pd.concat([df_cache, df_new], ignore_index=True).drop_duplicates(["model", "series", "origin"], keep="last")
+        write_backtest_cache(df_cache, store_dir)
+
+    df_cache = df_cache[(df_cache["steps"] == steps) & (df_cache["version"] == df_cache["model"].map(versions))]
+    errors = _score(panel, df_cache, models, origins, digests, steps, skipped)
+    return errors, skipped
+
+
+def summarize_backtest(errors, by=("model", "horizon")):
+    """MAE, MAPE (over non-zero actuals) and the number of scored forecasts per group."""
+    errors = errors.assign(
+        abs_error=errors["error"].abs(),
+        abs_pct_error=(errors["error"].abs() / errors["actual"].abs()).where(errors["actual"] != 0),
+    )
+    return errors.groupby(list(by)).agg(
+        mae=("abs_error", "mean"),
+        mape=("abs_pct_error", "mean"),
+        forecasts=("error", "size"),
+    )
+
+
+def _referenced_globals(fn):
+    """Module-level names used by `fn`'s code, nested code objects (lambdas, comprehensions) included."""
+    names, codes = set(), [fn.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(const for const in code.co_consts if inspect.iscode(const))
+    return sorted(name for name in names if name in fn.__globals__)
+
+
+def model_version(name):
+    """
+    Short sha256 of a model's source and of everything it reaches in its own
+    module: helper functions it calls (followed transitively) and module
+    constants it reads. Adding or editing another model leaves it unchanged.
+    """
+    fn = MODELS[name]
+    digest = hashlib.sha256(f"{fn.__module__}.{fn.__qualname__}".encode())
+    seen, pending = set(), [fn]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            digest.update(inspect.getsource(current).encode())
+        except (OSError, TypeError):
+            digest.update(current.__code__.co_code)
+        digest.update(repr(current.__defaults__).encode())
+        for ref in _referenced_globals(current):
+            value = current.__globals__[ref]
+            if inspect.isfunction(value) and value.__module__ == fn.__module__:
+                pending.append(value)
+            elif not inspect.ismodule(value) and not callable(value):
+                digest.update(f"{ref}={value!r}".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_backtest_cache(store_dir=STORE_DIR):
+    if not os.path.exists(backtest_cache_path(store_dir)):
+        return pd.DataFrame({
+            "model":   pd.Series(dtype="str"),
+            "version": pd.Series(dtype="str"),
+            "steps":   pd.Series(dtype="int64"),
+            "series":  pd.Series(dtype="str"),
+            "origin":  pd.Series(dtype="int64"),
+            "digest":  pd.Series(dtype="str"),
+        })
+    df_cache = pd.read_parquet(backtest_cache_path(store_dir))
+    # caches written before versions and steps were keyed are re-fitted
+    return df_cache.reindex(columns=list(dict.fromkeys(CACHE_COLUMNS + df_cache.columns.tolist())))
+
+
+def write_backtest_cache(df_cache, store_dir=STORE_DIR):
+    os.makedirs(cache_dir(store_dir), exist_ok=True)
+    tmp_path = backtest_cache_path(store_dir) + ".tmp"
+    df_cache.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, backtest_cache_path(store_dir))
+
+
+def _digests(history):
+    """Short sha256 of each column's training values."""
+    columns = np.ascontiguousarray(history.to_numpy(dtype="float64").T)
+    return [hashlib.sha256(column.tobytes()).hexdigest()[:16] for column in columns]
+
+
+def _fit_origin(origin, history, missing, steps):
+    """Fit each model on its missing series at one origin. Returns (origin, {model: (series, forecasts)})."""
+    return origin, {name: (series, MODELS[name](history[series], steps)) for name, series in missing.items()}
+
+
+def _run_tasks(tasks, steps, workers, deadline):
+    """Run origin tasks serially or over a process pool until the deadline. Returns (fitted, skipped origins)."""
+    fitted = {}
+
+    if workers <= 1 or len(tasks) <= 1:
+        for i, (origin, history, missing) in enumerate(tasks):
+            if deadline is not None and time.monotonic() >= deadline:
+                return fitted, [task[0] for task in tasks[i:]]
+            fitted[origin] = _fit_origin(origin, history, missing, steps)[1]
+        return fitted, []
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = {pool.submit(_fit_origin, origin, history, missing, steps): origin for origin, history, missing in tasks}
+    try:
+        while pending:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                del pending[future]
+                origin, by_model = future.result()
+                fitted[origin] = by_model
+    finally:
+        # out of budget: drop queued origins without waiting for running ones
+        pool.shutdown(wait=not pending, cancel_futures=True)
+
+    return fitted, sorted(pending.values())
+
+
+def _score(panel, df_cache, models, origins, digests, steps, skipped):
+    """Long table of forecast errors for the scored origins (held-out periods inside the panel only)."""
+    scored = [origin for origin in origins if origin not in set(skipped)]
+    df_current = pd.DataFrame(
+        [(origin, series, digest) for origin in scored for series, digest in digests[origin].items()],
+        columns=["origin", "series", "digest"],
+    )
+    # only forecasts fitted on the panel's current history
+    horizons = [f"h{h + 1}" for h in range(steps)]
+    df = df_cache[df_cache["model"].isin(models)].merge(df_current, on=["origin", "series", "digest"])
+    df = df.reindex(columns=CACHE_COLUMNS + horizons)
+
+    df_long = df.melt(id_vars=CACHE_COLUMNS, value_vars=horizons, var_name="horizon", value_name="forecast")
+    df_long["horizon"] = df_long["horizon"].str[1:].astype(int)
+    df_long["period"] = df_long["origin"] + df_long["horizon"]
+
+    df_actual = panel.stack().rename("actual").rename_axis(["period", "series"]).reset_index()
+    df_long = df_long.merge(df_actual, on=["period", "series"], how="inner")
+    df_long["error"] = df_long["forecast"] - df_long["actual"]
+
+    return (
+        df_long[["model", "series", "origin", "horizon", "period", "forecast", "actual", "error"]]
+               .sort_values(["model", "series", "origin", "horizon"])
+               .reset_index(drop=True)
+    )
@@ -0,0 +1,190 @@
+import numpy as np
+
+
+# -------------------------------------------------------------------
+# Compressed bitmaps (roaring layout)
+# A set of non-negative integer codes (< 2^32) is split by its high 16 bits
+# into containers. A container with at most ARRAY_MAX_SIZE members is a
+# sorted uint16 array of the low bits; a denser one is a 65536-bit bitset
+# (1024 uint64 words). Set sizes come from popcounts, and intersection
+# sizes are computed container by container without building the result.
+# -------------------------------------------------------------------
+ARRAY_MAX_SIZE = 4096
+BITSET_WORDS   = 1024
+
+# Set bits per byte value (np.bitwise_count needs numpy >= 2.0)
+_BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount(words):
+    """Number of set bits of each uint64, from a byte lookup table."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+def _to_bitset(container):
+    if len(container) == BITSET_WORDS and container.dtype == np.uint64:
+        return container
+    bits = np.zeros(1 << 16, dtype=bool)
+    bits[container] = True
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def _to_array(container):
+    if container.dtype == np.uint16:
+        return container
+    return np.flatnonzero(np.unpackbits(container.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+
+def _cardinality(container):
+    return int(popcount(container).sum()) if container.dtype == np.uint64 else len(container)
+
+
+def _shrink(container):
+    """Array form when sparse enough, bitset form otherwise."""
+    size = _cardinality(container)
+    if size <= ARRAY_MAX_SIZE:
+        return _to_array(container)
+    return _to_bitset(container)
+
+
+def _intersection_size(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return len(np.intersect1d(a, b, assume_unique=True))
+    if a.dtype == np.uint16:
+        a, b = b, a
+    if b.dtype == np.uint16:
+        # bitset a probed at the members of array b
+        return int(((a[b >> 6] >> (b & 63).astype(np.uint64)) & np.uint64(1)).sum())
+    return int(popcount(a & b).sum())
+
+
+class Bitmap:
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_codes(cls, codes):
+        codes = np.unique(np.asarray(codes, dtype="int64"))
+        highs = codes >> 16
+        keys, starts = np.unique(highs, return_index=True)
+        containers = {}
+        for key, lows in zip(keys.tolist(), np.split((codes & 0xFFFF).astype(np.uint16), starts[1:])):
+            containers[key] = lows if len(lows) <= ARRAY_MAX_SIZE else _to_bitset(lows)
+        return cls(containers)
+
+    def __len__(self):
+        return sum(_cardinality(c) for c in self.containers.values())
+
+    def to_codes(self):
+        parts = [(key << 16) + _to_array(c).astype("int64") for key, c in sorted(self.containers.items())]
+        return np.concatenate(parts) if parts else np.array([], dtype="int64")
+
+    def intersection_size(self, other):
+        return sum(
+            _intersection_size(c, other.containers[key])
+            for key, c in self.containers.items()
+            if key in other.containers
+        )
+
+    def __and__(self, other):
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            c = _shrink(_to_bitset(self.containers[key]) & _to_bitset(other.containers[key]))
+            if len(c):
+                containers[key] = c
+        return Bitmap(containers)
+
+    def __or__(self, other):
+        containers = dict(self.containers)
+        for key, c in other.containers.items():
+            containers[key] = _shrink(_to_bitset(containers[key]) | _to_bitset(c)) if key in containers else c
+        return Bitmap(containers)
+
+    def __sub__(self, other):
+        containers = {}
+        for key, c in self.containers.items():
+            if key in other.containers:
+                c = _shrink(_to_bitset(c) & ~_to_bitset(other.containers[key]))
+            if _cardinality(c):
+                containers[key] = c
+        return Bitmap(containers)
+
+    # Serialization: key count, keys, cardinalities, then each container's
+    # raw bytes (cardinality tells array vs bitset, as in the roaring format)
+    def to_bytes(self):
+        keys  = np.array(sorted(self.containers), dtype=np.uint16)
+        sizes = np.array([_cardinality(self.containers[k]) for k in keys.tolist()], dtype=np.uint32)
+        payload = b"".join(self.containers[k].tobytes() for k in keys.tolist())
+        return np.uint32(len(keys)).tobytes() + keys.tobytes() + sizes.tobytes() + payload
+
+    @classmethod
+    def from_bytes(cls, data):
+        n = int(np.frombuffer(data, dtype=np.uint32, count=1)[0])
+        keys  = np.frombuffer(data, dtype=np.uint16, count=n, offset=4)
+        sizes = np.frombuffer(data, dtype=np.uint32, count=n, offset=4 + 2 * n)
+        offset = 4 + 6 * n
+        containers = {}
+        for key, size in zip(keys.tolist(), sizes.tolist()):
+            if size <= ARRAY_MAX_SIZE:
+                containers[key] = np.frombuffer(data, dtype=np.uint16, count=size, offset=offset)
+                offset += 2 * size
+            else:
+                containers[key] = np.frombuffer(data, dtype=np.uint64, count=BITSET_WORDS, offset=offset)
+                offset += 8 * BITSET_WORDS
+        return cls(containers)
+
+
+def union(bitmaps):
+    result = Bitmap()
+    for bitmap in bitmaps:
+        result = result | bitmap
+    return result
+
+
+# -------------------------------------------------------------------
+# Activity index: which customer codes were active per day / month, and
+# which were acquired per cohort month
+# -------------------------------------------------------------------
+class ActivityIndex:
+    def __init__(self, days=None, months=None, cohorts=None):
+        self.days    = days or {}
+        self.months  = months or {}
+        self.cohorts = cohorts or {}
+
+    def active(self, month):
+        return self.months.get(month, Bitmap())
+
+    def retained(self, cohort, month):
+        """Customers of `cohort` active in `month` (one cohort-by-period cell)."""
+        return self.cohorts.get(cohort, Bitmap()).intersection_size(self.active(month))
+
+    def overlap(self, month_a, month_b):
+        """Customers active in both months."""
+        return self.active(month_a).intersection_size(self.active(month_b))
+
+    def window(self, first_day, last_day):
+        """Customers active on any day in [first_day, last_day]."""
+        return union(bitmap for day, bitmap in self.days.items() if first_day <= day <= last_day)
+
+    def monthly_flows(self):
+        """
+        Per month code: active, new (acquired that month), retained (also active
+        the previous month), reactivated (returning after a gap) and churned
+        (active the previous month but not this one). The flows of the first
+        indexed month are None: its previous month is not in the index.
+        """
+        rows = []
+        for month in sorted(self.months):
+            active   = len(self.active(month))
+            new      = self.retained(month, month)
+            row = {"year_month": month, "active": active, "new": new, "retained": None, "reactivated": None, "churned": None}
+            if month - 1 in self.months:
+                retained = self.overlap(month, month - 1)
+                row.update(
+                    retained=retained,
+                    reactivated=active - new - retained,
+                    churned=len(self.active(month - 1)) - retained,
+                )
+            rows.append(row)
+        return rows
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# Cohort engine
+# Periods are pandas Period ordinals at the chosen granularity
+# (day = day code, week = Monday–Sunday week, month = month code), so
+# cohort age is plain integer subtraction. Counting is done on dense
+# integer arrays with bincount: time is linear in transactions + cells.
+# -------------------------------------------------------------------
+GRANULARITIES = {
+    "day":   "D",
+    "week":  "W",
+    "month": "M",
+}
+
+# Columns the engine reads from transactions (month uses year_month directly)
+COHORT_COLUMNS = ["customer_id", "transaction_date", "year_month", "fee_internal_amount"]
+
+
+def period_codes(df, granularity="month"):
+    """Per-transaction period ordinal at the given granularity."""
+    if granularity == "month":
+        return df["year_month"].to_numpy(dtype="int64")
+    days = df["transaction_date"].to_numpy(dtype="int64")
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        # 1970-01-01 (day 0) is a Thursday in week ordinal 1 (1969-12-29/1970-01-04)
+        return (days + 3) // 7 + 1
+    raise ValueError(f"Unknown granularity {granularity!r}. Use one of {list(GRANULARITIES)}")
+
+
+def period_labels(codes, granularity="month"):
+    """Period ordinals -> PeriodIndex at the given granularity."""
+    return pd.PeriodIndex.from_ordinals(np.asarray(codes, dtype="int64"), freq=GRANULARITIES[granularity])
+
+
+def cohort_cells(customers, periods, revenue=None):
+    """
+    Users and revenue per (cohort, age) cell from per-transaction arrays.
+    A customer's cohort is the first period they transact in.
+    Returns (cohort codes, ages, users, revenue) over the non-empty cells.
+    """
+    customers = np.asarray(customers)
+    periods   = np.asarray(periods, dtype="int64")
+    revenue   = np.zeros(len(periods)) if revenue is None else np.asarray(revenue)
+
+    if len(periods) == 0:
+        empty = np.array([], dtype="int64")
+        return empty, empty, empty, empty.astype("float64")
+
+    # dense customer codes (hash-based, linear)
+    customer_codes, _ = pd.factorize(customers)
+    n_customers = int(customer_codes.max()) + 1
+
+    first_period = periods.min()
+    offset = periods - first_period
+
+    cohort_of_customer = np.full(n_customers, offset.max(), dtype="int64")
+    np.minimum.at(cohort_of_customer, customer_codes, offset)
+
+    cohort = cohort_of_customer[customer_codes]
+    age    = offset - cohort
+    width  = int(offset.max()) + 1
+    cell   = cohort * width + age
+
+    # distinct customers per cell: each (customer, age) pair counted once
+    active_pairs = pd.unique(customer_codes.astype("int64") * width + age)
+    active_cells = cohort_of_customer[active_pairs // width] * width + active_pairs % width
+
+    users_per_cell   = np.bincount(active_cells, minlength=width * width)
+    revenue_per_cell = np.bincount(cell, weights=revenue, minlength=width * width)
+
+    nonzero = np.flatnonzero(users_per_cell)
+    return nonzero // width + first_period, nonzero % width, users_per_cell[nonzero], revenue_per_cell[nonzero]
+
+
+def cohort_matrices(cohorts, ages, users, revenue, last_period=None):
+    """
+    Dense cohort × age matrices from cell arrays.
+    Returns {"users", "revenue", "retention"} DataFrames indexed by cohort code
+    with one column per age. Cells past the last observed period are NaN;
+    observed cells without activity are 0.
+    """
+    cohorts = np.asarray(cohorts, dtype="int64")
+    ages    = np.asarray(ages, dtype="int64")
+
+    first_cohort = int(cohorts.min()) if len(cohorts) else 0
+    last_period  = int((cohorts + ages).max()) if last_period is None else int(last_period)
+    n_cohorts    = max(last_period - first_cohort + 1, 0)
+
+    row = cohorts - first_cohort
+    users_grid   = np.zeros((n_cohorts, n_cohorts))
+    revenue_grid = np.zeros((n_cohorts, n_cohorts))
+    users_grid[row, ages]   = users
+    revenue_grid[row, ages] = revenue
+
+    # age j of cohort i is observed when i + j <= last period
+    observed = np.add.outer(np.arange(n_cohorts), np.arange(n_cohorts)) < n_cohorts
+    users_grid[~observed]   = np.nan
+    revenue_grid[~observed] = np.nan
+
+    # keep only cohorts that acquired someone
+    has_users = users_grid[:, 0] > 0 if n_cohorts else np.array([], dtype=bool)
+    users_grid, revenue_grid = users_grid[has_users], revenue_grid[has_users]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        retention_grid = users_grid / users_grid[:, [0]] * 100
+
+    index   = pd.Index(np.arange(first_cohort, first_cohort + n_cohorts)[has_users], name="cohort")
+    columns = pd.RangeIndex(n_cohorts, name="cohort_age")
+    return {
+        "users":     pd.DataFrame(users_grid, index=index, columns=columns),
+        "revenue":   pd.DataFrame(revenue_grid, index=index, columns=columns),
+        "retention": pd.DataFrame(retention_grid, index=index, columns=columns),
+    }
+
+
+def transaction_cohorts(df, granularity="month"):
+    """Cohort matrices straight from compact transactions (COHORT_COLUMNS)."""
+    periods = period_codes(df, granularity)
+    cells = cohort_cells(df["customer_id"].to_numpy(), periods, df["fee_internal_amount"].to_numpy())
+    return cohort_matrices(*cells, last_period=periods.max() if len(periods) else None)
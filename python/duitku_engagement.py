@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# As-of engagement engine
+# Customer activity is kept as distinct (customer, day) pairs sorted by
+# customer then day. Recency as of any day is one searchsorted over the
+# pairs; the daily series of recency segments is one sweep: between two
+# active days a customer's recency grows by one per day, so each pair adds
+# one day interval per segment to a difference array.
+# -------------------------------------------------------------------
+# (label, lowest recency, highest recency) in days; None = no upper bound
+RECENCY_SEGMENTS = [
+    ("Active (≤7 days)",    0,  7),
+    ("At-risk (8–30 days)", 8,  30),
+    ("Inactive (>30 days)", 31, None),
+]
+
+
+class CustomerActivity:
+    def __init__(self, customers, days):
+        df = pd.DataFrame({
+            "customer": np.asarray(customers),
+            "day":      np.asarray(days, dtype="int64"),
+        }).drop_duplicates().sort_values(["customer", "day"])
+
+        self.customer_ids = pd.unique(df["customer"])
+        self.codes = pd.factorize(df["customer"], sort=False)[0].astype("int64")
+        self.days  = df["day"].to_numpy()
+
+        # first pair of each customer, and the customer's first active day
+        self.starts = np.flatnonzero(np.diff(self.codes, prepend=-1))
+        self.first_day = self.days.min() if len(self.days) else 0
+        self.last_day  = self.days.max() if len(self.days) else -1
+        self._span = self.last_day - self.first_day + 1
+
+        # (customer, day) packed into one sorted key for searchsorted
+        self._keys = self.codes * self._span + (self.days - self.first_day)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def last_active(self, as_of):
+        """Last active day on or before `as_of` per customer (-1 for customers not acquired yet)."""
+        as_of = min(int(as_of), self.last_day)
+        targets = np.arange(len(self)) * self._span + (as_of - self.first_day)
+        positions = np.searchsorted(self._keys, targets, side="right") - 1
+        acquired = positions >= self.starts
+        return np.where(acquired, self.days[np.maximum(positions, 0)], -1)
+
+    def recency(self, as_of):
+        """Days since last activity as of `as_of`, for the customers acquired by then (indexed by the customer keys given)."""
+        last = self.last_active(as_of)
+        acquired = last >= 0
+        return pd.Series(int(as_of) - last[acquired], index=self.customer_ids[acquired], name="recency_days")
+
+    def segment_series(self, first_day=None, last_day=None, segments=RECENCY_SEGMENTS):
+        """
+        Customers per recency segment for every as-of day in [first_day, last_day]
+        (default: the whole activity range). Index: day code; one column per segment label.
+        """
+        first_day = self.first_day if first_day is None else int(first_day)
+        last_day  = self.last_day if last_day is None else int(last_day)
+        n = max(last_day - first_day + 1, 0)
+
+        # pair i covers as-of days [day, next active day) with recency 0, 1, 2, ...
+        same_customer = np.append(self.codes[1:] == self.codes[:-1], False)
+        cover_end = np.where(same_customer, np.append(self.days[1:], 0), last_day + 1)
+
+        counts = {}
+        for label, low, high in segments:
+            enter = self.days + low
+            leave = cover_end if high is None else np.minimum(self.days + high + 1, cover_end)
+            enter = np.clip(enter, first_day, last_day + 1) - first_day
+            leave = np.clip(leave, first_day, last_day + 1) - first_day
+            valid = enter < leave
+            delta = np.bincount(enter[valid], minlength=n + 1) - np.bincount(leave[valid], minlength=n + 1)
+            counts[label] = np.cumsum(delta)[:n]
+
+        return pd.DataFrame(counts, index=pd.Index(np.arange(first_day, first_day + n), name="transaction_date"))
@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# Panel trend forecasting
+# A panel is a DataFrame with one row per period (consecutive integer
+# codes, e.g. month codes) and one column per series. Every series gets
+# the same linear trend model y = slope · t + intercept on t = 0 … n-1,
+# solved for all columns at once from the least-squares normal equations,
+# so forecasting thousands of series costs about one array pass.
+# NaN cells are treated as not observed (excluded from that series' fit).
+# -------------------------------------------------------------------
+FORECAST_STEPS = 3
+
+
+def monthly_panel(df, value, by=None, period="year_month"):
+    """
+    Long frame -> panel: rows = every period code from first to last (empty
+    periods filled with 0, like resample("MS")), columns = values of `by`
+    (a single column named `value` when by is None).
+    """
+    if by is None:
+        panel = df.groupby(period)[value].sum().to_frame()
+    else:
+        panel = df.pivot_table(index=period, columns=by, values=value, aggfunc="sum", fill_value=0, observed=True)
+    return panel.reindex(range(panel.index.min(), panel.index.max() + 1), fill_value=0).rename_axis(period)
+
+
+def fit_linear_trends(panel):
+    """Slope and intercept per series (index = panel columns)."""
+    values = panel.to_numpy(dtype="float64")
+    observed = ~np.isnan(values)
+    t = np.arange(len(panel), dtype="float64")[:, None]
+
+    # normal equations of [t, 1] per column, solved around each column's means
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = observed.sum(axis=0)
+        t_mean = np.where(observed, t, 0.0).sum(axis=0) / n
+        y_mean = np.where(observed, values, 0.0).sum(axis=0) / n
+        t_dev = np.where(observed, t - t_mean, 0.0)
+        y_dev = np.where(observed, values - y_mean, 0.0)
+
+        slope = (t_dev * y_dev).sum(axis=0) / (t_dev * t_dev).sum(axis=0)
+        intercept = y_mean - slope * t_mean
+
+    return pd.DataFrame({"slope": slope, "intercept": intercept}, index=panel.columns)
+
+
+def trend_forecast(panel, steps=FORECAST_STEPS):
+    """
+    Fit every series of the panel and extend it `steps` periods past the last one.
+    Returns {"coeffs", "fitted", "forecast"}: coeffs per series, fitted values
+    on the panel's periods and forecasts on the next period codes.
+    """
+    df_coeffs = fit_linear_trends(panel)
+    slope     = df_coeffs["slope"].to_numpy()
+    intercept = df_coeffs["intercept"].to_numpy()
+
+    t_hist   = np.arange(len(panel))[:, None]
+    t_future = np.arange(len(panel), len(panel) + steps)[:, None]
+    future_periods = pd.RangeIndex(panel.index.max() + 1, panel.index.max() + 1 + steps, name=panel.index.name)
+
+    return {
+        "coeffs":   df_coeffs,
+        "fitted":   pd.DataFrame(t_hist * slope + intercept, index=panel.index, columns=panel.columns),
+        "forecast": pd.DataFrame(t_future * slope + intercept, index=future_periods, columns=panel.columns),
+    }
+
+
+# -------------------------------------------------------------------
+# Prediction intervals (residual bootstrap)
+# Each replicate adds resampled residuals to the fitted trend, re-fits the
+# trend and adds resampled residuals to its forecast. All replicates and
+# series are one (n_bootstrap × periods × series) array, re-fitted with
+# the same closed form as fit_linear_trends.
+# -------------------------------------------------------------------
+N_BOOTSTRAP   = 2000
+INTERVALS     = [0.80, 0.95]
+BOOTSTRAP_SEED = 0
+
+
+def bootstrap_intervals(panel, steps=FORECAST_STEPS, intervals=INTERVALS, n_bootstrap=N_BOOTSTRAP, seed=BOOTSTRAP_SEED):
+    """
+    Central prediction intervals for the trend forecast of every series of a
+    complete panel (no NaN). Returns {coverage: (lower, upper)} with lower /
+    upper DataFrames indexed like trend_forecast()["forecast"].
+    """
+    values = panel.to_numpy(dtype="float64")
+    if np.isnan(values).any():
+        raise ValueError("bootstrap_intervals needs a complete panel (fill or drop NaN periods first).")
+
+    n, k = values.shape
+    forecast = trend_forecast(panel, steps)
+    # residuals rescaled for the two fitted parameters (they understate the noise otherwise)
+    residuals = (values - forecast["fitted"].to_numpy()) * np.sqrt(n / max(n - 2, 1))
+
+    rng = np.random.default_rng(seed)
+    series = np.arange(k)
+
+    # (B, n, k) bootstrap histories -> re-fitted slope / intercept per replicate and series
+    y_star = forecast["fitted"].to_numpy() + residuals[rng.integers(0, n, size=(n_bootstrap, n, k)), series]
+    t = np.arange(n, dtype="float64")
+    t_dev = t - t.mean()
+    slope = np.einsum("t,btk->bk", t_dev, y_star) / (t_dev * t_dev).sum()
+    intercept = y_star.mean(axis=1) - slope * t.mean()
+
+    # (B, steps, k) forecast paths with resampled noise
+    t_future = np.arange(n, n + steps, dtype="float64")[None, :, None]
+    paths = slope[:, None, :] * t_future + intercept[:, None, :]
+    paths += residuals[rng.integers(0, n, size=(n_bootstrap, steps, k)), series]
+
+    index = forecast["forecast"].index
+    result = {}
+    for coverage in intervals:
+        lower, upper = np.quantile(paths, [(1 - coverage) / 2, (1 + coverage) / 2], axis=0)
+        result[coverage] = (
+            pd.DataFrame(lower, index=index, columns=panel.columns),
+            pd.DataFrame(upper, index=index, columns=panel.columns),
+        )
+    return result
+
+
+# -------------------------------------------------------------------
+# Daily forecasting with weekly seasonality
+# A daily panel (rows = consecutive day codes) is split into weekday
+# effects, from the detrended values around a centred 7-day moving average,
+# and a deseasonalised series smoothed with a damped Holt-style level and
+# trend (Brown's double exponential smoothing). The smoothing recursions
+# are pandas ewm over every series at once; the smoothing constant is
+# picked per series from a grid by one-step-ahead error.
+# -------------------------------------------------------------------
+SEASON_DAYS         = 7
+DAILY_FORECAST_DAYS = 60
+SMOOTHING_GRID      = np.linspace(0.02, 0.5, 25)
+TREND_DAMPING       = 0.98
+
+
+def weekday_effects(panel, season=SEASON_DAYS):
+    """Additive effect per weekday (index = day code % season) and series, centred on zero."""
+    trend = panel.rolling(season, center=True).mean()
+    df_detrended = (panel - trend).groupby(panel.index % season).mean()
+    df_detrended = df_detrended.reindex(range(season)).fillna(0.0)
+    return df_detrended - df_detrended.mean()
+
+
+def seasonal_forecast(panel, steps=DAILY_FORECAST_DAYS, season=SEASON_DAYS, alphas=SMOOTHING_GRID,
+                      damping=TREND_DAMPING):
+    """
+    Weekly-seasonal forecast of every series of a complete daily panel, `steps`
+    days past the last one. Returns {"seasonal", "alpha", "fitted", "forecast"}:
+    weekday effects, the chosen smoothing constant per series, one-step-ahead
+    fitted values and forecasts on the next day codes.
+    """
+    panel = panel.astype("float64")
+    df_seasonal = weekday_effects(panel, season)
+    seasonal_hist = df_seasonal.to_numpy()[panel.index.to_numpy() % season]
+    deseasonalised = panel - seasonal_hist
+
+    # one pass of the smoothing recursions per grid value, all series at once
+    best_sse   = np.full(panel.shape[1], np.inf)
+    best_alpha = np.zeros(panel.shape[1])
+    best_level = np.zeros(panel.shape[1])
+    best_trend = np.zeros(panel.shape[1])
+    best_fit   = np.zeros(panel.shape)
+    for alpha in alphas:
+        s1 = deseasonalised.ewm(alpha=alpha, adjust=False).mean()
+        s2 = s1.ewm(alpha=alpha, adjust=False).mean()
+        level = (2 * s1 - s2).to_numpy()
+        trend = (alpha / (1 - alpha) * (s1 - s2)).to_numpy()
+
+        # one-step-ahead predictions, scored after the first full season
+        one_step = np.vstack([deseasonalised.to_numpy()[:1], level[:-1] + damping * trend[:-1]])
+        sse = ((deseasonalised.to_numpy() - one_step)[season:] ** 2).sum(axis=0)
+
+        better = sse < best_sse
+        best_sse[better]   = sse[better]
+        best_alpha[better] = alpha
+        best_level[better] = level[-1, better]
+        best_trend[better] = trend[-1, better]
+        best_fit[:, better] = one_step[:, better]
+
+    # damped trend: level + (φ + φ² + … + φ^h) · trend
+    horizons = np.arange(1, steps + 1)
+    damped = np.cumsum(damping ** horizons)[:, None]
+    future_days = pd.RangeIndex(panel.index.max() + 1, panel.index.max() + 1 + steps, name=panel.index.name)
+    seasonal_future = df_seasonal.to_numpy()[future_days.to_numpy() % season]
+
+    return {
+        "seasonal": df_seasonal,
+        "alpha":    pd.Series(best_alpha, index=panel.columns, name="alpha"),
+        "fitted":   pd.DataFrame(best_fit + seasonal_hist, index=panel.index, columns=panel.columns),
+        "forecast": pd.DataFrame(best_level + damped * best_trend + seasonal_future, index=future_days, columns=panel.columns),
+    }
+
+
+# -------------------------------------------------------------------
+# Model registry (used by the backtest harness)
+# A model maps a history panel to a (steps × series) array of forecasts.
+# -------------------------------------------------------------------
+MODELS = {}
+
+
+def model(fn):
+    """Register a forecasting model under its function name."""
+    MODELS[fn.__name__] = fn
+    return fn
+
+
+@model
+def linear_trend(history, steps):
+    """The 12a/b/c model: linear trend over the whole history."""
+    return trend_forecast(history, steps)["forecast"].to_numpy()
+
+
+@model
+def naive(history, steps):
+    """Last observed value, carried forward."""
+    last = history.ffill().iloc[-1].to_numpy(dtype="float64")
+    return np.tile(last, (steps, 1))
+
+
+@model
+def moving_average_3(history, steps):
+    """Mean of the last three observed periods, carried forward."""
+    last3 = history.iloc[-3:].mean().to_numpy(dtype="float64")
+    return np.tile(last3, (steps, 1))
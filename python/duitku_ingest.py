@@ -0,0 +1,404 @@
+import os
+import hashlib
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+from duitku_store import (
+    CLEAN_COLUMNS, STORE_DIR, reset_store, to_compact, write_transactions, drop_batch,
+    refresh_cube, cube_path, refresh_daily_sketches, daily_sketches_path,
+    refresh_customers, customers_path, customer_partials,
+    refresh_activity_index, activity_index_path, customer_codes_path,
+    merge_customer_partials, read_customer_partials, write_customers,
+    read_state, write_state, read_cohorts, write_cohorts
+)
+
+
+NUMERIC_COLUMNS = ["id", "customer_id", "net_amount", "fee_internal_amount", "fee_external_amount"]
+
+# Raw columns the cleaner actually needs (everything else in the export is dropped)
+RAW_SCHEMA = pa.schema([
+    ("id",                  pa.int64()),
+    ("customer_id",         pa.int64()),
+    ("net_amount",          pa.int64()),
+    ("fee_internal_amount", pa.int64()),
+    ("fee_external_amount", pa.int64()),
+    ("category",            pa.string()),
+    ("paying_at",           pa.string()),
+    ("created_at",          pa.string()),
+])
+
+DEFAULT_CHUNKSIZE = 500_000
+
+
+# -------------------------------------------------------------------
+# Row-level cleaning (shared by single-shot and streaming modes)
+# -------------------------------------------------------------------
+def parse_datetimes(df):
+    df["paying_at"]  = pd.to_datetime(df["paying_at"],  errors="coerce")
+    df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
+    return df
+
+
+def derive_columns(df, srs_first_paying_at):
+    """
+    Add transaction_date / year_month / cohort_month.
+    srs_first_paying_at is indexed by customer_id (first paying_at per customer).
+    """
+    df["transaction_date"] = df["paying_at"].dt.date
+    df["year_month"]       = df["paying_at"].dt.to_period("M").astype(str)
+    df["cohort_month"]     = df["customer_id"].map(srs_first_paying_at).dt.to_period("M").astype(str)
+    return df
+
+
+# -------------------------------------------------------------------
+# Ingest state
+# -------------------------------------------------------------------
+def merge_first_paying_at(srs_known, srs_batch):
+    """Existing customers keep their first paying_at; new customers are added."""
+    srs_new = srs_batch[~srs_batch.index.isin(srs_known.index)]
+    return pd.concat([srs_known, srs_new])
+
+
+def save_ingest_state(srs_first_paying_at, max_id, rows, store_dir=STORE_DIR, source=None):
+    write_cohorts(srs_first_paying_at, store_dir)
+    write_state({
+        "max_id": None if pd.isna(max_id) else int(max_id),
+        "rows":   int(rows),
+        "source": source,
+    }, store_dir)
+
+
+# -------------------------------------------------------------------
+# Source fingerprint (size, mtime, sha256) for the ingest cache
+# -------------------------------------------------------------------
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, cached=None):
+    """
+    Fingerprint of a source file. The hash is only recomputed when size or
+    mtime differ from the cached fingerprint.
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    if cached and cached.get("size") == fingerprint["size"] and cached.get("mtime_ns") == fingerprint["mtime_ns"]:
+        fingerprint["sha256"] = cached["sha256"]
+    else:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+
+def is_cached(path, store_dir=STORE_DIR):
+    """
+    True when the store was last built from exactly this file and has no
+    unfinished incremental batch. Returns (cached, fingerprint).
+    """
+    try:
+        state = read_state(store_dir)
+    except FileNotFoundError:
+        state = {}
+    cached = state.get("source")
+
+    fingerprint = source_fingerprint(path, cached)
+    hit = bool(cached) and not state.get("pending") and cached.get("sha256") == fingerprint["sha256"] and cached.get("size") == fingerprint["size"]
+    return hit, fingerprint
+
+
+# -------------------------------------------------------------------
+# Chunk sources (CSV read directly, xlsx staged once to Parquet)
+# -------------------------------------------------------------------
+def staging_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "staging_raw.parquet")
+
+
+def stage_xlsx(xlsx_path, parquet_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream the first worksheet in read-only mode and write the needed raw
+    columns to a Parquet file, chunksize rows at a time. Returns rows staged.
+    """
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    rows_staged = 0
+
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows)]
+
+        missing = set(RAW_SCHEMA.names) - set(header)
+        if missing:
+            raise KeyError(f"Missing required columns in {xlsx_path}: {missing}")
+        positions = [header.index(name) for name in RAW_SCHEMA.names]
+
+        with pq.ParquetWriter(parquet_path, RAW_SCHEMA) as writer:
+            buffer = []
+            for row in rows:
+                buffer.append([row[i] for i in positions])
+                if len(buffer) >= chunksize:
+                    writer.write_table(_raw_table(buffer))
+                    rows_staged += len(buffer)
+                    buffer = []
+            if buffer:
+                writer.write_table(_raw_table(buffer))
+                rows_staged += len(buffer)
+    finally:
+        workbook.close()
+
+    return rows_staged
+
+
+def _raw_table(rows):
+    columns = list(zip(*rows))
+    arrays = [
+        pa.array([None if v is None else str(v) for v in col], type=field.type) if pa.types.is_string(field.type)
+        else pa.array(col, type=field.type)
+        for col, field in zip(columns, RAW_SCHEMA)
+    ]
+    return pa.Table.from_arrays(arrays, schema=RAW_SCHEMA)
+
+
+def open_source(path, chunksize=DEFAULT_CHUNKSIZE, store_dir=STORE_DIR):
+    """
+    Return read_chunks(usecols=None) -> iterator of DataFrames over the source.
+    .xlsx workbooks are streamed once into a staging Parquet file first.
+    """
+    if path.lower().endswith(".xlsx"):
+        parquet_path = staging_path(store_dir)
+        stage_xlsx(path, parquet_path, chunksize)
+
+        def read_chunks(usecols=None):
+            parquet_file = pq.ParquetFile(parquet_path)
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=usecols):
+                yield batch.to_pandas()
+        return read_chunks
+
+    def read_chunks(usecols=None):
+        return pd.read_csv(path, usecols=usecols, chunksize=chunksize)
+    return read_chunks
+
+
+def close_source(store_dir=STORE_DIR):
+    if os.path.exists(staging_path(store_dir)):
+        os.remove(staging_path(store_dir))
+
+
+# -------------------------------------------------------------------
+# Streaming cleaner (bounded memory)
+# -------------------------------------------------------------------
+def _past_watermark(chunk, min_id):
+    return chunk if min_id is None else chunk[chunk["id"] > min_id]
+
+
+def scan_source(read_chunks, min_id=None):
+    """
+    Pass 1: per-customer running minimum of paying_at, plus the batch
+    high-water mark (max id) and row count.
+    Also records which numeric columns contain missing values anywhere in the
+    file, so every chunk can be written with the dtype a single-shot read uses.
+    Only rows with id > min_id are considered when min_id is given.
+    Memory grows with the number of customers, not the number of rows.
+    """
+    srs_first_paying_at = pd.Series(dtype="datetime64[ns, UTC]")
+    has_missing = dict.fromkeys(NUMERIC_COLUMNS, False)
+    max_id, rows = None, 0
+
+    for chunk in read_chunks(usecols=NUMERIC_COLUMNS + ["paying_at"]):
+        chunk = _past_watermark(chunk, min_id)
+        if chunk.empty:
+            continue
+
+        for col in NUMERIC_COLUMNS:
+            has_missing[col] = has_missing[col] or bool(chunk[col].isna().any())
+
+        chunk["paying_at"] = pd.to_datetime(chunk["paying_at"], errors="coerce")
+        srs_chunk_min = chunk.groupby("customer_id")["paying_at"].min()
+
+        if srs_first_paying_at.empty:
+            srs_first_paying_at = srs_chunk_min
+        else:
+            srs_first_paying_at = pd.concat([srs_first_paying_at, srs_chunk_min]).groupby(level=0).min()
+
+        max_id = chunk["id"].max() if max_id is None else max(max_id, chunk["id"].max())
+        rows  += len(chunk)
+
+    return {
+        "first_paying_at": srs_first_paying_at,
+        "has_missing":     has_missing,
+        "max_id":          max_id,
+        "rows":            rows,
+    }
+
+
+def iter_clean_chunks(read_chunks, srs_first_paying_at, has_missing, min_id=None):
+    """Pass 2: yield cleaned chunks, cohort_month taken from srs_first_paying_at."""
+    float_cols = {col: "float64" for col, missing in has_missing.items() if missing}
+
+    for chunk in read_chunks():
+        chunk = _past_watermark(chunk, min_id)
+        if chunk.empty:
+            continue
+        chunk = chunk.astype(float_cols)
+        chunk = parse_datetimes(chunk)
+        chunk = derive_columns(chunk, srs_first_paying_at)
+        yield chunk[CLEAN_COLUMNS].copy()
+
+
+def stream_clean(source_path, clean_csv_path, chunksize=DEFAULT_CHUNKSIZE, store_dir=None, source=None):
+    """
+    Clean a CSV or xlsx source into clean_csv_path chunk by chunk. Returns rows written.
+    When store_dir is given the partitioned store, aggregate cube, customer
+    dimension and ingest state are rebuilt alongside.
+    """
+    if store_dir:
+        reset_store(store_dir)
+
+    read_chunks = open_source(source_path, chunksize, store_dir or STORE_DIR)
+    batch = scan_source(read_chunks)
+    tmp_path = clean_csv_path + ".tmp"
+    rows_written = 0
+
+    for i, df_chunk in enumerate(iter_clean_chunks(read_chunks, batch["first_paying_at"], batch["has_missing"])):
+        df_chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+        if store_dir:
+            write_transactions(df_chunk, store_dir)
+        rows_written += len(df_chunk)
+
+    if rows_written == 0:
+        pd.DataFrame(columns=CLEAN_COLUMNS).to_csv(tmp_path, index=False)
+
+    os.replace(tmp_path, clean_csv_path)
+    close_source(store_dir or STORE_DIR)
+
+    if store_dir:
+        refresh_cube(store_dir=store_dir)
+        refresh_daily_sketches(store_dir=store_dir)
+        refresh_customers(store_dir)
+        refresh_activity_index(store_dir=store_dir)
+        save_ingest_state(batch["first_paying_at"], batch["max_id"], rows_written, store_dir, source)
+    return rows_written
+
+
+def ingest_xlsx(xlsx_path, clean_csv_path, chunksize=DEFAULT_CHUNKSIZE, store_dir=STORE_DIR, force=False):
+    """
+    Full rebuild of the clean CSV and store straight from the workbook.
+    Skipped when the store was already built from an identical file
+    (same size and sha256). Returns (rows_written, cache_hit).
+    """
+    hit, fingerprint = is_cached(xlsx_path, store_dir)
+    if hit and not force:
+        state = read_state(store_dir)
+        if not os.path.exists(cube_path(store_dir)):
+            refresh_cube(store_dir=store_dir)
+        if not os.path.exists(daily_sketches_path(store_dir)):
+            refresh_daily_sketches(store_dir=store_dir)
+        if not os.path.exists(customers_path(store_dir)) or not os.path.exists(customer_codes_path(store_dir)):
+            refresh_customers(store_dir)
+        if not os.path.exists(activity_index_path(store_dir)):
+            refresh_activity_index(store_dir=store_dir)
+        if state["source"] != fingerprint:
+            state["source"] = fingerprint
+            write_state(state, store_dir)
+        return state["rows"], True
+
+    rows_written = stream_clean(xlsx_path, clean_csv_path, chunksize, store_dir, source=fingerprint)
+    return rows_written, False
+
+
+# -------------------------------------------------------------------
+# Incremental append (only rows past the high-water mark)
+# -------------------------------------------------------------------
+def rollback_batch(state, clean_csv_path, store_dir=STORE_DIR):
+    """
+    Undo an append that did not reach its state write: truncate the clean CSV
+    to its size before the batch, delete the batch's transaction files and
+    recompute what was derived from them. Returns the state without the pending batch.
+    """
+    pending = state.pop("pending")
+    if pending["clean_csv_bytes"] is None:
+        if os.path.exists(clean_csv_path):
+            os.remove(clean_csv_path)
+    elif os.path.exists(clean_csv_path):
+        with open(clean_csv_path, "r+b") as f:
+            f.truncate(pending["clean_csv_bytes"])
+
+    months = drop_batch(pending["batch"], store_dir)
+    refresh_cube(months, store_dir)
+    refresh_daily_sketches(months, store_dir)
+    # the merged dimension may already include the batch: rebuild it from the store
+    refresh_customers(store_dir)
+    refresh_activity_index(months, store_dir)
+
+    write_state(state, store_dir)
+    return state
+
+
+def incremental_ingest(source_path, clean_csv_path, chunksize=DEFAULT_CHUNKSIZE, store_dir=STORE_DIR):
+    """
+    Append rows with id above the stored watermark to the clean CSV and the store,
+    recompute the aggregate cube for the months that received rows and merge
+    the new rows into the customer dimension.
+    New customers get a cohort from their first paying_at in the batch;
+    existing customers keep the cohort they already have. Returns rows appended.
+
+    The batch is recorded as pending in the state before anything is appended
+    and the state is rewritten without it only after every write succeeded, so
+    a run that stops half way is rolled back by the next one instead of
+    appending the same rows twice.
+    """
+    state = read_state(store_dir)
+    if state.get("pending"):
+        state = rollback_batch(state, clean_csv_path, store_dir)
+    srs_known = read_cohorts(store_dir)
+
+    read_chunks = open_source(source_path, chunksize, store_dir)
+    batch = scan_source(read_chunks, min_id=state["max_id"])
+    if batch["rows"] == 0:
+        close_source(store_dir)
+        return 0
+
+    srs_first_paying_at = merge_first_paying_at(srs_known, batch["first_paying_at"])
+
+    batch_id = uuid.uuid4().hex
+    write_state({**state, "pending": {
+        "batch":           batch_id,
+        "clean_csv_bytes": os.path.getsize(clean_csv_path) if os.path.exists(clean_csv_path) else None,
+    }}, store_dir)
+
+    rows_written, touched_months, batch_partials = 0, set(), []
+    for df_chunk in iter_clean_chunks(read_chunks, srs_first_paying_at, batch["has_missing"], min_id=state["max_id"]):
+        df_chunk.to_csv(clean_csv_path, mode="a", header=not os.path.exists(clean_csv_path), index=False)
+        touched_months.update(write_transactions(df_chunk, store_dir, batch=batch_id))
+        batch_partials.append(customer_partials(to_compact(df_chunk)))
+        rows_written += len(df_chunk)
+    close_source(store_dir)
+
+    # only the cube cells, daily sketches and activity bitmaps of months that
+    # received rows change; customer totals are additive, so the new rows are
+    # merged into the stored dimension once (new customers get the next codes)
+    customers = merge_customer_partials([read_customer_partials(store_dir)] + batch_partials)
+    refresh_cube(touched_months, store_dir)
+    refresh_daily_sketches(touched_months, store_dir)
+    write_customers(*customers, store_dir)
+    refresh_activity_index(touched_months, store_dir)
+
+    max_id = batch["max_id"]
+    if state["max_id"] is not None:
+        max_id = max(state["max_id"], max_id)
+
+    # commit point: the watermark moves and the pending batch is cleared together
+    save_ingest_state(
+        srs_first_paying_at,
+        max_id,
+        state["rows"] + rows_written,
+        store_dir,
+        source=state.get("source"),
+    )
+    return rows_written
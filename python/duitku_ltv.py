@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import gammaln, hyp2f1
+
+
+# -------------------------------------------------------------------
+# Predictive customer value (BG/NBD + Gamma-Gamma)
+# Per customer, over active days (several top-ups on one day count once):
+#   frequency = repeat active days, recency = first -> last active day,
+#   T         = first active day -> end of observation (days),
+#   monetary  = mean internal fee per repeat active day.
+# BG/NBD (Fader, Hardie & Lee 2005) models the repeat top-ups and the
+# drop-out of each customer; Gamma-Gamma models the fee per active day.
+# Both log-likelihoods are numpy expressions over all customers at once,
+# evaluated on the distinct (frequency, recency, T) rows weighted by their
+# customer counts, and maximised over log-parameters with L-BFGS-B.
+# -------------------------------------------------------------------
+LTV_COLUMNS = ["customer_id", "transaction_date", "fee_internal_amount"]
+LTV_HORIZON_DAYS = 90
+
+
+def ltv_statistics(df, observation_end=None):
+    """
+    frequency / recency / T / monetary per customer (index customer_id) from a
+    transactions frame, with the first active day code and the observed fee
+    total. observation_end defaults to the last day in the frame.
+    """
+    # one grouped pass to (customer, day) fee totals, sorted by customer then day
+    df_days = df.groupby(["customer_id", "transaction_date"])["fee_internal_amount"].sum().reset_index()
+    customers = df_days["customer_id"].to_numpy()
+    days = df_days["transaction_date"].to_numpy(dtype="int64")
+    fees = df_days["fee_internal_amount"].to_numpy(dtype="float64")
+
+    if observation_end is None:
+        observation_end = days.max() if len(days) else 0
+
+    starts = np.flatnonzero(np.diff(customers, prepend=customers[:1] - 1)) if len(customers) else np.array([], dtype="int64")
+    ends = np.append(starts[1:], len(customers)) - 1
+
+    frequency = (ends - starts).astype("int64")
+    total_fee = np.add.reduceat(fees, starts) if len(starts) else np.array([])
+    repeat_fee = total_fee - fees[starts]
+
+    return pd.DataFrame({
+        "frequency":     frequency,
+        "recency":       days[ends] - days[starts],
+        "T":             int(observation_end) - days[starts],
+        "monetary":      np.where(frequency > 0, repeat_fee / np.maximum(frequency, 1), 0.0),
+        "first_tx_date": days[starts],
+        "observed_fee":  total_fee,
+    }, index=pd.Index(customers[starts], name="customer_id"))
+
+
+def _distinct_rows(*columns):
+    """Distinct rows of the given columns and how many customers share each."""
+    rows, counts = np.unique(np.column_stack(columns), axis=0, return_counts=True)
+    return rows.T, counts
+
+
+def _fit(neg_log_likelihood, start):
+    """Minimise over log-parameters; returns the fitted parameters."""
+    result = minimize(neg_log_likelihood, np.log(start), method="L-BFGS-B")
+    if not np.isfinite(result.fun):
+        raise ValueError(f"Model fit failed: {result.message}")
+    return np.exp(result.x)
+
+
+def bgnbd_log_likelihood(params, frequency, recency, T):
+    """Per-customer BG/NBD log-likelihood for params (r, alpha, a, b)."""
+    r, alpha, a, b = params
+    x = frequency
+    a1 = gammaln(r + x) - gammaln(r) + r * np.log(alpha)
+    a2 = gammaln(a + b) + gammaln(b + x) - gammaln(b) - gammaln(a + b + x)
+    a3 = -(r + x) * np.log(alpha + T)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a4 = np.where(x > 0, np.log(a) - np.log(b + x - 1) - (r + x) * np.log(alpha + recency), -np.inf)
+    return a1 + a2 + np.logaddexp(a3, a4)
+
+
+def fit_bgnbd(frequency, recency, T):
+    """Maximum-likelihood BG/NBD parameters {"r", "alpha", "a", "b"}."""
+    (x, t_x, t_obs), weights = _distinct_rows(frequency, recency, T)
+    n = weights.sum()
+
+    def neg_log_likelihood(log_params):
+        return -(weights * bgnbd_log_likelihood(np.exp(log_params), x, t_x, t_obs)).sum() / n
+
+    r, alpha, a, b = _fit(neg_log_likelihood, [1.0, max(np.mean(T), 1.0), 1.0, 1.0])
+    return {"r": r, "alpha": alpha, "a": a, "b": b}
+
+
+def bgnbd_probability_alive(params, frequency, recency, T):
+    """Probability that each customer has not dropped out by the end of observation."""
+    r, alpha, a, b = params["r"], params["alpha"], params["a"], params["b"]
+    x = np.asarray(frequency, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        odds = np.where(x > 0, a / (b + x - 1) * ((alpha + T) / (alpha + recency)) ** (r + x), 0.0)
+    return 1 / (1 + odds)
+
+
+def bgnbd_expected_transactions(params, t, frequency, recency, T):
+    """Expected repeat active days in the next `t` days for each customer."""
+    r, alpha, a, b = params["r"], params["alpha"], params["a"], params["b"]
+    x = np.asarray(frequency, dtype="float64")
+    T = np.asarray(T, dtype="float64")
+
+    hyp = hyp2f1(r + x, b + x, a + b + x - 1, t / (alpha + T + t))
+    expected = (a + b + x - 1) / (a - 1) * (1 - ((alpha + T) / (alpha + T + t)) ** (r + x) * hyp)
+    return expected * bgnbd_probability_alive(params, frequency, recency, T)
+
+
+def gamma_gamma_log_likelihood(params, frequency, monetary):
+    """Per-customer Gamma-Gamma log-likelihood for params (p, q, v), repeat customers only."""
+    p, q, v = params
+    x, m = frequency, monetary
+    return (
+        gammaln(p * x + q) - gammaln(p * x) - gammaln(q) + q * np.log(v)
+        + (p * x - 1) * np.log(m) + p * x * np.log(x) - (p * x + q) * np.log(x * m + v)
+    )
+
+
+def fit_gamma_gamma(frequency, monetary):
+    """Maximum-likelihood Gamma-Gamma parameters {"p", "q", "v"} over customers with repeat fees."""
+    repeat = (np.asarray(frequency) > 0) & (np.asarray(monetary) > 0)
+    if not repeat.any():
+        raise ValueError("Gamma-Gamma needs customers with repeat top-ups and a positive fee.")
+    (x, m), weights = _distinct_rows(np.asarray(frequency)[repeat], np.asarray(monetary)[repeat])
+    n = weights.sum()
+
+    def neg_log_likelihood(log_params):
+        return -(weights * gamma_gamma_log_likelihood(np.exp(log_params), x, m)).sum() / n
+
+    p, q, v = _fit(neg_log_likelihood, [1.0, 1.0, max(np.mean(m), 1.0)])
+    return {"p": p, "q": q, "v": v}
+
+
+def gamma_gamma_expected_value(params, frequency, monetary):
+    """Expected fee per active day per customer (the population mean for customers with no repeats)."""
+    p, q, v = params["p"], params["q"], params["v"]
+    x = np.asarray(frequency, dtype="float64")
+    m = np.asarray(monetary, dtype="float64")
+    return (p * (v + x * m)) / (p * x + q - 1)
+
+
+def score_customers(df_stats, horizon=LTV_HORIZON_DAYS):
+    """
+    Fit both models on ltv_statistics output and score every customer:
+    p_alive, expected_transactions (repeat active days in the next `horizon`
+    days), expected_fee (per active day) and predicted_fee (their product).
+    Returns (scores, {"bgnbd": params, "gamma_gamma": params}).
+    """
+    frequency = df_stats["frequency"].to_numpy()
+    recency   = df_stats["recency"].to_numpy()
+    T         = df_stats["T"].to_numpy()
+    monetary  = df_stats["monetary"].to_numpy()
+
+    bgnbd = fit_bgnbd(frequency, recency, T)
+    gamma_gamma = fit_gamma_gamma(frequency, monetary)
+
+    df_scores = df_stats.copy()
+    df_scores["p_alive"] = bgnbd_probability_alive(bgnbd, frequency, recency, T)
+    df_scores["expected_transactions"] = bgnbd_expected_transactions(bgnbd, horizon, frequency, recency, T)
+    df_scores["expected_fee"] = gamma_gamma_expected_value(gamma_gamma, frequency, monetary)
+    df_scores["predicted_fee"] = df_scores["expected_transactions"] * df_scores["expected_fee"]
+    return df_scores, {"bgnbd": bgnbd, "gamma_gamma": gamma_gamma}
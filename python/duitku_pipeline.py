@@ -0,0 +1,333 @@
+import time
+import numpy as np
+import pandas as pd
+
+from duitku_cohorts import cohort_matrices, transaction_cohorts
+from duitku_engagement import CustomerActivity
+from duitku_ltv import ltv_statistics
+from duitku_rfm import rfm_snapshot
+from duitku_sketches import hll_count, rolling_union_counts
+from duitku_store import (
+    AMOUNT_COLUMNS, customers_from_transactions, iter_customers, load_transactions, read_cube, read_customers, requested_months,
+    customer_sketches, read_customer_sketches, read_daily_sketches, read_activity_index, read_rfm_scores
+)
+from duitku_transitions import bank_transitions
+
+
+# -------------------------------------------------------------------
+# Shared intermediate steps
+# Each step is computed at most once per AnalysisContext; a step's
+# dependencies are other steps, so the registry forms a small DAG.
+# Steps whose inputs depend on the context's options (month range,
+# approximate modes) declare those with `dynamic`, a function of ctx
+# returning the step names they read through ctx[...].
+# -------------------------------------------------------------------
+STEPS = {}
+
+
+def step(*deps, dynamic=None):
+    """Register a shared step. The function receives ctx followed by its dependencies."""
+    def register(fn):
+        STEPS[fn.__name__] = (fn, deps, dynamic)
+        return fn
+    return register
+
+
+def step_dependencies(ctx, name):
+    """Steps that `name` reads under ctx's options: its declared deps, then the dynamic ones."""
+    _, deps, dynamic = STEPS[name]
+    return list(deps) + (list(dynamic(ctx)) if dynamic else [])
+
+
+def dependency_closure(ctx, names):
+    """`names` and every step they depend on under ctx's options, dependencies first."""
+    order = []
+
+    def visit(name):
+        if name in order:
+            return
+        for dep in step_dependencies(ctx, name):
+            visit(dep)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+class AnalysisContext:
+    """
+    Loads the dataset once and memoizes shared steps, e.g. ctx["monthly_totals"].
+    `columns` limits what is loaded when a single report runs on its own;
+    None loads every column (used by the all-reports runner).
+    `approx_quantiles` lets reports answer customer value percentiles from
+    the stored quantile sketches instead of sorting every customer.
+    `approx_distinct` counts active customers from the daily HyperLogLog
+    sketches instead of exact sets of customer ids.
+    """
+
+    def __init__(self, columns=None, month_from=None, month_to=None, verbose=False,
+                 approx_quantiles=False, approx_distinct=False):
+        self.columns    = columns
+        self.month_from = month_from
+        self.month_to   = month_to
+        self.verbose    = verbose
+        self.approx_quantiles = approx_quantiles
+        self.approx_distinct  = approx_distinct
+        self.results    = {}
+        self.timings    = {}
+
+    def __getitem__(self, name):
+        if name not in self.results:
+            fn, deps, dynamic = STEPS[name]
+            inputs = [self[dep] for dep in deps]
+            for dep in (dynamic(self) if dynamic else []):
+                self[dep]
+            started = time.perf_counter()
+            self.results[name] = fn(self, *inputs)
+            self.timings[name] = time.perf_counter() - started
+            if self.verbose:
+                print(f"[step] {name:<26} {self.timings[name]:.3f}s")
+        return self.results[name]
+
+
+def _full_range(ctx):
+    """True when no month range is requested, so persisted (whole-store) results apply."""
+    return requested_months(ctx.month_from, ctx.month_to) == (None, None)
+
+
+def customer_batches(ctx, columns):
+    """
+    Customer summary `columns` in batches (06, 08 --approx-quantiles): streamed
+    from the stored dimension, or the month range's customer_summary.
+    """
+    if _full_range(ctx):
+        return iter_customers(columns)
+    return iter([ctx["customer_summary"][list(columns)]])
+
+
+# -------------------------------------------------------------------
+# Steps
+# -------------------------------------------------------------------
+@step()
+def transactions(ctx):
+    return load_transactions(columns=ctx.columns, month_from=ctx.month_from, month_to=ctx.month_to)
+
+
+@step()
+def cube(ctx):
+    """Aggregate cube cells (year_month, cohort_month, category); see duitku_store.build_cube."""
+    return read_cube(month_from=ctx.month_from, month_to=ctx.month_to)
+
+
+@step("cube")
+def monthly_totals(ctx, df_cube):
+    """Per month code: transaction count and IDR sums (01, 02, 03, 12a, 12b)."""
+    df_all = df_cube[df_cube["category"].isna()]
+    return df_all.groupby("year_month")[["transactions"] + AMOUNT_COLUMNS].sum().sort_index()
+
+
+@step("cube")
+def monthly_bank_totals(ctx, df_cube):
+    """Per (month code, bank): transaction count and IDR sums (10)."""
+    df_by_bank = df_cube[df_cube["category"].notna()]
+    return (
+        df_by_bank.groupby(["year_month", "category"], observed=True)[["transactions"] + AMOUNT_COLUMNS]
+                  .sum()
+                  .reset_index()
+    )
+
+
+@step("cube")
+def margin_cells(ctx, df_cube):
+    """Per-bank cube cells (year_month, cohort_month, category) with fee sums; slice with duitku_store.cube_margins (17)."""
+    df_by_bank = df_cube[df_cube["category"].notna()]
+    return df_by_bank[["year_month", "cohort_month", "category", "transactions"] + AMOUNT_COLUMNS].reset_index(drop=True)
+
+
+@step("transactions")
+def daily_totals(ctx, df):
+    """Per day code: transaction count and IDR sums, days without transactions as zeros (15)."""
+    df_daily = df.groupby("transaction_date").agg(
+        transactions=("transaction_date", "size"),
+        **{col: (col, "sum") for col in AMOUNT_COLUMNS if col in df.columns},
+    )
+    if df_daily.empty:
+        return df_daily
+    return df_daily.reindex(range(df_daily.index.min(), df_daily.index.max() + 1), fill_value=0).rename_axis("transaction_date")
+
+
+@step("cube")
+def monthly_cohort_customers(ctx, df_cube):
+    """Distinct customers per (year_month, cohort_month) over all banks (04, 12c)."""
+    df_all = df_cube[df_cube["category"].isna()]
+    return df_all[["year_month", "cohort_month", "customers"]].reset_index(drop=True)
+
+
+@step()
+def daily_sketches(ctx):
+    """(day codes, HyperLogLog registers per day) of active customers; see duitku_store.build_daily_sketches."""
+    return read_daily_sketches(month_from=ctx.month_from, month_to=ctx.month_to)
+
+
+@step(dynamic=lambda ctx: ["daily_sketches"] if ctx.approx_distinct else ["monthly_cohort_customers"])
+def monthly_active_customers(ctx):
+    """Distinct active customers per month code (12c): exact from the cube, or unions of daily sketches."""
+    if not ctx.approx_distinct:
+        return ctx["monthly_cohort_customers"].groupby("year_month")["customers"].sum()
+
+    days, registers = ctx["daily_sketches"]
+    months = pd.PeriodIndex.from_ordinals(days, freq="D").asfreq("M").asi8
+    codes, starts = np.unique(months, return_index=True)
+    counts = hll_count(np.maximum.reduceat(registers, starts, axis=0)) if len(days) else []
+    return pd.Series(np.round(counts).astype("int64"), index=pd.Index(codes, name="year_month"), name="customers")
+
+
+# Trailing windows (days) of daily_active_customers
+ACTIVE_WINDOWS = {"dau": 1, "wau": 7, "mau": 30}
+
+
+@step(dynamic=lambda ctx: ["daily_sketches"] if ctx.approx_distinct else ["transactions"])
+def daily_active_customers(ctx):
+    """
+    Distinct active customers per day code over the trailing 1 / 7 / 30 days
+    (dau, wau, mau): exact from the transactions, or unions of daily sketches.
+    """
+    if ctx.approx_distinct:
+        days, registers = ctx["daily_sketches"]
+        counts = {name: rolling_union_counts(registers, window) for name, window in ACTIVE_WINDOWS.items()}
+    else:
+        df = ctx["transactions"]
+        customers = df["customer_id"].to_numpy()
+        tx_days   = df["transaction_date"].to_numpy(dtype="int64")
+        days = np.arange(tx_days.min(), tx_days.max() + 1) if len(tx_days) else np.array([], dtype="int64")
+        counts = {name: _rolling_distinct(customers, tx_days, window, days) for name, window in ACTIVE_WINDOWS.items()}
+    return pd.DataFrame(counts, index=pd.Index(days, name="transaction_date")).round().astype("int64")
+
+
+def _rolling_distinct(customers, tx_days, window, days):
+    """
+    Exact distinct customers over each trailing window ending on `days`.
+    Each active day of a customer covers the windows that end within
+    `window` days after it, cut short at their next active day so the
+    covers never overlap; the counts are then a single difference array.
+    """
+    if len(days) == 0:
+        return np.array([], dtype="int64")
+
+    df = pd.DataFrame({"customer_id": customers, "day": tx_days}).drop_duplicates().sort_values(["customer_id", "day"])
+    active_customer = df["customer_id"].to_numpy()
+    active_day      = df["day"].to_numpy(dtype="int64")
+
+    cover_end = active_day + window
+    same_customer = np.append(active_customer[1:] == active_customer[:-1], False)
+    next_day = np.append(active_day[1:], 0)
+    cover_end = np.where(same_customer, np.minimum(cover_end, next_day), cover_end)
+
+    n = len(days)
+    delta = np.bincount(active_day - days[0], minlength=n + 1) \
+          - np.bincount(np.minimum(cover_end - days[0], n), minlength=n + 1)
+    return np.cumsum(delta)[:n]
+
+
+@step()
+def activity_index(ctx):
+    """Customer bitmaps per day / month / cohort month; see duitku_bitmaps.ActivityIndex."""
+    return read_activity_index(month_from=ctx.month_from, month_to=ctx.month_to)
+
+
+@step("activity_index")
+def monthly_customer_flows(ctx, index):
+    """Per month code: active / new / retained / reactivated / churned customers from bitmap popcounts (04)."""
+    return pd.DataFrame(index.monthly_flows()).set_index("year_month").astype("Int64")
+
+
+@step("activity_index")
+def customer_activity(ctx, index):
+    """Distinct (customer code, day) pairs from the day bitmaps, for as-of recency queries (11)."""
+    days = sorted(index.days)
+    codes = [index.days[day].to_codes() for day in days]
+    return CustomerActivity(np.concatenate(codes or [[]]), np.repeat(days, [len(c) for c in codes]))
+
+
+@step("customer_activity")
+def engagement_daily(ctx, activity):
+    """Customers per recency segment (active / at-risk / inactive) as of every day (11)."""
+    return activity.segment_series()
+
+
+@step("transactions")
+def monthly_bank_transitions(ctx, df):
+    """Bank-to-bank transitions between consecutive top-ups per month (16); see duitku_transitions."""
+    return bank_transitions(df)
+
+
+@step("cube")
+def cohort_cells(ctx, df_cube):
+    """Users and revenue per (cohort_month, cohort_age) cell (05, 09)."""
+    df_all = df_cube[df_cube["category"].isna()]
+    df_cells = pd.DataFrame({
+        "cohort_month": df_all["cohort_month"].to_numpy(),
+        "cohort_age":   (df_all["year_month"] - df_all["cohort_month"]).to_numpy(),
+        "users":        df_all["customers"].to_numpy(),
+        "revenue":      df_all["fee_internal_amount"].to_numpy(),
+    })
+    return df_cells.sort_values(["cohort_month", "cohort_age"]).reset_index(drop=True)
+
+
+@step("cohort_cells", "monthly_totals")
+def cohort_matrices_month(ctx, df_cells, df_totals):
+    """Monthly cohort × age users / revenue / retention matrices from the cube (05)."""
+    return cohort_matrices(
+        df_cells["cohort_month"], df_cells["cohort_age"], df_cells["users"], df_cells["revenue"],
+        last_period=df_totals.index.max(),
+    )
+
+
+@step("transactions")
+def cohort_matrices_week(ctx, df):
+    """Weekly cohort matrices (05 --granularity week)."""
+    return transaction_cohorts(df, "week")
+
+
+@step("transactions")
+def cohort_matrices_day(ctx, df):
+    """Daily cohort matrices (05 --granularity day)."""
+    return transaction_cohorts(df, "day")
+
+
+@step(dynamic=lambda ctx: [] if _full_range(ctx) else ["transactions"])
+def customer_summary(ctx):
+    """
+    One row per customer: counts, sums, first/last day code, cohort and top bank (06, 07, 08).
+    Read from the persisted customer dimension; a month range is aggregated from its
+    transactions (CUSTOMER_SOURCE_COLUMNS) into the same columns.
+    """
+    if _full_range(ctx):
+        return read_customers()
+    return customers_from_transactions(ctx["transactions"])
+
+
+@step(dynamic=lambda ctx: [] if _full_range(ctx) else ["customer_summary"])
+def customer_rfm_scores(ctx):
+    """
+    RFM scores per customer (19): the latest stored snapshot, or every
+    customer of a month range scored on that range's own bin edges.
+    """
+    if _full_range(ctx):
+        return read_rfm_scores()
+    return rfm_snapshot(ctx["customer_summary"])
+
+
+@step("transactions")
+def customer_ltv_statistics(ctx, df):
+    """Per customer: BG/NBD / Gamma-Gamma frequency, recency, T and monetary (18); see duitku_ltv."""
+    return ltv_statistics(df)
+
+
+@step(dynamic=lambda ctx: [] if _full_range(ctx) else ["customer_summary"])
+def customer_value_sketches(ctx):
+    """TDigest per customer total (net_amount, internal fee) for approximate percentiles (06, 08)."""
+    if _full_range(ctx):
+        return read_customer_sketches()
+    return customer_sketches([ctx["customer_summary"]])
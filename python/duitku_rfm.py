@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# RFM scoring
+# Each customer gets a 1–5 score per metric: recency (days since the last
+# top-up; recent = 5), frequency (top-ups) and monetary value on both
+# net_amount and the internal fee. Bin edges are population quantiles,
+# fitted once and kept, so a customer's scores only change when they
+# transact or their recency crosses an edge; scoring is one searchsorted
+# per metric over every customer. The segment is a lookup on (R, F).
+# -------------------------------------------------------------------
+RFM_QUANTILES = [0.2, 0.4, 0.6, 0.8]
+
+# metric -> (score column, True when higher values score higher)
+RFM_METRICS = {
+    "recency":      ("r_score",     False),
+    "frequency":    ("f_score",     True),
+    "monetary_net": ("m_net_score", True),
+    "monetary_fee": ("m_fee_score", True),
+}
+
+# Segment per (R score, F score): rows R = 5 … 1, columns F = 1 … 5
+RFM_SEGMENT_GRID = [
+    ["New customers",   "Potential loyalists", "Potential loyalists", "Champions",       "Champions"],
+    ["Promising",       "Potential loyalists", "Potential loyalists", "Loyal customers", "Champions"],
+    ["About to sleep",  "About to sleep",      "Needs attention",     "Loyal customers", "Loyal customers"],
+    ["Hibernating",     "Hibernating",         "At risk",             "At risk",         "Can't lose them"],
+    ["Lost",            "Lost",                "At risk",             "At risk",         "Can't lose them"],
+]
+
+
+def rfm_metrics(df_customers, as_of):
+    """recency (days as of day code `as_of`), frequency and monetary values per customer."""
+    return pd.DataFrame({
+        "last_tx_date": df_customers["last_tx_date"].astype("int32"),
+        "recency":      int(as_of) - df_customers["last_tx_date"].astype("int64"),
+        "frequency":    df_customers["transaction_count"].astype("int64"),
+        "monetary_net": df_customers["total_net_amount"].astype("int64"),
+        "monetary_fee": df_customers["total_internal_fee"].astype("int64"),
+    }, index=df_customers.index)
+
+
+def fit_rfm_edges(df_metrics, quantiles=RFM_QUANTILES):
+    """{metric: bin edges} from the population quantiles of each metric."""
+    return {metric: np.quantile(df_metrics[metric].to_numpy(), quantiles).tolist() for metric in RFM_METRICS}
+
+
+def metric_score(values, edges, higher_is_better=True):
+    """
+    1 … len(edges) + 1 score per value: the number of edges it lies above,
+    plus one (bins are closed on the right, as in pd.qcut, so a value tied
+    with an edge stays in the lower bin).
+    """
+    edges = np.asarray(edges, dtype="float64")
+    if higher_is_better:
+        return np.searchsorted(edges, values, side="left") + 1
+    # lower is better: values at or below the first edge score highest
+    return len(edges) + 1 - np.searchsorted(edges, values, side="left")
+
+
+def rfm_scores(df_metrics, edges):
+    """Metrics plus one score per metric and the (R, F) segment."""
+    df_scores = df_metrics.copy()
+    for metric, (column, higher_is_better) in RFM_METRICS.items():
+        df_scores[column] = metric_score(df_metrics[metric].to_numpy(), edges[metric], higher_is_better).astype("int8")
+
+    grid = np.array(RFM_SEGMENT_GRID)
+    n_scores = grid.shape[0]
+    df_scores["rfm_segment"] = grid[n_scores - df_scores["r_score"].to_numpy(), df_scores["f_score"].to_numpy() - 1]
+    return df_scores
+
+
+def rfm_snapshot(df_customers, as_of=None):
+    """Fit edges on and score every customer as of day code `as_of` (default: the last top-up day)."""
+    as_of = int(df_customers["last_tx_date"].max()) if as_of is None else int(as_of)
+    df_metrics = rfm_metrics(df_customers, as_of)
+    df_scores = rfm_scores(df_metrics, fit_rfm_edges(df_metrics))
+    df_scores.insert(0, "snapshot_date", np.int32(as_of))
+    return df_scores
@@ -0,0 +1,187 @@
+import numpy as np
+
+from duitku_bitmaps import popcount
+
+
+# -------------------------------------------------------------------
+# Mergeable quantile sketch (t-digest, merging variant)
+# A digest keeps at most ~compression centroids (mean, weight). Centroids
+# near the tails stay small, so extreme percentiles (p95, p99) are the most
+# accurate. Digests built over disjoint chunks merge into one digest of the
+# union, so a sketch can be built batch by batch without sorting all values.
+# -------------------------------------------------------------------
+DEFAULT_COMPRESSION = 200
+
+
+class TDigest:
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means   = np.array([], dtype="float64")
+        self.weights = np.array([], dtype="float64")
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def add(self, values):
+        """Add a batch of values (each with weight 1)."""
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        if other.count == 0:
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def mean(self):
+        """Exact mean of everything added (centroid means are weighted averages)."""
+        return float(np.dot(self.means, self.weights) / self.count) if self.count else np.nan
+
+    def quantile(self, q):
+        """Approximate quantile(s) for q in [0, 1] (linear interpolation between centroids)."""
+        q = np.asarray(q, dtype="float64")
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        # each centroid's mass is centred on its mean; the extremes anchor the ends
+        centres = np.cumsum(self.weights) - self.weights / 2
+        ranks   = np.concatenate([[0.0], centres, [self.count]])
+        values  = np.concatenate([[self.min], self.means, [self.max]])
+        result  = np.interp(q * self.count, ranks, values)
+        return result if result.ndim else float(result)
+
+    def _compress(self, means, weights):
+        """Sort centroids and merge neighbours whose k-scale span fits in one unit."""
+        order   = np.argsort(means, kind="stable")
+        means   = means[order]
+        weights = weights[order]
+
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+
+        # k1 scale: k(q) = δ / (2π) · asin(2q − 1); one cluster per unit of k
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q_mid - 1, -1, 1))
+        _, cluster = np.unique(np.floor(k), return_inverse=True)
+
+        merged_weights = np.bincount(cluster, weights=weights)
+        merged_sums    = np.bincount(cluster, weights=means * weights)
+        self.means     = merged_sums / merged_weights
+        self.weights   = merged_weights
+
+    # Persistence (plain lists, JSON-friendly)
+    def to_dict(self):
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": None if self.count == 0 else float(self.min),
+            "max": None if self.count == 0 else float(self.max),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.means   = np.asarray(data["means"], dtype="float64")
+        digest.weights = np.asarray(data["weights"], dtype="float64")
+        digest.min = np.inf if data["min"] is None else data["min"]
+        digest.max = -np.inf if data["max"] is None else data["max"]
+        return digest
+
+
+def merge_digests(digests, compression=DEFAULT_COMPRESSION):
+    """Merge digests built over disjoint chunks into one."""
+    merged = TDigest(compression)
+    for digest in digests:
+        merged.merge(digest)
+    return merged
+
+
+# -------------------------------------------------------------------
+# HyperLogLog distinct counts (one register array per day)
+# 2^precision one-byte registers per sketch; the union of sketches is the
+# element-wise max of their registers, so any window of days is counted
+# by merging its daily sketches. Standard error ≈ 1.04 / sqrt(2^precision)
+# (1.6% at the default precision of 12, 4 KB per sketch).
+# -------------------------------------------------------------------
+HLL_PRECISION = 12
+
+
+def _hash64(values):
+    """splitmix64 finalizer: integer ids -> well-mixed uint64 hashes."""
+    x = np.asarray(values).astype("uint64") + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(x):
+    """Number of significant bits of each uint64."""
+    for shift in [1, 2, 4, 8, 16, 32]:
+        x = x | (x >> np.uint64(shift))
+    return popcount(x)
+
+
+def hll_slots(values, precision=HLL_PRECISION):
+    """(register index, rank) of each integer id: top bits pick the register, the rest give the rank."""
+    h = _hash64(values)
+    index = (h >> np.uint64(64 - precision)).astype("int64")
+    rest = h << np.uint64(precision)
+    rank = np.minimum(64 - _bit_length(rest) + 1, 64 - precision + 1)
+    return index, rank.astype("uint8")
+
+
+def hll_registers(groups, values, n_groups, precision=HLL_PRECISION):
+    """One register array per group (rows 0 … n_groups-1) from parallel group / id arrays."""
+    registers = np.zeros((n_groups, 1 << precision), dtype="uint8")
+    index, rank = hll_slots(values, precision)
+    np.maximum.at(registers, (np.asarray(groups, dtype="int64"), index), rank)
+    return registers
+
+
+def hll_count(registers):
+    """Estimated distinct count of each register array (last axis = registers)."""
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.exp2(-registers.astype("float64")).sum(axis=-1)
+
+    # small cardinalities: linear counting over the empty registers
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def rolling_union_counts(registers, window):
+    """
+    Distinct count over each trailing window of `window` rows (row i covers
+    rows i-window+1 … i), for a dense daily stack of registers.
+    Sliding max per register (van Herk / Gil-Werman): two passes over the
+    stack, independent of the window length.
+    """
+    n, m = registers.shape
+    if n == 0:
+        return np.array([], dtype="float64")
+
+    # window ending at row i = rows [i, i+window-1] of the front-padded stack
+    n_blocks = -(-(n + window - 1) // window)
+    padded = np.zeros((n_blocks * window, m), dtype=registers.dtype)
+    padded[window - 1:window - 1 + n] = registers
+    blocks = padded.reshape(n_blocks, window, m)
+
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(-1, m)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, m)
+
+    starts = np.arange(n)
+    return hll_count(np.maximum(suffix[starts], prefix[starts + window - 1]))
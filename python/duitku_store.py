@@ -0,0 +1,987 @@
+import os
+import json
+import hashlib
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from duitku_bitmaps import ActivityIndex, Bitmap
+from duitku_rfm import fit_rfm_edges, rfm_metrics, rfm_scores, rfm_snapshot
+from duitku_sketches import HLL_PRECISION, TDigest, hll_registers, merge_digests
+
+
+# -------------------------------------------------------------------
+# Locations
+# -------------------------------------------------------------------
+script_directory = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR         = os.path.normpath(os.path.join(script_directory, "..", "data"))
+CLEAN_CSV_PATH   = os.path.join(DATA_DIR, "transactions_clean.csv")
+STORE_DIR        = os.path.join(DATA_DIR, "store")
+
+
+def transactions_dir(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "transactions")
+
+
+def state_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "state.json")
+
+
+def cohorts_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "cohorts.parquet")
+
+
+def cube_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "cube.parquet")
+
+
+def customers_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "customers.parquet")
+
+
+def customer_banks_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "customer_banks.parquet")
+
+
+def customer_sketches_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "customer_sketches.json")
+
+
+def daily_sketches_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "daily_sketches.parquet")
+
+
+def customer_codes_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "customer_codes.parquet")
+
+
+def activity_index_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, "activity_index.parquet")
+
+
+def cache_dir(store_dir=STORE_DIR):
+    """Sibling of the store for caches that stay valid across rebuilds (reset_store only wipes the store)."""
+    return os.path.normpath(os.path.join(store_dir, "..", "cache"))
+
+
+def render_cache_path(store_dir=STORE_DIR):
+    return os.path.join(cache_dir(store_dir), "render_cache.json")
+
+
+def backtest_cache_path(store_dir=STORE_DIR):
+    return os.path.join(cache_dir(store_dir), "backtest_cache.parquet")
+
+
+def history_dir(store_dir=STORE_DIR):
+    """Sibling of the store for state that must outlive a rebuild (reset_store only wipes the store)."""
+    return os.path.normpath(os.path.join(store_dir, "..", "history"))
+
+
+def rfm_scores_path(store_dir=STORE_DIR):
+    return os.path.join(history_dir(store_dir), "rfm_scores.parquet")
+
+
+def rfm_edges_path(store_dir=STORE_DIR):
+    return os.path.join(history_dir(store_dir), "rfm_edges.json")
+
+
+# Optional month range for every analysis (inclusive, "YYYY-MM")
+MONTH_FROM_ENV = "DUITKU_MONTH_FROM"
+MONTH_TO_ENV   = "DUITKU_MONTH_TO"
+
+
+# -------------------------------------------------------------------
+# Clean schema (column order of transactions_clean.csv)
+# -------------------------------------------------------------------
+CLEAN_COLUMNS = [
+    "id",
+    "customer_id",
+    "net_amount",
+    "fee_internal_amount",
+    "fee_external_amount",
+    "category",
+    "transaction_date",
+    "year_month",
+    "cohort_month",
+    "created_at"
+]
+
+
+# -------------------------------------------------------------------
+# Compact schema
+#   customer_id      int32
+#   category         categorical
+#   IDR amounts      int64
+#   transaction_date int32 day code   (days since 1970-01-01)
+#   year_month       int32 month code (months since 1970-01, = Period ordinal)
+#   cohort_month     int32 month code
+# Validated once in to_compact(); loaders return these dtypes as-is.
+# -------------------------------------------------------------------
+AMOUNT_COLUMNS = ["net_amount", "fee_internal_amount", "fee_external_amount"]
+
+COMPACT_DTYPES = {
+    "id":                  "int64",
+    "customer_id":         "int32",
+    "net_amount":          "int64",
+    "fee_internal_amount": "int64",
+    "fee_external_amount": "int64",
+    "category":            "category",
+    "transaction_date":    "int32",
+    "year_month":          "int32",
+    "cohort_month":        "int32",
+    "created_at":          "datetime64[us, UTC]",
+}
+
+# On disk: transaction_date is a Parquet date (int32 days), year_month is the
+# hive partition key written as "YYYY-MM" so months can be pruned by name.
+TRANSACTIONS_SCHEMA = pa.schema([
+    ("id",                  pa.int64()),
+    ("customer_id",         pa.int32()),
+    ("net_amount",          pa.int64()),
+    ("fee_internal_amount", pa.int64()),
+    ("fee_external_amount", pa.int64()),
+    ("category",            pa.dictionary(pa.int32(), pa.string())),
+    ("transaction_date",    pa.date32()),
+    ("year_month",          pa.string()),
+    ("cohort_month",        pa.int32()),
+    ("created_at",          pa.timestamp("us", tz="UTC")),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("year_month", pa.string())]), flavor="hive")
+
+# Aggregate cube: one row per (year_month, cohort_month, category) cell, plus
+# one row per (year_month, cohort_month) with category = NaN for all banks
+# combined. Sums roll up from either level; distinct customers only roll up
+# over cohort_month (a customer has one cohort but can use several banks),
+# so bank-independent distinct counts must be read from the all-banks rows.
+CUBE_KEYS     = ["year_month", "cohort_month", "category"]
+CUBE_MEASURES = ["transactions"] + AMOUNT_COLUMNS + ["customers"]
+CUBE_SOURCE_COLUMNS = ["customer_id", "category", "year_month", "cohort_month"] + AMOUNT_COLUMNS
+
+# Customer dimension: one row per customer (index customer_id). Every column
+# merges across batches with min / max / sum, so incremental ingest only has to
+# aggregate the new rows; top_bank is re-derived from customer_banks.parquet
+# (transactions per customer and bank).
+CUSTOMER_AGGREGATES = {
+    "first_tx_date":      ("transaction_date", "min"),
+    "last_tx_date":       ("transaction_date", "max"),
+    "cohort_month":       ("cohort_month", "min"),
+    "transaction_count":  ("customer_id", "size"),
+    "total_net_amount":   ("net_amount", "sum"),
+    "total_internal_fee": ("fee_internal_amount", "sum"),
+    "total_external_fee": ("fee_external_amount", "sum"),
+}
+CUSTOMER_SOURCE_COLUMNS = ["customer_id", "category", "transaction_date", "cohort_month"] + AMOUNT_COLUMNS
+
+# Per-customer totals summarized by quantile sketches (over customers with a
+# positive total), for approximate value percentiles in 06 / 08
+SKETCH_COLUMNS = ["total_net_amount", "total_internal_fee"]
+SKETCH_BATCH_ROWS = 100_000
+
+# Daily HyperLogLog sketches of active customers: one row per day with
+# transactions, registers stored as 2^HLL_PRECISION raw bytes
+DAILY_SKETCH_SOURCE_COLUMNS = ["customer_id", "transaction_date", "year_month"]
+
+# Activity index: one bitmap of customer codes per (kind, period code),
+# kind "day" / "month" (active) or "cohort" (acquired in that month)
+ACTIVITY_SOURCE_COLUMNS = ["customer_id", "transaction_date", "year_month"]
+ACTIVITY_KINDS = ["day", "month", "cohort"]
+
+# RFM scores: one row per (snapshot_date, customer) for the customers rescored
+# on that snapshot (new top-ups, or recency crossing a bin edge); a customer's
+# scores as of a day are their latest row on or before it
+RFM_SCORE_COLUMNS = [
+    "snapshot_date", "customer_id", "last_tx_date", "frequency", "monetary_net", "monetary_fee",
+    "r_score", "f_score", "m_net_score", "m_fee_score", "rfm_segment",
+]
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def month_code(month):
+    """'YYYY-MM' (or Period) -> int month code."""
+    return int(pd.Period(month, freq="M").ordinal)
+
+
+def month_labels(codes):
+    """int month codes -> PeriodIndex[M] (keeps the Series/Index name)."""
+    return pd.PeriodIndex.from_ordinals(np.asarray(codes, dtype="int64"), freq="M", name=getattr(codes, "name", None))
+
+
+def day_dates(codes):
+    """int day codes -> DatetimeIndex (keeps the Series/Index name)."""
+    return pd.DatetimeIndex(pd.to_datetime(np.asarray(codes, dtype="int64"), unit="D"), name=getattr(codes, "name", None))
+
+
+def to_compact(df_clean):
+    """
+    Validate a cleaned frame (as written to transactions_clean.csv) and convert
+    it to the compact schema. Rows with a missing id, customer, amount or date
+    are dropped with a warning; non-integer amounts or ids that overflow int32
+    raise ValueError.
+    """
+    missing = set(CLEAN_COLUMNS) - set(df_clean.columns)
+    if missing:
+        raise KeyError(f"Missing required columns: {missing}")
+
+    df = pd.DataFrame(index=df_clean.index)
+
+    for col in ["id", "customer_id"] + AMOUNT_COLUMNS:
+        df[col] = pd.to_numeric(df_clean[col], errors="coerce")
+
+    df["transaction_date"] = pd.to_datetime(df_clean["transaction_date"], errors="coerce")
+    df["year_month"]       = _parse_month_codes(df_clean["year_month"])
+    df["cohort_month"]     = _parse_month_codes(df_clean["cohort_month"])
+
+    bad_rows = df.isna().any(axis=1)
+    if bad_rows.any():
+        print(f"Warning: dropping {int(bad_rows.sum()):,} rows with missing or unparseable values.")
+        df = df[~bad_rows]
+
+    for col in ["id", "customer_id"] + AMOUNT_COLUMNS:
+        values = df[col].to_numpy()
+        if not np.array_equal(values, np.floor(values)):
+            raise ValueError(f"Column {col} must hold whole numbers (IDR amounts / ids).")
+
+    if len(df) and (df["customer_id"].max() > INT32_MAX or df["customer_id"].min() < 0):
+        raise ValueError("customer_id does not fit the compact int32 schema.")
+
+    df["transaction_date"] = df["transaction_date"].to_numpy().astype("datetime64[D]").astype("int64")
+    df["category"]         = df_clean.loc[df.index, "category"].astype(str).str.strip().astype("category")
+    df["created_at"]       = pd.to_datetime(df_clean.loc[df.index, "created_at"], errors="coerce", utc=True)
+
+    return df[CLEAN_COLUMNS].astype(COMPACT_DTYPES).reset_index(drop=True)
+
+
+def _parse_month_codes(srs_months):
+    """'YYYY-MM' strings -> float month codes (NaN when missing); parses each distinct month once."""
+    codes, uniques = pd.factorize(srs_months.astype(str))
+    lut = pd.PeriodIndex(uniques, freq="M").asi8.astype("float64")
+    lut[lut == pd.NaT.value] = np.nan
+    return np.where(codes >= 0, lut[codes], np.nan)
+
+
+# -------------------------------------------------------------------
+# Write
+# -------------------------------------------------------------------
+def reset_store(store_dir=STORE_DIR):
+    if os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+
+
+def write_transactions(df_clean, store_dir=STORE_DIR, batch=None):
+    """
+    Validate a cleaned frame and append it to the store, one new file per touched month.
+    File names carry `batch` when given, so an unfinished append can be removed
+    with drop_batch. Returns the month codes written.
+    """
+    df = to_compact(df_clean)
+    if df.empty:
+        return []
+
+    # partition key as "YYYY-MM": format each distinct month once
+    month_uniques, month_index = np.unique(df["year_month"].to_numpy(), return_inverse=True)
+    month_keys = pa.DictionaryArray.from_arrays(
+        pa.array(month_index.astype("int32")),
+        pa.array(month_labels(month_uniques).astype(str).tolist()),
+    ).cast(pa.string())
+
+    df["transaction_date"] = df["transaction_date"].to_numpy().astype("datetime64[D]")
+    df["year_month"]       = month_keys.to_pandas()
+
+    table = pa.Table.from_pandas(df, schema=TRANSACTIONS_SCHEMA, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=transactions_dir(store_dir),
+        partitioning=PARTITIONING,
+        basename_template=f"part-{batch + '-' if batch else ''}{uuid.uuid4().hex}-{{i}}.parquet",
+    )
+    return month_uniques.tolist()
+
+
+def drop_batch(batch, store_dir=STORE_DIR):
+    """Delete the transaction files written with `batch`. Returns the month codes they were in."""
+    prefix, months = f"part-{batch}-", set()
+    for root, _, files in os.walk(transactions_dir(store_dir)):
+        for name in files:
+            if name.startswith(prefix):
+                os.remove(os.path.join(root, name))
+                months.add(month_code(os.path.basename(root).split("=", 1)[1]))
+        if months and not os.listdir(root):
+            os.rmdir(root)
+    return sorted(months)
+
+
+# -------------------------------------------------------------------
+# Ingest state: high-water mark (max id) + first paying_at per customer
+# -------------------------------------------------------------------
+def read_state(store_dir=STORE_DIR):
+    path = state_path(store_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No ingest state at {path}. Run a full clean first.")
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_state(state, store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = state_path(store_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path(store_dir))
+
+
+def read_cohorts(store_dir=STORE_DIR):
+    """First paying_at per customer (Series indexed by customer_id)."""
+    df = pd.read_parquet(cohorts_path(store_dir))
+    return df.set_index("customer_id")["first_paying_at"]
+
+
+def write_cohorts(srs_first_paying_at, store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    df = srs_first_paying_at.rename("first_paying_at").rename_axis("customer_id").reset_index()
+    df.to_parquet(cohorts_path(store_dir), index=False)
+
+
+# -------------------------------------------------------------------
+# Aggregate cube
+# -------------------------------------------------------------------
+def build_cube(df):
+    """Cube cells for a compact transactions frame (CUBE_SOURCE_COLUMNS)."""
+    agg = {
+        "transactions":        ("customer_id", "size"),
+        "net_amount":          ("net_amount", "sum"),
+        "fee_internal_amount": ("fee_internal_amount", "sum"),
+        "fee_external_amount": ("fee_external_amount", "sum"),
+        "customers":           ("customer_id", "nunique"),
+    }
+    df_by_bank = df.groupby(CUBE_KEYS, observed=True).agg(**agg).reset_index()
+    df_all     = df.groupby(CUBE_KEYS[:2]).agg(**agg).reset_index()
+
+    df_by_bank["category"] = df_by_bank["category"].astype(str)
+    df_all["category"]     = None
+
+    return _sort_cube(pd.concat([df_by_bank, df_all], ignore_index=True))
+
+
+def refresh_cube(months=None, store_dir=STORE_DIR):
+    """
+    Recompute the cube cells of the given month codes from the store (every
+    month when None), one month at a time, and keep the other months as stored.
+    """
+    dataset_months = _store_months(store_dir)
+    if months is None or not os.path.exists(cube_path(store_dir)):
+        months, parts = dataset_months, []
+    else:
+        months = sorted(set(months))
+        df_cube = pd.read_parquet(cube_path(store_dir))
+        parts = [df_cube[~df_cube["year_month"].isin(months)]]
+
+    for code in months:
+        label = str(month_labels([code])[0])
+        df = load_transactions(columns=CUBE_SOURCE_COLUMNS, month_from=label, month_to=label, store_dir=store_dir)
+        parts.append(build_cube(df))
+
+    if not parts:
+        parts = [build_cube(pd.DataFrame({col: pd.Series(dtype=COMPACT_DTYPES[col]) for col in CUBE_SOURCE_COLUMNS}))]
+    df_cube = _sort_cube(pd.concat(parts, ignore_index=True))
+
+    tmp_path = cube_path(store_dir) + ".tmp"
+    df_cube.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cube_path(store_dir))
+
+
+def cube_margins(df_cells, by):
+    """
+    Fee sums and margin ratios per `by` group of cube cells (use the per-bank
+    rows, or the all-banks rows, not both). Ratios do not roll up, so they
+    are recomputed from the summed cells after every slice:
+      total_fee         = internal + external fee charged per top-up
+      net_fee           = fee_internal_amount - fee_external_amount (revenue after partner fees)
+      fee_per_idr       = fee_internal_amount / net_amount (gross revenue per IDR loaded)
+      net_take_rate     = net_fee / net_amount (net revenue per IDR loaded)
+      partner_fee_share = fee_external_amount / total_fee
+    """
+    df = df_cells.groupby(by, observed=True)[["transactions"] + AMOUNT_COLUMNS].sum()
+    df["total_fee"] = df["fee_internal_amount"] + df["fee_external_amount"]
+    df["net_fee"]   = df["fee_internal_amount"] - df["fee_external_amount"]
+    df["fee_per_idr"]       = df["fee_internal_amount"] / df["net_amount"]
+    df["net_take_rate"]     = df["net_fee"] / df["net_amount"]
+    df["partner_fee_share"] = df["fee_external_amount"] / df["total_fee"]
+    return df
+
+
+def _sort_cube(df_cube):
+    df_cube = df_cube.sort_values(CUBE_KEYS, na_position="last").reset_index(drop=True)
+    df_cube["year_month"]   = df_cube["year_month"].astype("int32")
+    df_cube["cohort_month"] = df_cube["cohort_month"].astype("int32")
+    return df_cube[CUBE_KEYS + CUBE_MEASURES].astype({col: "int64" for col in CUBE_MEASURES})
+
+
+def _store_months(store_dir=STORE_DIR):
+    """Month codes present in the partitioned store."""
+    if not os.path.isdir(transactions_dir(store_dir)):
+        return []
+    prefix = "year_month="
+    return sorted(
+        month_code(name[len(prefix):])
+        for name in os.listdir(transactions_dir(store_dir))
+        if name.startswith(prefix)
+    )
+
+
+def read_cube(month_from=None, month_to=None, store_dir=STORE_DIR):
+    """
+    Load the aggregate cube for [month_from, month_to] (category is categorical,
+    NaN on the all-banks rows). Built in memory from the transactions when the
+    store has no cube yet.
+    """
+    month_from, month_to = requested_months(month_from, month_to)
+
+    if os.path.exists(cube_path(store_dir)):
+        df_cube = pd.read_parquet(cube_path(store_dir))
+        if month_from:
+            df_cube = df_cube[df_cube["year_month"] >= month_code(month_from)]
+        if month_to:
+            df_cube = df_cube[df_cube["year_month"] <= month_code(month_to)]
+    else:
+        df_cube = build_cube(load_transactions(CUBE_SOURCE_COLUMNS, month_from, month_to, store_dir))
+
+    df_cube = df_cube.reset_index(drop=True)
+    df_cube["category"] = df_cube["category"].astype("category")
+    return df_cube
+
+
+# -------------------------------------------------------------------
+# Daily active-customer sketches
+# -------------------------------------------------------------------
+def build_daily_sketches(df):
+    """Sketch rows (year_month, transaction_date, registers) for a compact transactions frame."""
+    days = df["transaction_date"].to_numpy(dtype="int64")
+    unique_days, day_rows = np.unique(days, return_inverse=True)
+    registers = hll_registers(day_rows, df["customer_id"].to_numpy(), len(unique_days))
+
+    return pd.DataFrame({
+        "year_month":       df.groupby(day_rows)["year_month"].first().to_numpy(dtype="int32"),
+        "transaction_date": unique_days.astype("int32"),
+        "registers":        [row.tobytes() for row in registers],
+    })
+
+
+def refresh_daily_sketches(months=None, store_dir=STORE_DIR):
+    """
+    Recompute the daily sketches of the given month codes from the store
+    (every month when None) and keep the other months as stored.
+    """
+    dataset_months = _store_months(store_dir)
+    if months is None or not os.path.exists(daily_sketches_path(store_dir)):
+        months, parts = dataset_months, []
+    else:
+        months = sorted(set(months))
+        df_sketches = pd.read_parquet(daily_sketches_path(store_dir))
+        parts = [df_sketches[~df_sketches["year_month"].isin(months)]]
+
+    for code in months:
+        label = str(month_labels([code])[0])
+        df = load_transactions(columns=DAILY_SKETCH_SOURCE_COLUMNS, month_from=label, month_to=label, store_dir=store_dir)
+        parts.append(build_daily_sketches(df))
+
+    if not parts:
+        parts = [build_daily_sketches(pd.DataFrame({col: pd.Series(dtype=COMPACT_DTYPES[col]) for col in DAILY_SKETCH_SOURCE_COLUMNS}))]
+    df_sketches = pd.concat(parts, ignore_index=True).sort_values("transaction_date").reset_index(drop=True)
+
+    tmp_path = daily_sketches_path(store_dir) + ".tmp"
+    df_sketches.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, daily_sketches_path(store_dir))
+
+
+def read_daily_sketches(month_from=None, month_to=None, store_dir=STORE_DIR):
+    """
+    Daily sketches for [month_from, month_to] as (day codes, registers) with one
+    register row per day, gap days included as empty sketches. Built in memory
+    from the transactions when the store has none yet.
+    """
+    month_from, month_to = requested_months(month_from, month_to)
+
+    if os.path.exists(daily_sketches_path(store_dir)):
+        df_sketches = pd.read_parquet(daily_sketches_path(store_dir))
+        if month_from:
+            df_sketches = df_sketches[df_sketches["year_month"] >= month_code(month_from)]
+        if month_to:
+            df_sketches = df_sketches[df_sketches["year_month"] <= month_code(month_to)]
+    else:
+        df_sketches = build_daily_sketches(load_transactions(DAILY_SKETCH_SOURCE_COLUMNS, month_from, month_to, store_dir))
+
+    days = df_sketches["transaction_date"].to_numpy(dtype="int64")
+    if len(days) == 0:
+        return days, np.zeros((0, 1 << HLL_PRECISION), dtype="uint8")
+
+    all_days = np.arange(days.min(), days.max() + 1)
+    registers = np.zeros((len(all_days), 1 << HLL_PRECISION), dtype="uint8")
+    registers[days - days.min()] = np.frombuffer(b"".join(df_sketches["registers"]), dtype="uint8").reshape(len(days), -1)
+    return all_days, registers
+
+
+# -------------------------------------------------------------------
+# Stable customer codes + activity bitmaps
+# -------------------------------------------------------------------
+def update_customer_codes(df_customers, store_dir=STORE_DIR):
+    """
+    Give customers not coded yet the next dense codes, in order of first
+    transaction day, so bitmaps stay valid across incremental ingests and
+    customers acquired together sit in the same containers.
+    """
+    if os.path.exists(customer_codes_path(store_dir)):
+        df_codes = pd.read_parquet(customer_codes_path(store_dir))
+    else:
+        df_codes = pd.DataFrame({"customer_id": pd.Series(dtype="int32"), "customer_code": pd.Series(dtype="int32")})
+
+    df_new = df_customers[~df_customers["customer_id"].isin(df_codes["customer_id"])]
+    df_new = df_new.sort_values(["first_tx_date", "customer_id"])
+    df_codes = pd.concat([df_codes, pd.DataFrame({
+        "customer_id":   df_new["customer_id"].to_numpy(dtype="int32"),
+        "customer_code": np.arange(len(df_codes), len(df_codes) + len(df_new), dtype="int32"),
+    })], ignore_index=True)
+
+    tmp_path = customer_codes_path(store_dir) + ".tmp"
+    df_codes.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, customer_codes_path(store_dir))
+
+
+def read_customer_codes(store_dir=STORE_DIR):
+    """Series customer_id -> customer code."""
+    df_codes = pd.read_parquet(customer_codes_path(store_dir))
+    return df_codes.set_index("customer_id")["customer_code"]
+
+
+def build_activity_bitmaps(df, srs_codes):
+    """Index rows (kind, period, bitmap) of active customers per day and month of a compact frame."""
+    codes = srs_codes.reindex(df["customer_id"]).to_numpy(dtype="int64")
+    rows = []
+    for kind, column in [("day", "transaction_date"), ("month", "year_month")]:
+        for period, codes_in_period in pd.Series(codes).groupby(df[column].to_numpy()):
+            rows.append((kind, period, Bitmap.from_codes(codes_in_period.to_numpy()).to_bytes()))
+    return pd.DataFrame(rows, columns=["kind", "period", "bitmap"])
+
+
+def refresh_activity_index(months=None, store_dir=STORE_DIR):
+    """
+    Recompute the day / month bitmaps of the given month codes from the store
+    (every month when None); cohort bitmaps are rebuilt from the customer dimension.
+    """
+    srs_codes = read_customer_codes(store_dir)
+    if months is None or not os.path.exists(activity_index_path(store_dir)):
+        months, parts = _store_months(store_dir), []
+    else:
+        months = sorted(set(months))
+        df_index = pd.read_parquet(activity_index_path(store_dir))
+        df_index = df_index[df_index["kind"] != "cohort"]
+        parts = [df_index[~np.isin(_activity_months(df_index), months)]]
+
+    for code in months:
+        label = str(month_labels([code])[0])
+        df = load_transactions(columns=ACTIVITY_SOURCE_COLUMNS, month_from=label, month_to=label, store_dir=store_dir)
+        parts.append(build_activity_bitmaps(df, srs_codes))
+
+    parts.append(_cohort_bitmaps(pd.read_parquet(customers_path(store_dir), columns=["customer_id", "cohort_month"]), srs_codes))
+
+    df_index = pd.concat(parts, ignore_index=True)
+    df_index["kind"] = pd.Categorical(df_index["kind"], categories=ACTIVITY_KINDS)
+    df_index = df_index.sort_values(["kind", "period"]).reset_index(drop=True)
+    df_index["kind"] = df_index["kind"].astype(str)
+    df_index["period"] = df_index["period"].astype("int32")
+
+    tmp_path = activity_index_path(store_dir) + ".tmp"
+    df_index.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, activity_index_path(store_dir))
+
+
+def read_activity_index(month_from=None, month_to=None, store_dir=STORE_DIR):
+    """
+    ActivityIndex of day / month bitmaps for [month_from, month_to] plus every
+    cohort bitmap. Built in memory (codes local to the frame) when the store
+    has no index yet.
+    """
+    month_from, month_to = requested_months(month_from, month_to)
+
+    if os.path.exists(activity_index_path(store_dir)):
+        df_index = pd.read_parquet(activity_index_path(store_dir))
+        months = _activity_months(df_index)
+        in_range = np.ones(len(df_index), dtype=bool)
+        if month_from:
+            in_range &= months >= month_code(month_from)
+        if month_to:
+            in_range &= months <= month_code(month_to)
+        df_index = df_index[in_range | (df_index["kind"].to_numpy() == "cohort")]
+    else:
+        df = load_transactions(ACTIVITY_SOURCE_COLUMNS, month_from, month_to, store_dir)
+        srs_codes = pd.Series(np.arange(df["customer_id"].nunique()), index=pd.unique(df["customer_id"]))
+        df_customers = read_customers(store_dir).reset_index()
+        df_index = pd.concat([build_activity_bitmaps(df, srs_codes), _cohort_bitmaps(df_customers, srs_codes)], ignore_index=True)
+
+    bitmaps = {kind: {} for kind in ACTIVITY_KINDS}
+    for kind, period, data in df_index.itertuples(index=False):
+        bitmaps[kind][int(period)] = Bitmap.from_bytes(data)
+    return ActivityIndex(bitmaps["day"], bitmaps["month"], bitmaps["cohort"])
+
+
+def _cohort_bitmaps(df_customers, srs_codes):
+    """Index rows (cohort, cohort_month, bitmap) of the coded customers acquired per month."""
+    df_customers = df_customers[df_customers["customer_id"].isin(srs_codes.index)]
+    codes = srs_codes.reindex(df_customers["customer_id"]).to_numpy(dtype="int64")
+    return pd.DataFrame(
+        [("cohort", cohort, Bitmap.from_codes(codes_in_cohort.to_numpy()).to_bytes())
+         for cohort, codes_in_cohort in pd.Series(codes).groupby(df_customers["cohort_month"].to_numpy())],
+        columns=["kind", "period", "bitmap"],
+    )
+
+
+def _activity_months(df_index):
+    """Month code of each index row (day periods mapped to their month)."""
+    periods = df_index["period"].to_numpy(dtype="int64")
+    day_months = pd.PeriodIndex.from_ordinals(periods, freq="D").asfreq("M").asi8
+    return np.where(df_index["kind"].to_numpy() == "day", day_months, periods)
+
+
+# -------------------------------------------------------------------
+# Customer dimension
+# -------------------------------------------------------------------
+def customer_partials(df):
+    """(customers, customer_banks) aggregates for a compact frame (CUSTOMER_SOURCE_COLUMNS)."""
+    df_customers = df.groupby("customer_id").agg(**CUSTOMER_AGGREGATES)
+    df_banks = (
+        df.groupby(["customer_id", "category"], observed=True)
+          .size()
+          .rename("transactions")
+          .reset_index()
+    )
+    df_banks["category"] = df_banks["category"].astype(str)
+    return df_customers, df_banks
+
+
+def merge_customer_partials(partials):
+    """Combine (customers, customer_banks) pairs from disjoint sets of transactions."""
+    partials = list(partials)
+    df_customers = pd.concat([p[0] for p in partials])
+    df_banks     = pd.concat([p[1] for p in partials], ignore_index=True)
+    if len(partials) > 1:
+        how = {col: "sum" if fn == "size" else fn for col, (_, fn) in CUSTOMER_AGGREGATES.items()}
+        df_customers = df_customers.groupby(level="customer_id").agg(how)
+        df_banks     = df_banks.groupby(["customer_id", "category"], as_index=False)["transactions"].sum()
+    return df_customers, df_banks
+
+
+def write_customers(df_customers, df_banks, store_dir=STORE_DIR):
+    """Persist the customer dimension (adds top_bank) and its per-bank counts."""
+    os.makedirs(store_dir, exist_ok=True)
+    df_customers = _with_top_bank(df_customers, df_banks).reset_index()
+    df_banks = df_banks.sort_values(["customer_id", "category"]).reset_index(drop=True)
+
+    for df_out, path in [(df_customers, customers_path(store_dir)), (df_banks, customer_banks_path(store_dir))]:
+        df_out.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    refresh_customer_sketches(store_dir)
+    update_customer_codes(df_customers, store_dir)
+    refresh_rfm_scores(df_customers, store_dir=store_dir)
+
+
+def refresh_customers(store_dir=STORE_DIR):
+    """Rebuild the customer dimension from the store, one month at a time."""
+    partials = []
+    for code in _store_months(store_dir):
+        label = str(month_labels([code])[0])
+        df = load_transactions(columns=CUSTOMER_SOURCE_COLUMNS, month_from=label, month_to=label, store_dir=store_dir)
+        partials = [merge_customer_partials(partials + [customer_partials(df)])]
+
+    if not partials:
+        partials = [customer_partials(pd.DataFrame({col: pd.Series(dtype=COMPACT_DTYPES[col]) for col in CUSTOMER_SOURCE_COLUMNS}))]
+    write_customers(*partials[0], store_dir)
+
+
+def read_customer_partials(store_dir=STORE_DIR):
+    """The stored dimension as a (customers, customer_banks) pair, for merging new rows into."""
+    df_customers = pd.read_parquet(customers_path(store_dir)).set_index("customer_id")
+    df_banks     = pd.read_parquet(customer_banks_path(store_dir))
+    return df_customers[list(CUSTOMER_AGGREGATES)], df_banks
+
+
+def read_customers(store_dir=STORE_DIR):
+    """
+    Customer dimension indexed by customer_id (day codes, month codes, counts,
+    IDR sums and top_bank). Built in memory from the transactions when the
+    store has no dimension yet.
+    """
+    if not os.path.exists(customers_path(store_dir)):
+        return customers_from_transactions(load_transactions(CUSTOMER_SOURCE_COLUMNS, store_dir=store_dir))
+
+    df_customers = pd.read_parquet(customers_path(store_dir)).set_index("customer_id")
+    df_customers["top_bank"] = df_customers["top_bank"].astype("category")
+    return df_customers
+
+
+def customers_from_transactions(df):
+    """The customer dimension, as read_customers returns it, aggregated from a compact frame (CUSTOMER_SOURCE_COLUMNS)."""
+    df_customers = _with_top_bank(*customer_partials(df))
+    df_customers["top_bank"] = df_customers["top_bank"].astype("category")
+    return df_customers
+
+
+def customer_sketches(batches):
+    """One TDigest per SKETCH_COLUMNS column, merged over frames of customer rows."""
+    digests = {col: [] for col in SKETCH_COLUMNS}
+    for df in batches:
+        for col in SKETCH_COLUMNS:
+            values = df[col].to_numpy()
+            digests[col].append(TDigest().add(values[values > 0]))
+    return {col: merge_digests(parts) for col, parts in digests.items()}
+
+
+def iter_customers(columns, batch_rows=SKETCH_BATCH_ROWS, store_dir=STORE_DIR):
+    """
+    `columns` of the customer dimension (index customer_id) in record batches,
+    so per-customer values are never all in memory at once. One frame when the
+    store has no dimension yet.
+    """
+    if not os.path.exists(customers_path(store_dir)):
+        yield read_customers(store_dir)[list(columns)]
+        return
+    parquet_file = pq.ParquetFile(customers_path(store_dir))
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=["customer_id"] + list(columns)):
+        yield batch.to_pandas().set_index("customer_id")
+
+
+def refresh_customer_sketches(store_dir=STORE_DIR):
+    """Rebuild the sketches from customers.parquet, streaming it in record batches."""
+    sketches = customer_sketches(iter_customers(SKETCH_COLUMNS, store_dir=store_dir))
+
+    tmp_path = customer_sketches_path(store_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({col: digest.to_dict() for col, digest in sketches.items()}, f)
+    os.replace(tmp_path, customer_sketches_path(store_dir))
+
+
+def read_customer_sketches(store_dir=STORE_DIR):
+    """{column: TDigest} for SKETCH_COLUMNS; built from the customer dimension when not stored yet."""
+    if not os.path.exists(customer_sketches_path(store_dir)):
+        return customer_sketches([read_customers(store_dir)])
+    with open(customer_sketches_path(store_dir)) as f:
+        return {col: TDigest.from_dict(data) for col, data in json.load(f).items()}
+
+
+def refresh_rfm_scores(df_customers, as_of=None, refit=False, store_dir=STORE_DIR):
+    """
+    Add a snapshot (day code `as_of`, default: the last top-up day) of the
+    customers whose RFM scores changed since their latest stored row. The
+    bin edges are fitted on the first snapshot (or with refit=True, which
+    adds a snapshot rescoring every customer) and reused afterwards. The
+    history lives outside the store, so rebuilds keep earlier snapshots.
+    """
+    df_customers = df_customers.set_index("customer_id") if "customer_id" in df_customers.columns else df_customers
+    if as_of is None:
+        as_of = int(df_customers["last_tx_date"].max()) if len(df_customers) else 0
+    df_metrics = rfm_metrics(df_customers, as_of)
+
+    os.makedirs(history_dir(store_dir), exist_ok=True)
+    if os.path.exists(rfm_scores_path(store_dir)):
+        df_history = pd.read_parquet(rfm_scores_path(store_dir))
+    else:
+        df_history = pd.DataFrame(columns=RFM_SCORE_COLUMNS)
+
+    if refit or not os.path.exists(rfm_edges_path(store_dir)) or df_history.empty:
+        edges = fit_rfm_edges(df_metrics)
+        with open(rfm_edges_path(store_dir) + ".tmp", "w") as f:
+            json.dump(edges, f)
+        os.replace(rfm_edges_path(store_dir) + ".tmp", rfm_edges_path(store_dir))
+        df_rescore = df_metrics
+    else:
+        edges = read_rfm_edges(store_dir)
+        df_latest = _latest_rfm_rows(df_history).set_index("customer_id")
+
+        # new top-ups change frequency; otherwise only the recency score can move
+        df_new = rfm_scores(df_metrics, edges)
+        df_prev = df_latest.reindex(df_metrics.index)
+        changed = (
+            df_prev["frequency"].isna().to_numpy()
+            | (df_prev["frequency"].to_numpy() != df_metrics["frequency"].to_numpy())
+            | (df_prev["r_score"].to_numpy() != df_new["r_score"].to_numpy())
+        )
+        df_rescore = df_metrics[changed]
+
+    df_snapshot = rfm_scores(df_rescore, edges).reset_index()
+    df_snapshot["snapshot_date"] = np.int32(as_of)
+    df_snapshot = df_snapshot[RFM_SCORE_COLUMNS]
+
+    # re-running a snapshot day replaces that day's rows for the rescored customers
+    same_day = (df_history["snapshot_date"] == as_of) & df_history["customer_id"].isin(df_snapshot["customer_id"])
+    df_history = pd.concat([df_history[~same_day], df_snapshot], ignore_index=True)
+    df_history = df_history.sort_values(["snapshot_date", "customer_id"]).reset_index(drop=True)
+
+    df_history.astype(df_snapshot.dtypes.to_dict()).to_parquet(rfm_scores_path(store_dir) + ".tmp", index=False)
+    os.replace(rfm_scores_path(store_dir) + ".tmp", rfm_scores_path(store_dir))
+
+
+def read_rfm_edges(store_dir=STORE_DIR):
+    with open(rfm_edges_path(store_dir)) as f:
+        return json.load(f)
+
+
+def read_rfm_scores(as_of=None, changed_only=False, store_dir=STORE_DIR):
+    """
+    RFM scores per customer (index customer_id) as of day code `as_of`
+    (default: the latest snapshot), with recency recomputed for that day.
+    changed_only keeps the customers rescored on that snapshot (a daily CRM
+    pull). Built in memory from the customer dimension when not stored yet.
+    """
+    if not os.path.exists(rfm_scores_path(store_dir)):
+        return rfm_snapshot(read_customers(store_dir), as_of)
+
+    df_history = pd.read_parquet(rfm_scores_path(store_dir))
+    as_of = int(df_history["snapshot_date"].max()) if as_of is None else int(as_of)
+    df_history = df_history[df_history["snapshot_date"] <= as_of]
+    if changed_only:
+        df_history = df_history[df_history["snapshot_date"] == as_of]
+
+    df_scores = _latest_rfm_rows(df_history).set_index("customer_id")
+    df_scores.insert(1, "recency", as_of - df_scores["last_tx_date"].astype("int64"))
+    return df_scores
+
+
+def _latest_rfm_rows(df_history):
+    """Each customer's latest snapshot row."""
+    return df_history.sort_values(["customer_id", "snapshot_date"]).drop_duplicates("customer_id", keep="last")
+
+
+def _with_top_bank(df_customers, df_banks):
+    """Bank with the most transactions per customer (ties: first bank by name)."""
+    srs_top_bank = (
+        df_banks.sort_values(["customer_id", "transactions", "category"], ascending=[True, False, True])
+                .drop_duplicates("customer_id")
+                .set_index("customer_id")["category"]
+    )
+    df_customers = df_customers.astype({
+        "first_tx_date": "int32", "last_tx_date": "int32", "cohort_month": "int32",
+        "transaction_count": "int64", "total_net_amount": "int64",
+        "total_internal_fee": "int64", "total_external_fee": "int64",
+    })
+    df_customers["top_bank"] = df_customers.index.map(srs_top_bank)
+    return df_customers.sort_index()
+
+
+# -------------------------------------------------------------------
+# Fingerprint
+# -------------------------------------------------------------------
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_fingerprint(store_dir=STORE_DIR):
+    """
+    sha256 identifying the data the reports read, independent of where and
+    when the store was written: transaction files are hashed by content per
+    month partition (their uuid names and order are left out), the ingest
+    state by its fields, and the cube, customer dimension, sketches and
+    indexes by content. Rebuilding the same data gives the same fingerprint.
+    Falls back to hashing transactions_clean.csv when the store has not been built.
+    """
+    digest = hashlib.sha256()
+
+    if not os.path.isdir(transactions_dir(store_dir)):
+        content_paths, partition_files = [CLEAN_CSV_PATH], []
+    else:
+        content_paths = [
+            cube_path(store_dir), customers_path(store_dir),
+            customer_banks_path(store_dir), customer_sketches_path(store_dir), daily_sketches_path(store_dir),
+            customer_codes_path(store_dir), activity_index_path(store_dir), rfm_scores_path(store_dir),
+        ]
+        partition_files = sorted(
+            (os.path.relpath(root, transactions_dir(store_dir)), file_digest(os.path.join(root, name)))
+            for root, _, files in os.walk(transactions_dir(store_dir))
+            for name in files
+        )
+        if os.path.exists(state_path(store_dir)):
+            state = read_state(store_dir)
+            # the source entry carries the raw file's mtime, which says nothing about the data
+            digest.update(json.dumps({key: state.get(key) for key in ("max_id", "rows")}).encode())
+
+    for partition, content in partition_files:
+        digest.update(f"{partition}:{content}\n".encode())
+
+    for path in content_paths:
+        if not os.path.exists(path):
+            continue
+        digest.update(f"{os.path.basename(path)}:{file_digest(path)}\n".encode())
+    return digest.hexdigest()
+
+
+# -------------------------------------------------------------------
+# Read
+# -------------------------------------------------------------------
+def requested_months(month_from=None, month_to=None):
+    month_from = month_from or os.environ.get(MONTH_FROM_ENV) or None
+    month_to   = month_to   or os.environ.get(MONTH_TO_ENV)   or None
+    return month_from, month_to
+
+
+def load_transactions(columns=None, month_from=None, month_to=None, store_dir=STORE_DIR):
+    """
+    Load clean transactions in the compact schema, reading only `columns`
+    and only the year_month partitions inside [month_from, month_to].
+    Falls back to transactions_clean.csv when the store has not been built.
+    """
+    month_from, month_to = requested_months(month_from, month_to)
+    columns = list(columns) if columns is not None else list(CLEAN_COLUMNS)
+
+    missing = set(columns) - set(CLEAN_COLUMNS)
+    if missing:
+        raise KeyError(f"Missing required columns: {missing}. Available: {CLEAN_COLUMNS}")
+
+    if not os.path.isdir(transactions_dir(store_dir)):
+        return _load_transactions_csv(columns, month_from, month_to)
+
+    dataset = ds.dataset(transactions_dir(store_dir), format="parquet", partitioning=PARTITIONING)
+
+    month_filter = None
+    if month_from:
+        month_filter = ds.field("year_month") >= str(pd.Period(month_from, freq="M"))
+    if month_to:
+        upper = ds.field("year_month") <= str(pd.Period(month_to, freq="M"))
+        month_filter = upper if month_filter is None else (month_filter & upper)
+
+    table = dataset.to_table(columns=columns, filter=month_filter)
+
+    df = pd.DataFrame({
+        name: _column_to_compact(name, table.column(name))
+        for name in columns
+    })
+    return df
+
+
+def _column_to_compact(name, chunked):
+    if name == "year_month":
+        # the partition key comes back as "YYYY-MM" strings: decode each distinct month once
+        encoded = chunked.dictionary_encode().combine_chunks()
+        lut = np.asarray(pd.PeriodIndex(encoded.dictionary.to_pylist(), freq="M").asi8, dtype="int32")
+        return pd.Series(lut[encoded.indices.to_numpy(zero_copy_only=False)])
+    if name == "transaction_date":
+        chunked = chunked.cast(pa.int32())
+    return chunked.to_pandas().astype(COMPACT_DTYPES[name])
+
+
+def _load_transactions_csv(columns, month_from, month_to):
+    df = to_compact(pd.read_csv(CLEAN_CSV_PATH))
+
+    if month_from:
+        df = df[df["year_month"] >= month_code(month_from)]
+    if month_to:
+        df = df[df["year_month"] <= month_code(month_to)]
+
+    return df[columns].reset_index(drop=True)
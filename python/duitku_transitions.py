@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------
+# Bank-switching transitions
+# Transactions are sorted once by (customer, day, id). The clean data keeps
+# only the payment day, not its time, so top-ups on the same day are ordered
+# by id (ids are assigned in creation order). created_at is not used: it is
+# a record/batch timestamp that can predate the payment by months. Every
+# top-up is then a transition from the bank of the customer's previous
+# top-up to its own bank, attributed to the month of the later top-up;
+# a customer's first top-up comes from NEW_CUSTOMER. Consecutive rows are
+# compared with shifted arrays and counted with one bincount into a dense
+# (month, from, to) array, so after the sort the work is linear in rows.
+# -------------------------------------------------------------------
+TRANSITION_COLUMNS = ["id", "customer_id", "category", "transaction_date", "year_month", "cohort_month"]
+NEW_CUSTOMER = "New customer"
+
+
+def transition_order(df):
+    """Row positions sorted by customer, then day and id (within-day order)."""
+    return np.lexsort([
+        df["id"].to_numpy(),
+        df["transaction_date"].to_numpy(),
+        df["customer_id"].to_numpy(),
+    ])
+
+
+def bank_transitions(df):
+    """
+    Transitions per (year_month, from_bank, to_bank) over the non-empty cells.
+    from_bank is NEW_CUSTOMER for first top-ups in the customer's cohort month;
+    a customer's first top-up in a month range that starts after their cohort
+    has no known previous bank and is not counted.
+    """
+    banks = df["category"].astype("category").cat.categories.astype(str)
+    n_banks = len(banks)
+    labels = np.array(list(banks) + [NEW_CUSTOMER])
+
+    if len(df) == 0:
+        return pd.DataFrame({
+            "year_month":  pd.Series(dtype="int32"),
+            "from_bank":   pd.Series(dtype="str"),
+            "to_bank":     pd.Series(dtype="str"),
+            "transitions": pd.Series(dtype="int64"),
+        })
+
+    order = transition_order(df)
+    customers = df["customer_id"].to_numpy()[order]
+    to_codes  = df["category"].astype("category").cat.codes.to_numpy().astype("int64")[order]
+    months    = df["year_month"].to_numpy(dtype="int64")[order]
+    cohorts   = df["cohort_month"].to_numpy(dtype="int64")[order]
+
+    # previous top-up of the same customer: shift by one and compare
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = customers[1:] != customers[:-1]
+    from_codes = np.empty_like(to_codes)
+    from_codes[0] = n_banks
+    from_codes[1:] = to_codes[:-1]
+    from_codes[first] = n_banks
+
+    known = ~first | (cohorts == months)
+    offset = months[known] - months.min()
+    n_months = int(offset.max()) + 1 if len(offset) else 0
+
+    cells = (offset * (n_banks + 1) + from_codes[known]) * n_banks + to_codes[known]
+    counts = np.bincount(cells, minlength=n_months * (n_banks + 1) * n_banks)
+
+    nonzero = np.flatnonzero(counts)
+    month_offset, rest = np.divmod(nonzero, (n_banks + 1) * n_banks)
+    from_index, to_index = np.divmod(rest, n_banks)
+    return pd.DataFrame({
+        "year_month":  (month_offset + months.min()).astype("int32"),
+        "from_bank":   labels[from_index],
+        "to_bank":     labels[to_index],
+        "transitions": counts[nonzero],
+    })
+
+
+def transition_matrix(df_transitions, months=None):
+    """from_bank × to_bank counts, summed over `months` (every month when None)."""
+    if months is not None:
+        df_transitions = df_transitions[df_transitions["year_month"].isin(months)]
+    return df_transitions.pivot_table(
+        index="from_bank", columns="to_bank", values="transitions", aggfunc="sum", fill_value=0
+    )
+
+
+def bank_flows(df_transitions):
+    """
+    Per (year_month, bank): new customers, repeat top-ups on the same bank,
+    top-ups switched in from and out to other banks, and net_switching (in - out).
+    """
+    df = df_transitions
+    switched = (df["from_bank"] != df["to_bank"]) & (df["from_bank"] != NEW_CUSTOMER)
+
+    parts = {
+        "new_customers": df[df["from_bank"] == NEW_CUSTOMER].groupby(["year_month", "to_bank"])["transitions"].sum(),
+        "repeat":        df[df["from_bank"] == df["to_bank"]].groupby(["year_month", "to_bank"])["transitions"].sum(),
+        "switched_in":   df[switched].groupby(["year_month", "to_bank"])["transitions"].sum(),
+        "switched_out":  df[switched].groupby(["year_month", "from_bank"])["transitions"].sum().rename_axis(["year_month", "to_bank"]),
+    }
+    df_flows = pd.DataFrame(parts).fillna(0).astype("int64").rename_axis(["year_month", "bank"])
+    df_flows["net_switching"] = df_flows["switched_in"] - df_flows["switched_out"]
+    return df_flows
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the analysis modules are imported by bare name, as the report scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
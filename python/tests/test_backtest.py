@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import duitku_backtest
+from duitku_backtest import backtest, model_version
+from duitku_forecast import MODELS, bootstrap_intervals, trend_forecast
+
+
+def drift(history, steps):
+    """Last value plus the average change per period."""
+    values = history.to_numpy(dtype="float64")
+    slope = (values[-1] - values[0]) / max(len(values) - 1, 1)
+    return values[-1] + np.arange(1, steps + 1)[:, None] * slope
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(3)
+    t = np.arange(12)[:, None]
+    values = 1_000 + 50 * t + rng.normal(0, 20, size=(12, 3))
+    return pd.DataFrame(values, index=pd.RangeIndex(648, 660, name="year_month"), columns=["BCA", "BNI", "BRI"])
+
+
+@pytest.fixture
+def fits(monkeypatch):
+    """Models fitted per backtest run, as {model: set of (origin, series)}."""
+    calls = []
+    run_tasks = duitku_backtest._run_tasks
+
+    def spy(tasks, steps, workers, deadline):
+        fitted = {}
+        for origin, _, missing in tasks:
+            for name, series in missing.items():
+                fitted.setdefault(name, set()).update((origin, s) for s in series)
+        calls.append(fitted)
+        return run_tasks(tasks, steps, workers, deadline)
+
+    monkeypatch.setattr(duitku_backtest, "_run_tasks", spy)
+    return calls
+
+
+def test_adding_a_model_refits_only_that_model(tmp_path, panel, fits, monkeypatch):
+    store_dir = str(tmp_path / "store")
+    base_models = ["linear_trend", "naive", "moving_average_3"]
+    versions = {name: model_version(name) for name in base_models}
+
+    errors_first, _ = backtest(panel, models=base_models, store_dir=store_dir)
+    assert set(fits[0]) == set(base_models)
+
+    monkeypatch.setitem(MODELS, "drift", drift)
+    assert {name: model_version(name) for name in base_models} == versions
+
+    errors_second, _ = backtest(panel, models=base_models + ["drift"], store_dir=store_dir)
+    assert set(fits[1]) == {"drift"}
+    assert len(fits[1]["drift"]) == len(panel.index[2:-1]) * panel.shape[1]
+
+    # cached forecasts score exactly like the first run
+    pd.testing.assert_frame_equal(
+        errors_second[errors_second["model"] != "drift"].reset_index(drop=True),
+        errors_first.reset_index(drop=True),
+    )
+
+    backtest(panel, models=base_models + ["drift"], store_dir=store_dir)
+    assert fits[2] == {}
+
+
+def test_changed_history_refits_only_that_series(tmp_path, panel, fits):
+    store_dir = str(tmp_path / "store")
+    backtest(panel, store_dir=store_dir)
+
+    revised = panel.copy()
+    revised.loc[653, "BNI"] += 100
+    backtest(revised, store_dir=store_dir)
+
+    assert set(fits[1]) == set(MODELS)
+    assert all({s for _, s in fitted} == {"BNI"} for fitted in fits[1].values())
+    assert all(min(origin for origin, _ in fitted) == 653 for fitted in fits[1].values())
+
+
+def test_bootstrap_intervals_nest_around_the_trend(panel):
+    forecast = trend_forecast(panel)["forecast"]
+    intervals = bootstrap_intervals(panel, intervals=[0.8, 0.95], n_bootstrap=4_000)
+
+    lower_80, upper_80 = intervals[0.8]
+    lower_95, upper_95 = intervals[0.95]
+    assert (lower_95 <= lower_80).all().all() and (upper_80 <= upper_95).all().all()
+    assert (lower_80 < forecast).all().all() and (forecast < upper_80).all().all()
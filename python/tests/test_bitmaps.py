@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from duitku_bitmaps import Bitmap, popcount, union
+
+
+def _codes(seed):
+    """Sparse codes across several containers plus one dense block (bitset container)."""
+    rng = np.random.default_rng(seed)
+    sparse = rng.choice(400_000, size=6_000, replace=False)
+    dense = 3 * 65_536 + rng.choice(65_536, size=30_000, replace=False)
+    return np.union1d(sparse, dense)
+
+
+@pytest.fixture
+def sets():
+    return _codes(1), _codes(2)
+
+
+def test_popcount_matches_bit_count():
+    words = np.random.default_rng(0).integers(0, np.iinfo(np.int64).max, size=1_000).astype(np.uint64)
+    assert popcount(words).tolist() == [bin(int(w)).count("1") for w in words]
+
+
+def test_set_operations_match_python_sets(sets):
+    a, b = sets
+    bitmap_a, bitmap_b = Bitmap.from_codes(a), Bitmap.from_codes(b)
+    set_a, set_b = set(a.tolist()), set(b.tolist())
+
+    assert len(bitmap_a) == len(set_a)
+    assert bitmap_a.intersection_size(bitmap_b) == len(set_a & set_b)
+    assert sorted(set_a & set_b) == (bitmap_a & bitmap_b).to_codes().tolist()
+    assert sorted(set_a | set_b) == (bitmap_a | bitmap_b).to_codes().tolist()
+    assert sorted(set_a - set_b) == (bitmap_a - bitmap_b).to_codes().tolist()
+    assert len(bitmap_a | bitmap_b) == len(set_a | set_b)
+
+
+def test_union_of_many_bitmaps():
+    parts = [_codes(seed) for seed in range(5)]
+    assert len(union(Bitmap.from_codes(codes) for codes in parts)) == len(np.unique(np.concatenate(parts)))
+
+
+def test_bytes_round_trip(sets):
+    a, _ = sets
+    bitmap = Bitmap.from_codes(a)
+    restored = Bitmap.from_bytes(bitmap.to_bytes())
+    np.testing.assert_array_equal(restored.to_codes(), a)
+    assert restored.intersection_size(bitmap) == len(a)
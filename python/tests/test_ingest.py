@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import duitku_ingest
+from duitku_ingest import incremental_ingest, stream_clean
+from duitku_store import (
+    load_transactions, read_activity_index, read_cube, read_customers, read_daily_sketches, read_state
+)
+
+
+BANKS = ["BCA", "BNI", "BRI", "MANDIRI"]
+
+
+@pytest.fixture
+def raw_rows():
+    """Top-ups over three months in id (= paying_at) order, customers acquired throughout."""
+    rng = np.random.default_rng(7)
+    n = 600
+    paying_at = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(np.sort(rng.uniform(0, 90 * 86400, n)), unit="s")
+    return pd.DataFrame({
+        "id":                  np.arange(1, n + 1),
+        "customer_id":         np.minimum(rng.integers(1, 60, n), np.arange(n) // 8 + 1),
+        "net_amount":          rng.integers(1, 100, n) * 10_000,
+        "fee_internal_amount": 500,
+        "fee_external_amount": 4000,
+        "category":            rng.choice(BANKS, n),
+        "paying_at":           paying_at.strftime("%Y-%m-%d %H:%M:%S+00:00"),
+        "created_at":          paying_at.strftime("%Y-%m-%d %H:%M:%S+00:00"),
+    })
+
+
+def _write_source(df, path):
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def _snapshot(root):
+    """Everything the reports read from a built store, in a comparable form."""
+    store_dir = str(root / "store")
+    df_tx = load_transactions(store_dir=store_dir).sort_values("id").reset_index(drop=True)
+    df_tx["category"] = df_tx["category"].astype(str)
+
+    df_cube = read_cube(store_dir=store_dir)
+    df_cube["category"] = df_cube["category"].astype(str)
+    df_cube = df_cube.sort_values(["year_month", "cohort_month", "category"]).reset_index(drop=True)
+
+    df_customers = read_customers(store_dir).sort_index()
+    df_customers["top_bank"] = df_customers["top_bank"].astype(str)
+
+    index = read_activity_index(store_dir=store_dir)
+    state = read_state(store_dir)
+    return {
+        "transactions": df_tx,
+        "cube":         df_cube,
+        "customers":    df_customers,
+        "sketches":     read_daily_sketches(store_dir=store_dir),
+        "flows":        index.monthly_flows(),
+        "day_sizes":    {day: len(bitmap) for day, bitmap in index.days.items()},
+        "clean_csv":    pd.read_csv(root / "transactions_clean.csv"),
+        "state":        (state["max_id"], state["rows"]),
+    }
+
+
+def _assert_same(left, right):
+    for key in ["transactions", "cube", "customers", "clean_csv"]:
+        pd.testing.assert_frame_equal(left[key], right[key], check_categorical=False)
+    np.testing.assert_array_equal(left["sketches"][0], right["sketches"][0])
+    np.testing.assert_array_equal(left["sketches"][1], right["sketches"][1])
+    assert left["flows"] == right["flows"]
+    assert left["day_sizes"] == right["day_sizes"]
+    assert left["state"] == right["state"]
+
+
+def _build(root, source, chunksize):
+    root.mkdir()
+    stream_clean(source, str(root / "transactions_clean.csv"), chunksize=chunksize, store_dir=str(root / "store"))
+
+
+@pytest.fixture
+def full_build(tmp_path, raw_rows):
+    source = _write_source(raw_rows, tmp_path / "full.csv")
+    _build(tmp_path / "full", source, chunksize=10_000)
+    return source, _snapshot(tmp_path / "full")
+
+
+def test_streaming_matches_full_rebuild(tmp_path, full_build):
+    source, expected = full_build
+    _build(tmp_path / "streamed", source, chunksize=37)
+    _assert_same(_snapshot(tmp_path / "streamed"), expected)
+
+
+def test_incremental_matches_full_rebuild(tmp_path, raw_rows, full_build):
+    source, expected = full_build
+    root = tmp_path / "incremental"
+    _build(root, _write_source(raw_rows.iloc[:400], tmp_path / "first.csv"), chunksize=100)
+
+    appended = incremental_ingest(source, str(root / "transactions_clean.csv"), chunksize=50, store_dir=str(root / "store"))
+
+    assert appended == len(raw_rows) - 400
+    _assert_same(_snapshot(root), expected)
+    assert incremental_ingest(source, str(root / "transactions_clean.csv"), store_dir=str(root / "store")) == 0
+
+
+def test_interrupted_incremental_is_rolled_back(tmp_path, raw_rows, full_build, monkeypatch):
+    source, expected = full_build
+    root = tmp_path / "interrupted"
+    _build(root, _write_source(raw_rows.iloc[:400], tmp_path / "first.csv"), chunksize=100)
+
+    # die after the rows, cube, sketches and customers were written, before the state moved the watermark
+    def crash(*args, **kwargs):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(duitku_ingest, "refresh_activity_index", crash)
+    with pytest.raises(RuntimeError):
+        incremental_ingest(source, str(root / "transactions_clean.csv"), chunksize=50, store_dir=str(root / "store"))
+    assert read_state(str(root / "store"))["pending"]
+    monkeypatch.undo()
+
+    incremental_ingest(source, str(root / "transactions_clean.csv"), chunksize=50, store_dir=str(root / "store"))
+    assert "pending" not in read_state(str(root / "store"))
+    _assert_same(_snapshot(root), expected)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from duitku_sketches import HLL_PRECISION, TDigest, hll_count, hll_registers, merge_digests, rolling_union_counts
+
+
+# standard error of a HyperLogLog count at the default precision
+HLL_ERROR = 1.04 / np.sqrt(1 << HLL_PRECISION)
+
+
+@pytest.mark.parametrize("n", [50, 2_000, 200_000])
+def test_hll_count_within_error_bound(n):
+    rng = np.random.default_rng(n)
+    ids = rng.choice(10 * n, size=n, replace=False)
+    estimate = hll_count(hll_registers(np.zeros(n), ids, 1))[0]
+    assert abs(estimate - n) <= 4 * HLL_ERROR * n
+
+
+def test_hll_union_of_days_within_error_bound():
+    rng = np.random.default_rng(1)
+    days = rng.integers(0, 40, size=100_000)
+    ids = rng.integers(0, 30_000, size=100_000)
+    registers = hll_registers(days, ids, 40)
+
+    for window in [1, 7, 30]:
+        estimates = rolling_union_counts(registers, window)
+        exact = np.array([len(np.unique(ids[(days > day - window) & (days <= day)])) for day in range(40)])
+        assert np.all(np.abs(estimates - exact) <= 4 * HLL_ERROR * exact)
+
+
+def test_tdigest_quantiles_within_rank_error():
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(mean=13, sigma=1.2, size=200_000)
+
+    # built batch by batch and merged, as the customer sketches are
+    digest = merge_digests(TDigest().add(chunk) for chunk in np.array_split(values, 17))
+
+    qs = np.array([0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99])
+    ranks = np.searchsorted(np.sort(values), digest.quantile(qs)) / len(values)
+    assert np.all(np.abs(ranks - qs) <= 0.01)
+    assert digest.count == len(values)
+    assert digest.mean() == pytest.approx(values.mean(), rel=1e-9)
+    assert len(digest.means) <= digest.compression
+
+
+def test_tdigest_round_trips_through_dict():
+    digest = TDigest().add(np.arange(1_000))
+    restored = TDigest.from_dict(digest.to_dict())
+    np.testing.assert_array_equal(restored.quantile([0.1, 0.5, 0.9]), digest.quantile([0.1, 0.5, 0.9]))